@@ -19,6 +19,8 @@ sys.path.append('../../')
 
 import cobra as cb
 import settings
+from tools import knockouts
+from tools.model_view import load_view
 import pandas as pd
 from collections import Counter
 from matplotlib import pyplot
@@ -27,11 +29,11 @@ from matplotlib import pyplot
 ## Compares
 def compare_ctherm_models():
     models = [
-        cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'iSR432_w_exch.json')),
-        cb.io.read_sbml_model(os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'iCth446.xml')),
-        cb.io.read_sbml_model(os.path.join(settings.PROJECT_ROOT, 'iAT601', 'iAT601_CB_fixed_GPR.xml')),
-        cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT, 'iCBI', 'iCBI655_cellobiose_batch.json')),
-        cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'iML1515.json'))
+        load_view(os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'iSR432_w_exch.json')),
+        load_view(os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'iCth446.xml')),
+        load_view(os.path.join(settings.PROJECT_ROOT, 'iAT601', 'iAT601_CB_fixed_GPR.xml')),
+        load_view(os.path.join(settings.PROJECT_ROOT, 'iCBI', 'iCBI655_cellobiose_batch.json')),
+        load_view(os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'iML1515.json'))
     ]
 
     t = get_table(models, os.path.join(settings.PROJECT_ROOT, 'analysis', 'compare_gems', 'all_ct_gems.csv'))
@@ -50,7 +52,10 @@ def get_table(models, save_path=None):
 
 
 def get_col(model, minimum_viable_growth_rate = 0.01):
-    t = pd.DataFrame(columns=['Feature', model._id])
+    """
+    :param model: tools.model_view.ModelView, the cobra model is only built for the simulations
+    """
+    t = pd.DataFrame(columns=['Feature', model.id])
     t['Feature'] = ['Genes', 'Metabolites', 'Reactions', 'Fraction of blocked reactions',
                     'Fraction of lethal genes', 'Fraction of lethal reactions',
                     'cl 0', 'cl 1', 'cl 2', 'cl 3', 'cl 4', 'cl none']
@@ -66,11 +71,11 @@ def get_col(model, minimum_viable_growth_rate = 0.01):
             exrxn.lower_bound = -1000
             exrxn.upper_bound = 1000
 
-    with model as tmodel:
+    with model.model as tmodel:
         open_ex(tmodel)
         blocked = cb.flux_analysis.variability.find_blocked_reactions(tmodel, zero_cutoff=0.00001)
-        rxn_del = cb.flux_analysis.deletion.single_reaction_deletion(tmodel)
-        gene_del = cb.flux_analysis.deletion.single_gene_deletion(tmodel)
+        rxn_del = knockouts.reaction_deletion(tmodel)
+        gene_del = knockouts.gene_deletion(tmodel)
 
     t.loc['Fraction of blocked reactions'] = len(blocked)/len(model.reactions)
 
@@ -83,18 +88,16 @@ def get_col(model, minimum_viable_growth_rate = 0.01):
 
     # Confidence level:
     # find proper key:
-    note_keys = []
-    for rxn in model.reactions:
-        note_keys.extend(list(rxn.notes.keys()))
-    if 'CONFIDENCE LEVEL' in note_keys:
+    if model.notes_by_key('CONFIDENCE LEVEL'):
         confidence_level_key = 'CONFIDENCE LEVEL'
-    elif 'confidence_level' in note_keys:
+    elif model.notes_by_key('confidence_level'):
         confidence_level_key = 'confidence_level'
     else:
         print('Confidence level not found')
         confidence_level_key = None
     if confidence_level_key:
-        counts = Counter([str(get_first_elem(rxn.notes.get(confidence_level_key, ['']))) for rxn in model.reactions])
+        confidence_levels = model.notes_by_key(confidence_level_key)
+        counts = Counter([str(get_first_elem(confidence_levels.get(rxn.id, ['']))) for rxn in model.reactions])
     else:
         counts = {str(x):-1 for x in range(5)}
         counts[''] = -1
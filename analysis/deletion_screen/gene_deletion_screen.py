@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+# Description: Double (and optionally triple) gene deletion screen of iCBI655 in cellobiose batch conditions
+# Usage: python gene_deletion_screen.py [max_order]
+
+import os, sys
+sys.path.append('../../')
+
+import settings
+from tools import deletion_screen
+from tools import snapshot
+
+max_order = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+
+model = snapshot.load_model(os.path.join(settings.PROJECT_ROOT, 'iCBI', 'iCBI655_cellobiose_batch.json'))
+
+counts = deletion_screen.run_screen(model, 'gene_deletions_order_{}.csv'.format(max_order), max_order=max_order,
+                                    verbose=True)
+print(counts)
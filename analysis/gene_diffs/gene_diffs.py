@@ -1,10 +1,10 @@
-import cobra as cb
+from tools import snapshot
 import os
 import settings
 import pandas as pd
 
-icbi = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iCBI', 'iCBI655bigg_cellb_batch_v2.json'))
-iat = cb.io.read_sbml_model(os.path.join(settings.PROJECT_ROOT,"iAT601","iAT601_CB_fixed_GPR.xml"))
+icbi = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iCBI', 'iCBI655bigg_cellb_batch_v2.json'))
+iat = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,"iAT601","iAT601_CB_fixed_GPR.xml"))
 
 old2new = settings.get_gene_map()
 icbi_genes = [gene.id for gene in icbi.genes]
@@ -10,9 +10,8 @@
 import os, sys
 sys.path.append('../../')
 
-import csv
-from tools.conf_model import *
-import cobra as cb
+from tools import mutant_screen
+from tools import snapshot
 import settings
 import pandas as pd
 
@@ -26,12 +25,9 @@ params = {'legend.fontsize': 'x-large',
          'ytick.labelsize':'x-large'}
 plt.rcParams.update(params)
 
-from collections import OrderedDict
-
-
 # Load models
-isg = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iCBI', 'iCBI655_cellobiose_batch.json'))
-iat = cb.io.read_sbml_model(os.path.join(settings.PROJECT_ROOT,'iAT601','iAT601_CB_fixed_GPR.xml'))
+isg = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iCBI', 'iCBI655_cellobiose_batch.json'))
+iat = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iAT601','iAT601_CB_fixed_GPR.xml'))
 
 # ID map to iAT
 df = pd.read_csv(os.path.join(settings.PROJECT_ROOT, 'iSG', 'reaction_nomenclature-curated.csv'))
@@ -53,177 +49,19 @@ for ex_rxn in iat.exchanges:
 print('iAT EX_h2s bounds: {}'.format(iat.reactions.get_by_id(isg2iat['EX_h2s_e']).bounds))
 
 
-# Dictionaries to store values
-isg_gr = OrderedDict()
-iat_gr = OrderedDict()
-
-# wild type growth
-isg_wtgr = isg.optimize().objective_value
-iat_wtgr = iat.optimize().objective_value
-
-
 # # Mutant calculations
+# Strains are defined in strains.csv using iCBI ids, see tools/mutant_screen.py for the table format.
 
-
-# hydg
-mut_ko = ['BIF','H2ASE_syn']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['hydg'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['hydg'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# hydg-ech
-mut_ko = ['BIF','H2ASE_syn', 'ECH']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['hydg-ech'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['hydg-ech'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# hydg-pta-ack
-mut_ko = ['BIF','H2ASE_syn', 'PTAr', 'ACKr']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['hydg-pta-ack'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['hydg-pta-ack'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# hydg-ech-pfl
-mut_ko = ['BIF','H2ASE_syn', 'ECH', 'PFL']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['hydg-ech-pfl'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['hydg-ech-pfl'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# +FUM
-mut_ko = ['BIF','H2ASE_syn', 'ECH', 'PFL']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    # allow fumarate input
-    tmodel.reactions.EX_fum_e.bounds = (-1000,0)
-    # FUMARASE IS NOW PRESENT IN iCBI
-    # Include reaction converting fumarate to succinate, which is not present in the GEM
-    #FUM2 = cb.Reaction(id='FUM2')
-    #tmodel.add_reaction(FUM2)
-    #tmodel.reactions.FUM2.reaction = 'fum_c + nadh_c + h_c => succ_c + nad_c'
-    # allow succinate secretion
-    tmodel.reactions.EX_succ_e.bounds = (0,1000)
-    isg_gr['fum'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    # allow fumarate input
-    tmodel.reactions.get_by_id(isg2iat['EX_fum_e']).bounds = (-1000,0)
-    # Include reaction converting fumarate to succinate, which is not present in the GEM
-    FUM2 = cb.Reaction(id='FUM2')
-    tmodel.add_reaction(FUM2)
-    tmodel.reactions.FUM2.reaction = '{} + {} + {} => {} + {}'.format(isg2iat_mets['fum_c'], isg2iat_mets['nadh_c'],isg2iat_mets['h_c'],isg2iat_mets['succ_c'],  isg2iat_mets['nad_c'])
-    # allow succinate secretion
-    tmodel.reactions.get_by_id(isg2iat['EX_succ_e']).bounds = (0,1000)
-    iat_gr['fum'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# +SULF
-mut_ko = ['BIF','H2ASE_syn', 'ECH', 'PFL']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    # allow sulfide secretion
-    tmodel.reactions.EX_h2s_e.bounds = (0,1000)
-    isg_gr['sulf'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    tmodel.reactions.get_by_id(isg2iat['EX_h2s_e']).bounds = (0,1000)
-    iat_gr['sulf'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# +KIV
-mut_ko = ['BIF','H2ASE_syn', 'ECH', 'PFL']
-
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    tmodel.reactions.EX_ibutoh_e.bounds = (0,1000)
-    sk = tmodel.add_boundary(tmodel.metabolites.get_by_id('3mob_c'))
-    isg_gr['kiv'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    sk = tmodel.add_boundary(tmodel.metabolites.get_by_id(isg2iat_mets['3mob_c']))
-    iat_gr['kiv'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-
-# ll1210 mutant
-mut_ko = ['BIF','H2ASE_syn', 'PFL', 'LDH_L', 'PTAr', 'ACKr']
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['ll1210'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['ll1210'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# ldh
-mut_ko = ['LDH_L']
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['ldh'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['ldh'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# pta-ack
-mut_ko = ['PTAr', 'ACKr']
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['pta-ack'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['pta-ack'] = tmodel.optimize().objective_value/iat_wtgr
-
-
-# ldh-pta-ack
-mut_ko = ['LDH_L','PTAr', 'ACKr']
-with isg as tmodel:
-    [tmodel.reactions.get_by_id(rxn_id).knock_out() for rxn_id in mut_ko]
-    isg_gr['ldh-pta-ack'] = tmodel.optimize().objective_value/isg_wtgr
-
-with iat as tmodel:
-    [tmodel.reactions.get_by_id(isg2iat[rxn_id]).knock_out() for rxn_id in mut_ko]
-    iat_gr['ldh-pta-ack'] = tmodel.optimize().objective_value/iat_wtgr
+models = [
+    mutant_screen.ScreenModel('iAT', iat, isg2iat, isg2iat_mets),
+    mutant_screen.ScreenModel('iCBI', isg, None, None)
+]
+strains = mutant_screen.read_strains('strains.csv')
+gr = mutant_screen.run_screen(models, strains)
 
 
 # # Write output
 
 
-# Write output
-with open('mutant_gr_predictions.csv', 'w') as f:
-    w = csv.writer(f, delimiter=',', lineterminator='\n')
-    w.writerow(['Strain', 'Fraction of WT growth rate iAT', 'Fraction of WT growth rate iCBI'])
-    for k in isg_gr.keys():
-        w.writerow([k, iat_gr[k], isg_gr[k]])
-
+gr.columns = ['Fraction of WT growth rate {}'.format(name) for name in gr.columns]
+gr.to_csv('mutant_gr_predictions.csv')
@@ -11,7 +11,9 @@ import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import cobra as cb
+from itertools import combinations
 import tools.ms2bigg
+from tools.general import find_duplicate_reactions
 import settings
 
 
@@ -30,17 +32,12 @@ model = tools.ms2bigg.main(model_ms)
 # In[3]:
 
 
-same_mets = []
-for rxn_1 in model.reactions:
-    met_ids_1 = [met.id for met in rxn_1.metabolites.keys()]
-    for rxn_2 in model.reactions:
-        met_ids_2 = [met.id for met in rxn_2.metabolites.keys()]
-        if rxn_1.id != rxn_2.id:
-            if set(met_ids_1) == set(met_ids_2):
-                pair = {rxn_1.id, rxn_2.id}
-                if pair not in same_mets:
-                    same_mets.append(pair)
-                    print(pair)
+duplicates = find_duplicate_reactions(model)
+same_mets = [set(pair) for group in duplicates.same_metabolites for pair in combinations(group, 2)]
+for pair in same_mets:
+    print(pair)
+print('Identical:', duplicates.identical)
+print('Reversed:', duplicates.reversed)
 
 
 # - PGMT-PGMC and FRTT-GRTT seem to be actual cases of duplication.
@@ -9,15 +9,17 @@
 # Setup
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import cobra as cb
 import pandas as pd
 import ast
 import settings
 from tools.ms2bigg import get_ms2bigg_met
+from tools.balance import BalanceChecker
+from tools import snapshot
+from tools.ms_compounds import load_index
 import csv
 from Bio import SeqIO
 
-model = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iCBI','intermediate','iCBI665_v4_bigg.json'))
+model = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iCBI','intermediate','iCBI665_v4_bigg.json'))
 
 ## Gather maps
 
@@ -59,9 +61,8 @@ ms2bigg_met = get_ms2bigg_met()
 bigg2ms_met = {v:k for k,v in ms2bigg_met.items()}
 
 # Gather data
-isg = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iSG676','iSG676_cb.json'))
-msm = pd.read_csv(os.path.join(settings.PROJECT_ROOT,'iCBI','ms_info','compounds.tsv'), sep='\t')# Since some ids are not mapped between model seed and bigg, model seed data is used
-msm = msm.set_index('id')
+isg = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iSG676','iSG676_cb.json'))
+msm = load_index(os.path.join(settings.PROJECT_ROOT,'iCBI','ms_info','compounds.tsv'))# Since some ids are not mapped between model seed and bigg, model seed data is used
 
 # 1. Fixes (more than below)
 model.reactions.SBTD_D2.notes['confidence_level'] = 0
@@ -75,8 +76,8 @@ model.metabolites.biomass_c.remove_from_model(destructive=True)
 
 
 def safe_formula(m_id):
-    potential_str = msm.loc[m_id]['formula']
-    if isinstance(potential_str, str):
+    potential_str = msm.get(m_id).formula
+    if potential_str is not None:
         return potential_str
     else:
         print("Metabolite: {} lacks ms formula".format(m_id))
@@ -90,13 +91,13 @@ for met in model.metabolites:
     id_nc = met.id[:-2]
     ms_id = bigg2ms_met[id_nc]
 
-    if ms_id in msm.index:
+    if ms_id in msm:
         target_id = ms_id
     elif ms_id in icbi2ms_met:
         target_id = icbi2ms_met[ms_id]
     if target_id:
         met.formula = safe_formula(target_id)
-        met.charge = int(msm.loc[target_id]['charge'])
+        met.charge = int(msm.get(target_id).charge)
         continue
     print("Metabolite not found in md: ", id_nc)
 
@@ -158,25 +159,19 @@ dbmap = {
         }
 
 def parse_ms_aliases(m_id):
-    aliases = msm.loc[m_id]['aliases']
-    adict = {}
-    for db in aliases.split(';'):
-        key = db.split(':')[0]
-        values = db.split(':')[1]
-        if key in dbmap:
-            adict[dbmap[key]] = values.split("|")
-    return adict
+    aliases = msm.get(m_id).aliases # Parsed when the index is written
+    return {dbmap[key]: values for key, values in aliases.items() if key in dbmap}
 
 # Bulk info from ms
 for met in model.metabolites:
-    if met.annotation.get('seed.compound') in msm.index:
+    if met.annotation.get('seed.compound') in msm:
         m_id = met.annotation['seed.compound']
         adict = parse_ms_aliases(m_id)
         if not ('bigg.metabolite' in met.annotation):
             met.annotation['bigg.metabolite'] = str(adict.get('bigg.metabolite'))
         if not ('kegg.compound' in met.annotation):
             met.annotation['kegg.compound'] = str(adict.get('kegg.compound'))
-        met.annotation['inchikey'] = str(msm.loc[m_id]['inchikey'])
+        met.annotation['inchikey'] = str(msm.get(m_id).inchikey)
 
 
 # Gene annotation
@@ -228,8 +223,11 @@ model.metabolites.fdxo_42_c.charge = 0;
 dicts_p = []
 dicts_o = []
 rxns = [rxn for rxn in model.reactions if not (rxn.id.startswith("EX_") or rxn.id.startswith("BIOMASS") or rxn.id.startswith("DM"))]
+checker = BalanceChecker(model)
+imbalances = checker.imbalances([rxn.id for rxn in rxns])
+imbalance_rows = {}
 for rxn in rxns:
-    mb = rxn.check_mass_balance()
+    mb = imbalances.get(rxn.id)
     if mb:
         if rxn.id in isg.reactions:
             isg_rxn = isg.reactions.get_by_id(rxn.id).reaction
@@ -237,19 +235,28 @@ for rxn in rxns:
         else:
             isg_rxn = "na"
             isg_id = "na"
+        imbalance_rows[rxn.id] = dict(icbi_id=rxn.id, icbi_rxn=rxn.reaction, isg_rxn=isg_rxn, isg_id=isg_id, icbi_mb=mb, curated_rxn=isg_rxn, curation_notes="")
         if (set(mb.keys()) - set(['O'])) == set(['H','charge']):
-            dicts_p.append(dict(icbi_id=rxn.id, icbi_rxn=rxn.reaction, isg_rxn=isg_rxn, isg_id=isg_id, icbi_mb=mb, curated_rxn=isg_rxn, curation_notes=""))
+            dicts_p.append(imbalance_rows[rxn.id])
         else:
-            dicts_o.append(dict(icbi_id=rxn.id, icbi_rxn=rxn.reaction, isg_rxn=isg_rxn, isg_id=isg_id, icbi_mb=mb, curated_rxn=isg_rxn, curation_notes=""))
+            dicts_o.append(imbalance_rows[rxn.id])
 
-def write_dict_table(dict_list, path):
-    df = pd.DataFrame(dict_list)
-    df = df[['icbi_id', 'icbi_rxn','isg_rxn', 'isg_id', 'icbi_mb','curated_rxn', 'curation_notes']]
+# Reactions balanced by adding protons and water, proposed for all reactions at once. The table has the format of the
+# curated tables and can be applied in the same way after review (see 5_apply_mass_and_charge_balance_corrections.py)
+dicts_a = []
+for correction in checker.proton_water_corrections(list(imbalances)):
+    dicts_a.append(dict(imbalance_rows[correction.reaction_id], curated_rxn=correction.curated_reaction,
+                        curation_notes=correction.note, action=""))
+
+def write_dict_table(dict_list, path, columns=('icbi_id', 'icbi_rxn','isg_rxn', 'isg_id', 'icbi_mb','curated_rxn', 'curation_notes')):
+    df = pd.DataFrame(dict_list, columns=list(columns))
     df = df.sort_values(by=['icbi_id'], ascending=True)
     df.to_csv(path, index=False)
 
 write_dict_table(dicts_p, os.path.join("curation","imbalances_protons.csv"))
 write_dict_table(dicts_o, os.path.join("curation","imbalances_other.csv"))
+write_dict_table(dicts_a, os.path.join("curation","imbalances_automatic.csv"),
+                 columns=('icbi_id', 'icbi_rxn','isg_rxn', 'isg_id', 'icbi_mb','curated_rxn', 'curation_notes', 'action'))
 
 # Formulas
 met_info = {}
@@ -310,4 +317,4 @@ df = df.sort_values(by=['rxn_id'], ascending=True)
 df.to_csv(os.path.join("curation","metabolites.csv"), index=False)
 
 # M
-cb.io.save_json_model(model,os.path.join('intermediate','iCBI665_v5.json'))
+snapshot.save_json_model(model,os.path.join('intermediate','iCBI665_v5.json'))
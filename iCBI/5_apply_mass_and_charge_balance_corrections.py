@@ -3,14 +3,15 @@
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import settings
-import cobra as cb
 import pandas as pd
+from tools.balance import BalanceChecker
+from tools import snapshot
 
 
-model = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iCBI','intermediate','iCBI665_v5.json'))
+model = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iCBI','intermediate','iCBI665_v5.json'))
 
 # Missing metabolite: (Some reactions seem to treat agly_tea and glygly_tea as the same metabolite)
-isg = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iSG676','iSG676_cb.json'))
+isg = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iSG676','iSG676_cb.json'))
 model.add_metabolites(isg.metabolites.agly_tea_c)
 model.metabolites.agly_tea_c.compartment = "c0"
 
@@ -41,8 +42,9 @@ apply_corrections(os.path.join(settings.PROJECT_ROOT,'iCBI','curation','imbalanc
 
 dicts_o = []
 rxns = [rxn for rxn in model.reactions if not (rxn.id.startswith("EX_") or rxn.id.startswith("BIOMASS") or rxn.id.startswith("DM"))]
+imbalances = BalanceChecker(model).imbalances([rxn.id for rxn in rxns])
 for rxn in rxns:
-    mb = rxn.check_mass_balance()
+    mb = imbalances.get(rxn.id)
     if mb:
             dicts_o.append(dict(icbi_id=rxn.id, icbi_rxn=rxn.reaction, icbi_mb=mb))
 
@@ -53,4 +55,4 @@ df.to_csv(os.path.join("curation","imbalances_remaining.csv"), index=False)
 print("Remaining imbalances:", df.shape[0])
 
 ##--------------
-cb.io.save_json_model(model,os.path.join('intermediate','iCBI665_v6.json'))
+snapshot.save_json_model(model,os.path.join('intermediate','iCBI665_v6.json'))
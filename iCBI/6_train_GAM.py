@@ -55,6 +55,7 @@ import matplotlib.pyplot as plt
 
 import csv
 from tools.train_ATP_costs import *
+from tools.result_cache import ResultCache
 import tools.conf_model
 import cobra as cb
 import string
@@ -79,10 +80,15 @@ model = load_model()
 # In[3]:
 
 
-t_min = train(model, constraint_mode='min')
-t_mean = train(model, constraint_mode='mean')
-t_max = train(model, constraint_mode='max')
-t_both = train(model, constraint_mode='both')
+# Each data set is solved once per constraint mode, the fits below reuse this table.
+# Results are cached on disk, only data sets whose inputs changed since the last run are solved again.
+cache = ResultCache()
+atp_table = solve_atp(model, constraint_modes=['min', 'mean', 'max', 'both'], cache=cache)
+cache.close()
+t_min = fit(atp_table, constraint_mode='min')
+t_mean = fit(atp_table, constraint_mode='mean')
+t_max = fit(atp_table, constraint_mode='max')
+t_both = fit(atp_table, constraint_mode='both')
 
 
 # In[4]:
@@ -169,8 +175,7 @@ cellb.loc[cellb.GR>0.2, :]
 # Train GAM/NGAM using chemostats
 cellb_chem_idx = ds.loc[ds.Medium.str.contains('cellb') & ds.Reactor.str.contains('Chemostat'),:].index
 excl_idx = list(set(ds.index) - set(cellb_chem_idx))
-with model:
-    trainout = train(model, exclude_data_index=excl_idx , constraint_mode='both')
+trainout = fit(atp_table, constraint_mode='both', exclude_data_index=excl_idx)
 
 print(trainout)
 
@@ -200,8 +205,7 @@ ds.loc[ds.Reactor.str.contains('Batch') & ds.Medium.str.contains('avcell') , :]
 # Train using GAM/NGAM using chemostats
 cell_idx = ds.loc[ds.Medium.str.contains('avcell') & (ds.GR <0.2),:].index
 excl_idx = list(set(ds.index) - set(cell_idx)) + [7] # 7 is NaN dataset
-with model:
-    trainout_cellulose = train(model, exclude_data_index=excl_idx , constraint_mode='both')
+trainout_cellulose = fit(atp_table, constraint_mode='both', exclude_data_index=excl_idx)
 
 #trainout_cellulose.pop('gamdf')
 print(trainout_cellulose)
@@ -232,6 +236,17 @@ batch_ngam = s[1]
 batch_r = s[2]
 
 
+# In[ ]:
+
+
+# Uncertainty of the batch fit, the ATP maxima computed above are reused for every resample
+batch_resampled = resample_fit(atp_table, constraint_mode='both', indices=list(bds.index), seed=0)
+print('GAM 95% CI: {}\nNGAM 95% CI: {}'.format(batch_resampled['GAM_ci'], batch_resampled['NGAM_ci']))
+
+# Outlier scores for all batch data sets, including the excluded ones
+resample_fit(atp_table, constraint_mode='both', indices=list(ds.loc[ds.Reactor=='Batch',:].index))['outliers']
+
+
 # # Final plot
 
 # In[13]:
@@ -8,10 +8,11 @@ This script generates the final version of the model:
 # Setup
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import cobra as cb
+from tools import snapshot
+from tools.export import ModelWriter
 import settings
 
-model = cb.io.load_json_model(os.path.join(settings.PROJECT_ROOT,'iCBI','intermediate','iCBI665_v7.json'))
+model = snapshot.load_model(os.path.join(settings.PROJECT_ROOT,'iCBI','intermediate','iCBI665_v7.json'))
 
 #
 model.reactions.DRPA.bounds = (0,0)
@@ -19,6 +20,7 @@ model.reactions.DRPA.notes['curation_notes'] = 'The bounds are set to zero to co
 
 
 # Save
-cb.io.save_json_model(model, os.path.join(settings.PROJECT_ROOT,'iCBI','iCBI655_cellobiose_batch.json'))
-cb.io.write_sbml_model(model, os.path.join(settings.PROJECT_ROOT,'iCBI','iCBI655_cellobiose_batch.sbml'))
-cb.io.save_matlab_model(model, os.path.join(settings.PROJECT_ROOT,'iCBI','iCBI655_cellobiose_batch.mat'))
+with ModelWriter() as writer:
+    writer.save(model, os.path.join(settings.PROJECT_ROOT,'iCBI','iCBI655_cellobiose_batch.json'),
+                os.path.join(settings.PROJECT_ROOT,'iCBI','iCBI655_cellobiose_batch.sbml'),
+                os.path.join(settings.PROJECT_ROOT,'iCBI','iCBI655_cellobiose_batch.mat'))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+""" Runs all steps which create the iCBI model, and the iSG steps it depends on.
+
+Steps whose inputs did not change since their last run are skipped, independent steps run at the same time (see
+tools.pipeline). The script of step 6 is made from its notebook by run_all.sh before the steps are run. Run with --force
+to run all steps, with --processes N to run at most N steps at the same time.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from settings import PROJECT_ROOT, FINAL_MODEL_ROOT, MEDIA_ROOT, EXTRACELLULAR_FLUX_DATA
+from tools.pipeline import Pipeline, Step
+from steps.run_all import STEPS as ISG_STEPS, parse_arguments
+
+
+ICBI_ROOT = os.path.join(PROJECT_ROOT, 'iCBI')
+INTERMEDIATE_ROOT = os.path.join(ICBI_ROOT, 'intermediate')
+CURATION_ROOT = os.path.join(ICBI_ROOT, 'curation')
+ID_MAP = [os.path.join(ICBI_ROOT, 'id_map', 'bigg2ms_met.csv'), os.path.join(ICBI_ROOT, 'id_map', 'bigg2ms_rxn.csv')]
+ISG = os.path.join(FINAL_MODEL_ROOT, 'iSG676_cb.json')
+
+STEPS = [
+    Step('iCBI_fix_kbase_bounds', os.path.join(ICBI_ROOT, '1_fix_kbase_bounds.py'),
+         inputs=[os.path.join(ICBI_ROOT, 'kbase', 'fba_result.xls')],
+         model_input=os.path.join(ICBI_ROOT, 'kbase', 'iCBI676.xml'),
+         model_output=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v2.sbml')),
+    Step('iCBI_readd_glceq', os.path.join(ICBI_ROOT, '2_readd_glceq.py'),
+         model_input=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v2.sbml'),
+         model_output=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v3.sbml')),
+    Step('iCBI_corrections', os.path.join(ICBI_ROOT, '3_corrections.py'),
+         inputs=[ISG] + ID_MAP,
+         model_input=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v3.sbml'),
+         model_output=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v4_bigg.json')),
+    Step('iCBI_metadata_and_mass_imbalance', os.path.join(ICBI_ROOT, '4_metadata_and_mass_imbalance.py'),
+         inputs=[ISG, os.path.join(ICBI_ROOT, 'ms_info', 'compounds.tsv'),
+                 os.path.join(PROJECT_ROOT, 'genome', 'NC_017304.gb')] + ID_MAP,
+         outputs=[os.path.join(CURATION_ROOT, 'imbalances_protons.csv'),
+                  os.path.join(CURATION_ROOT, 'imbalances_other.csv'),
+                  os.path.join(CURATION_ROOT, 'imbalances_automatic.csv'),
+                  os.path.join(CURATION_ROOT, 'metabolites.csv')],
+         model_input=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v4_bigg.json'),
+         model_output=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v5.json')),
+    Step('iCBI_apply_mass_and_charge_balance_corrections',
+         os.path.join(ICBI_ROOT, '5_apply_mass_and_charge_balance_corrections.py'),
+         inputs=[ISG, os.path.join(CURATION_ROOT, 'metabolites_curated.csv'),
+                 os.path.join(CURATION_ROOT, 'imbalances_protons_curated.csv'),
+                 os.path.join(CURATION_ROOT, 'imbalances_other_curated.csv')],
+         outputs=[os.path.join(CURATION_ROOT, 'imbalances_remaining.csv')],
+         model_input=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v5.json'),
+         model_output=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v6.json')),
+    Step('iCBI_train_GAM', os.path.join(ICBI_ROOT, '6_train_GAM.py'),
+         inputs=[EXTRACELLULAR_FLUX_DATA],
+         outputs=[os.path.join(ICBI_ROOT, 'atp_training.svg'), os.path.join(MEDIA_ROOT, 'atp_param.csv')],
+         model_input=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v6.json'),
+         model_output=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v7.json')),
+    Step('iCBI_generate_final_model', os.path.join(ICBI_ROOT, '7_generate_final_model.py'),
+         outputs=[os.path.join(ICBI_ROOT, 'iCBI655_cellobiose_batch.sbml'),
+                  os.path.join(ICBI_ROOT, 'iCBI655_cellobiose_batch.mat')],
+         model_input=os.path.join(INTERMEDIATE_ROOT, 'iCBI665_v7.json'),
+         model_output=os.path.join(ICBI_ROOT, 'iCBI655_cellobiose_batch.json')),
+]
+
+
+if __name__ == '__main__':
+    force, processes = parse_arguments(sys.argv[1:])
+    Pipeline('iCBI', ISG_STEPS + STEPS).run(force=force, processes=processes)
@@ -11,18 +11,17 @@ MEDIA_ROOT = os.path.join(PROJECT_ROOT, 'media')
 EXTRACELLULAR_FLUX_DATA = os.path.join(PROJECT_ROOT, 'datasets', 'flux', 'ctherm_extracellular_flux.csv')
 ESSENTIALITY_DATA = os.path.join(PROJECT_ROOT,'datasets', 'essentiality','ctherm-gene-essentiality.csv')
 GENE_MAP = os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv')
+CACHE_ROOT = os.path.join(PROJECT_ROOT, '.cache') # Generated files which can be safely deleted
 
 
 # Other
-import csv
 def get_gene_map(order='old_to_new'):
-    gene_map = {}
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv'), 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if order == 'old_to_new':
-                gene_map[row['old_locus_tag']] = row['locus_tag']
-            elif order == 'new_to_old':
-                gene_map[row['locus_tag']] = row['old_locus_tag']
-    return gene_map
+    # The annotation table is read once, see tools.gene_annotation
+    from tools.gene_annotation import get_annotation
+    annotation = get_annotation(GENE_MAP)
+    if order == 'old_to_new':
+        return dict(annotation.old_to_new)
+    elif order == 'new_to_old':
+        return dict(annotation.new_to_old)
+    return {}
 
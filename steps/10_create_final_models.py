@@ -1,14 +1,17 @@
 import os
 from tools.conf_model import set_conditions
-import cobra as cb
+from tools import snapshot
+from tools.export import ModelWriter
 import settings
 
-model = cb.io.load_json_model(os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_5.json'))
-set_conditions(model, medium_str='cellb', secretion='common_secretion', reactor_type='batch')
-cb.io.save_json_model(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'))
-cb.io.write_sbml_model(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.xml'))
-cb.io.save_matlab_model(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.mat')) # Note that the current version of cobrapy does not save charges for the matlab model.
+model = snapshot.load_model(os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_5.json'))
+with ModelWriter() as writer: # The files are written in parallel, each one from the model as it is when saved
+    set_conditions(model, medium_str='cellb', secretion='common_secretion', reactor_type='batch')
+    # Note that the current version of cobrapy does not save charges for the matlab model.
+    writer.save(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'),
+                os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.xml'),
+                os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.mat'))
 
-set_conditions(model, medium_str='avcell', secretion='common_secretion')
-cb.io.save_json_model(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_ce.json'))
-cb.io.write_sbml_model(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_ce.xml'))
+    set_conditions(model, medium_str='avcell', secretion='common_secretion')
+    writer.save(model, os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_ce.json'),
+                os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_ce.xml'))
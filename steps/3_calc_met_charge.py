@@ -15,6 +15,7 @@ import subprocess
 import re
 import os
 from settings import PROJECT_ROOT
+from tools.charges import calc_charges
 
 
 def main():
@@ -23,19 +24,20 @@ def main():
     fileoutpath = os.path.join(PROJECT_ROOT, 'iSG', 'metabolite_nomenclature_charge_curated.csv')
 
     with open(fileinpath, 'r') as fin:
-        reader = csv.reader(fin, delimiter=',')
-        with open(fileoutpath, 'w') as fout:
-            writer = csv.writer(fout, delimiter=',')
-            # headers
-            writer.writerow(next(reader) + ['is_charge_different','charge_(chemaxon)', 'charged_formula', 'average_charge', 'charge_fail_message'])
+        rows = list(csv.reader(fin, delimiter=','))
 
-            for row in reader:
-                keggid = row[-2]
-                isg_charge = row[-3]
-                charge, charged_formula, average_charge, failmessage = calc_major_ms(keggid)
+    # Compounds are calculated in parallel batches, see tools.charges
+    results = calc_charges([row[-2] for row in rows[1:]])
 
-                row.extend([compare_charges(charge, isg_charge), charge, charged_formula, average_charge, failmessage])
-                writer.writerow(row)
+    with open(fileoutpath, 'w') as fout:
+        writer = csv.writer(fout, delimiter=',')
+        # headers
+        writer.writerow(rows[0] + ['is_charge_different','charge_(chemaxon)', 'charged_formula', 'average_charge', 'charge_fail_message'])
+
+        for row, (charge, charged_formula, average_charge, failmessage) in zip(rows[1:], results):
+            isg_charge = row[-3]
+            row.extend([compare_charges(charge, isg_charge), charge, charged_formula, average_charge, failmessage])
+            writer.writerow(row)
 
 
 def compare_charges(ch1, ch2):
@@ -50,123 +52,8 @@ def compare_charges(ch1, ch2):
         return ''
 
 
-def calc_major_ms(cpid):
-    """
-    Calculates major microspecies at pH = 7.2,
-
-    Args:
-        cpid(str): kegg compound id
-
-    Returns
-    -------
-        charge : int
-        formula : str
-        failmessage : str
-
-    """
-    failmessage = []
-
-    pH = 7.2
-
-    # get molfile from kegg
-
-    kegg_mol = 'http://www.genome.jp/dbget-bin/www_bget?-f+m+compound+'
-
-    r = requests.get(kegg_mol + cpid)
-
-    if r.text == '':
-        failmessage = 'compound {} mol file not in kegg'.format(cpid)
-        return None, None, None, failmessage
-    else:
-        with open('tempfile.mol','w') as tempfile:
-            tempfile.write(r.text)
-
-    # use chemaxon command line tool (REQUIRES LISENCE)
-
-    # Determine major microspecies:
-
-    proc = subprocess.Popen(['cxcalc','majormicrospecies','-H', str(pH), 'tempfile.mol'],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = proc.communicate()
-    if err:
-        failmessage = 'ChemAxon Error: {}'.format(err.decode("utf-8").split('\n')[0][:50]) # only report the first 51 characters of the first line of the error
-    else:
-        outsmiles = out.decode("utf-8").split('\n')[1].split('\t')[1]
-
-        with open('tempfile.smiles', 'w') as tempfile:
-            tempfile.write(outsmiles)
-
-    # Obtain charged formula:
-
-    proc = subprocess.Popen(['cxcalc','formula', 'tempfile.smiles'],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = proc.communicate()
-
-    if err:
-        failmessage = 'ChemAxon Error: {}'.format(err.decode("utf-8").split('\n')[0][:50]) # only report the first 51 characters of the first line of the error
-        charged_formula = ''
-    else:
-        try:
-            charged_formula = out.decode("utf-8").split('\n')[1].split('\t')[1]
-        except IndexError: # if smiles is empty (e.g. happens with H+) then  cxcal formula will spit a different output
-            charged_formula = ''
-    # Obtain neutral formula to compute charge
-
-    proc = subprocess.Popen(['cxcalc','formula', 'tempfile.mol'],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = proc.communicate()
-
-    if err:
-        failmessage = 'ChemAxon Error: {}'.format(err.decode("utf-8").split('\n')[0][:50]) # only report the first 51 characters of the first line of the error
-        neutral_formula = ''
-    else:
-        neutral_formula = out.decode("utf-8").split('\n')[1].split('\t')[1]
-
-    # Calculate charge
-    if charged_formula != '':
-        nh_n = get_nh(charged_formula)
-        nh_c = get_nh(neutral_formula)
-
-        charge = nh_n - nh_c
-    else:
-        charge = ''
-
-    # Also include average charge distribution in case one of the previous steps failed
-
-    proc = subprocess.Popen(['cxcalc','chargedistribution','-H',str(pH),'tempfile.mol'],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = proc.communicate()
-    if err:
-        average_charge = ''
-    else:
-        average_charge = float(out.decode("utf-8").split('\n')[1].split('\t')[2])
-
-    # remove temporary files
-    try:
-        os.remove('tempfile.mol')
-        os.remove('tempfile.smiles')
-    except FileNotFoundError:
-        pass
-
-    return charge, charged_formula, average_charge, failmessage
-
-
-def get_nh(formula):
-
-    match = re.search('H((\d+)|\w)',formula) # Captures the number after H or letter after H
-
-    if not match: # No hydrogen
-        return 0
-    else:
-        g1 = match.group(1)
-
-    try:
-        return int(g1)
-    except ValueError:
-        return 1
-
-
-main()
+if __name__ == '__main__':
+    main()
 
 """
 Altenrative approach using average charge distribution (may not return major species)
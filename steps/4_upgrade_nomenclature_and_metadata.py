@@ -16,6 +16,8 @@ This script receives iSG601_1 and outputs iSG_2. The new model features:
 import cobra as cb
 import os
 from settings import PROJECT_ROOT
+from tools import general, rename, snapshot
+from tools.gene_annotation import get_annotation
 import csv
 
 
@@ -28,7 +30,7 @@ def main():
     remove_unused_met(modelfinal)
     # update_fractional_reactions(modelfinal)
     modelfinal.id = 'iSG'
-    cb.io.json.save_json_model(modelfinal, os.path.join(PROJECT_ROOT, "iSG", "iSG_2.json"))
+    snapshot.save_json_model(modelfinal, os.path.join(PROJECT_ROOT, "iSG", "iSG_2.json"))
 
 
 def update_reactions(model):
@@ -69,17 +71,12 @@ def update_metabolites(model):
 
 
 def updates_on_file(model):
-    """ Some field changes cannot be handeled well by cobrapy so we will do a direct text substitution on the xml file
+    """ Renames old locus tags and subsystems wherever they appear (gene ids, gene-reaction rules, subsystems, notes).
+    The model is not modified, a renamed copy is returned.
     """
 
-    repdict = {}
-
     # gene info
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv'),'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['old_locus_tag']: # avoid empty keys
-                repdict[row['old_locus_tag']] = row['locus_tag']
+    repdict = {old_locus_tag: record.locus_tag for old_locus_tag, record in get_annotation().by_old_locus_tag.items()}
 
     # subsystem info
     with open(os.path.join(PROJECT_ROOT, 'iSG', 'subsystem_corrections.csv'), 'r') as f:
@@ -88,38 +85,18 @@ def updates_on_file(model):
             repdict[row['old-name']] = row['new-name']
 
     # perform substitution
-
-    tempfileid = os.path.join(PROJECT_ROOT, "iSG", "iSG_1_TEMP.json")
-    tempfileid2 = os.path.join(PROJECT_ROOT, "iSG", "iSG_1_TEMP2.json")
-    cb.io.json.save_json_model(model, tempfileid)
-
-    with open(tempfileid, 'r') as fin:
-        with open(tempfileid2, 'w') as fout:
-            for line in fin:
-                outline = line
-                for key, val in repdict.items():
-                    if key in line:
-                        outline = outline.replace(key, val)
-                fout.write(outline)
-
-    modelfinal = cb.io.load_json_model(tempfileid2)
-    os.remove(tempfileid)
-    os.remove(tempfileid2)
+    modelfinal = model.copy()
+    rename.rewrite_model(modelfinal, rename.Rewriter(repdict))
     return modelfinal
 
-def add_gene_fields(modelfinal, model):
 
-    # Create mapping dict
-    genedict = {}
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv') ,'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            genedict[row['locus_tag']] = row
+def add_gene_fields(modelfinal, model):
 
     # Add missing fields
+    genedict = get_annotation().by_locus_tag
     for gene in modelfinal.genes:
-        gene.name = genedict[gene.id]['gene']
-        gene.annotation['product'] = genedict[gene.id]['product']
+        gene.name = genedict[gene.id].gene
+        gene.annotation['product'] = genedict[gene.id].product
 
     # include old gpr as reaction note
     for reaction in modelfinal.reactions:
@@ -127,7 +104,7 @@ def add_gene_fields(modelfinal, model):
 
 
 def remove_unused_met(model):
-    unusedmet = cb.manipulation.delete.prune_unused_metabolites(model)
+    unusedmet = general.remove_unused_met(model)
 
     with open(os.path.join(PROJECT_ROOT, 'iAT601', 'unused_metabolites_in_iAT601_2.csv'), 'w') as f:
         writer = csv.writer(f, delimiter=',', lineterminator='\n')
@@ -144,4 +121,5 @@ def update_fractional_reactions(model):
     biomass_pseudomet = ['LTA_TERM', 'LP_TERM']
 """
 
-main()
+if __name__ == '__main__':
+    main()
@@ -29,12 +29,15 @@ Curation notes
 
 """
 
-import cobra as cb
 import os
 import csv
 from settings import INTERMEDIATE_MODEL_ROOT
+from tools import flux_analysis
+from tools.balance import BalanceChecker
+from tools.result_cache import ResultCache
+from tools.tics import find_cycles
+from tools import snapshot
 import pandas as pd
-import sys
 
 
 def main():
@@ -48,10 +51,17 @@ def main():
     isomer_table_path = os.path.join(INTERMEDIATE_MODEL_ROOT, 'isomers_iSG_2.csv')
     output_path = os.path.join(INTERMEDIATE_MODEL_ROOT, 'basic_model_curation_reactions.csv')
 
-    model = cb.io.load_json_model(in_model_path)
-
-    fvasol = cb.flux_analysis.flux_variability_analysis(model)
-    tics = find_tics(model, fvasol)
+    model = snapshot.load_model(in_model_path)
+
+    # FVA is only solved again when the model content changed since the last run
+    cache = ResultCache()
+    fvasol = flux_analysis.flux_variability(model, cache=cache)
+    cache.close()
+    tics = {} # Cycles through the same reactions in both directions are listed once
+    for cycle in find_cycles(model):
+        for reaction_id in cycle:
+            if list(cycle) not in tics.setdefault(reaction_id, []):
+                tics[reaction_id].append(list(cycle))
     blocked_tol = 0.0001
     blocked_rxn = {rxn.id: True for rxn in model.reactions
                    if (abs(fvasol['maximum'][rxn.id]) < blocked_tol) and (abs(fvasol['minimum'][rxn.id] < blocked_tol))}
@@ -68,6 +78,9 @@ def main():
         else:
             return None
     mass_imbal_counter = 0
+    checker = BalanceChecker(model)
+    # Water and proton corrections of all reactions at once
+    corrections = {correction.reaction_id: correction for correction in checker.proton_water_corrections()}
 
     with open(output_path, 'w', newline='', encoding='UTF-8') as f:
         writer = csv.DictWriter(f, headers)
@@ -77,7 +90,8 @@ def main():
             row['reaction_id'] = rxn.id
             row['reaction_name'] = rxn.name
 
-            old_reaction_equation, new_reaction_equation, mass_and_charge_balance_new = fix_mass_and_charge_balance(rxn)
+            old_reaction_equation, new_reaction_equation, mass_and_charge_balance_new = \
+                fix_mass_and_charge_balance(rxn, checker, corrections)
             row['old_reaction_equation'] = old_reaction_equation
             row['new_reaction_equation'] = new_reaction_equation
             row['mass_and_charge_balance_new'] = mass_and_charge_balance_new
@@ -88,7 +102,7 @@ def main():
             row['old_gpr'] = rxn.notes.get('old_gpr')[0]
             row['confidence_level'] = clear_list_brackets(rxn.notes.get('CONFIDENCE LEVEL'))
 
-            row['TIC_association'] = tics.get(rxn.id)
+            row['TIC_association'] = clear_list_brackets(tics.get(rxn.id))
             row['is_blocked'] = blocked_rxn.get(rxn.id)
 
             row['reaction_update_notes'] = reaction_update_notes.get(rxn.id)
@@ -111,43 +125,18 @@ def main():
     print('{} mass and charge imbalances fixed automatically'.format(mass_imbal_counter))
 
 
-def fix_mass_and_charge_balance(rxn):
+def fix_mass_and_charge_balance(rxn, checker, corrections):
     """ fixes most cases of mass/charge imbalance requiring the addition of water and protons.
         Other cases are often due to errors in the metabolite formula or the reaction itself
+    :param checker: tools.balance.BalanceChecker of the model
+    :param corrections: dict, k: reaction id, v: tools.balance.Correction, see BalanceChecker.proton_water_corrections
     """
     if rxn.id.startswith('EX_'):
         return rxn.reaction, rxn.reaction, 'Exchange'
 
-    try:
-        mass_and_charge_balance = rxn.check_mass_balance()
-    except:
-        mass_and_charge_balance = sys.exc_info()[0]
-
-    old_reaction_equation = rxn.reaction
-    newrxn = rxn.copy()
-
-
-    # oxygen missing, likely requires water and protons:
-    if 'O' in mass_and_charge_balance and (rxn.id != 'DCW_TERM'):
-        h2o_c = rxn.model.metabolites.get_by_id('h2o_c')
-        newrxn.add_metabolites({h2o_c: -mass_and_charge_balance['O']})
-        mass_and_charge_balance = newrxn.check_mass_balance()
-
-    # Add/remove protons: {'charge': x, 'H': x}
-    if set(mass_and_charge_balance.keys()) == {'charge', 'H'}:
-        if mass_and_charge_balance['charge'] == mass_and_charge_balance['H']:
-
-            h_c = rxn.model.metabolites.get_by_id('h_c') # watch out for comparments
-            newrxn.add_metabolites({h_c: -mass_and_charge_balance['H']})
-
-    new_reaction_equation = newrxn.reaction
-    mass_and_charge_balance_new = newrxn.check_mass_balance()
-
-    for k, v in mass_and_charge_balance_new.copy().items():
-        if abs(v) < 1e-12:
-            mass_and_charge_balance_new.pop(k)
-
-    return old_reaction_equation, new_reaction_equation, mass_and_charge_balance_new
+    if rxn.id in corrections:
+        return rxn.reaction, corrections[rxn.id].curated_reaction, {}
+    return rxn.reaction, rxn.reaction, checker.imbalance(rxn)
 
 def find_blocked_rxn(fvasol):
     # In addition to indicating that the reaction is blocked, it can also point at the cause
@@ -155,36 +144,6 @@ def find_blocked_rxn(fvasol):
     blocked_rxn = {}
     return blocked_rxn # dictionary with key is rxn.id and true if blocked
 
-def find_tics(model, fvasol):
-    """
-    :param model: cobra model
-    :param fvasol: fva solution from cobra.flux_analysis.flux_variability _analysis
-    :return: dict: keys are reaction ids, and values correspond to a list of reaction ids in a tic.
-
-    Notes:
-        - Can be optimized by manually doing fva and  keeping track of reactitons that have already being included in a tic
-
-    """
-    unbound_threshold = 600
-
-    def find_tic(unbound_threshold, model, tic_reaction_id, tic_reaction_bounds):
-        with model as tempmodel:
-            tempmodel.reactions.get_by_id(tic_reaction_id).lower_bound = tic_reaction_bounds
-            tempmodel.reactions.get_by_id(tic_reaction_id).upper_bound = tic_reaction_bounds
-            pfbasol = cb.flux_analysis.pfba(tempmodel)
-            in_tic_id = [rxn.id for rxn in tempmodel.reactions if abs(pfbasol.fluxes[rxn.id])>= unbound_threshold]
-            return in_tic_id
-
-    tics = {}
-    for reaction in model.reactions:
-        if fvasol['maximum'][reaction.id] >= unbound_threshold:
-            tics[reaction.id] = find_tic(unbound_threshold, model, reaction.id, fvasol['maximum'][reaction.id])
-        elif abs(fvasol['minimum'][reaction.id]) >= unbound_threshold:
-            tics[reaction.id] = find_tic(unbound_threshold, model, reaction.id, fvasol['minimum'][reaction.id])
-
-    return tics
-
-
 def get_reaction_update_notes(reaction_curation_table_path):
 
     reaction_update_notes = {}
@@ -228,4 +187,5 @@ def get_isomer_group(model, isomer_table_path):
     return isomer_group
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -21,8 +21,9 @@ It also removes unused metabolites after deleting certain reactions.
 import cobra as cb
 import os
 from settings import INTERMEDIATE_MODEL_ROOT, PROJECT_ROOT
+from tools import general, gpr, snapshot
+from tools.gene_annotation import get_annotation
 import csv
-import re
 
 
 def main():
@@ -32,7 +33,7 @@ def main():
                'is_blocked',	'isomer_group',	'iAT601_RAT_note',	'reaction_update_notes',	'metabolite_update_notes',
                'lower_bound',	'upper_bound',	'literature_references',	'curation_notes',	'DB_links']
 
-    model = cb.io.load_json_model(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'))
+    model = snapshot.load_model(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'))
 
     # Add new metabolites
     with open(os.path.join(INTERMEDIATE_MODEL_ROOT, 'basic_model_curation_new_metabolites.csv'), 'r', encoding='UTF-8') as f:
@@ -91,7 +92,7 @@ def main():
     add_generic_genes(model)
     remove_unused_met(model)
     change_met_name(model)
-    cb.io.save_json_model(model, os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_3.json'))
+    snapshot.save_json_model(model, os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_3.json'))
 
     print('{} duplicated reactions deleted'.format(duplicate_coutner))
 
@@ -99,39 +100,23 @@ def main():
 def add_old_gene_ids_note(model):
 
     # Get id map
-    repdict = {}
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv'), 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['old_locus_tag']: # avoid empty keys
-                repdict[row['locus_tag']] = row['old_locus_tag']
+    repdict = {locus_tag: old_locus_tag for locus_tag, old_locus_tag in get_annotation().new_to_old.items()
+               if old_locus_tag}
 
     # update
-    pattern = re.compile(r'\b(' + '|'.join(repdict.keys()) + r')\b')
     for rxn in model.reactions:
-        rxn.notes['old_gpr'] = pattern.sub(lambda x: repdict[x.group()], rxn.gene_reaction_rule)
+        rxn.notes['old_gpr'] = gpr.rename_genes(rxn.gene_reaction_rule, repdict)
 
 
 def update_gene_names(model):
-    # Get id map
-    repdict = {}
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv'), 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            repdict[row['locus_tag']] = row['gene']
+    genes = get_annotation().by_locus_tag
     for gene in model.genes:
         if gene.id not in ['s0001', 'unknown']:
-            gene.Name = repdict[gene.id]
+            gene.Name = genes[gene.id].gene
 
 
 def remove_unused_met(model):
-
-    # For some reason some unused metabolites will not be picked up on the first run...
-    lastdeletedmet = cb.manipulation.delete.prune_unused_metabolites(model)
-    unusedmet = lastdeletedmet
-    while lastdeletedmet:
-        lastdeletedmet = cb.manipulation.delete.prune_unused_metabolites(model)
-        unusedmet.extend(lastdeletedmet)
+    unusedmet = general.remove_unused_met(model)
 
     with open(os.path.join(PROJECT_ROOT, 'iSG', 'unused_metabolites_after_basic_curation.csv'), 'w') as f:
         writer = csv.writer(f, delimiter=',', lineterminator='\n')
@@ -183,21 +168,15 @@ def add_generic_genes(model):
 
     """
 
-    geneprod = {}
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv'), 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            geneprod[row['locus_tag']] = row['product']
-
     # Cellulosome
     terms = ['endoglucanases',
              'glycoside hydrolase',
              'dockerin',
              'type 3a, cellulose-binding protein']
     gpr_str = ''
-    for gene, prod in geneprod.items():
-        if prod in terms:
-            gpr_str += gene + ' or '
+    for record in get_annotation().records:
+        if record.product in terms:
+            gpr_str += record.locus_tag + ' or '
     model.reactions.CELLULOSOME_TERM.gene_reaction_rule += ' or (' + gpr_str[:-4] + ')'
 
     # ABC amino acid
@@ -241,6 +220,7 @@ def change_met_name(model):
     met.id = 'dhap_c'
     met.name = 'Dihydroxyacetone phosphate'
 
-main()
+if __name__ == '__main__':
+    main()
 
 
@@ -11,12 +11,14 @@ Notes:
 import os
 import cobra as cb
 import settings
+from tools.balance import BalanceChecker
 from tools.general import remove_unused_met
 from tools.standardization import multiply_rxn, normalize_biomass, calc_mw
+from tools import snapshot
 
 
 def main():
-    model = cb.io.load_json_model(os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_3.json'))
+    model = snapshot.load_model(os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_3.json'))
     BIOMASS_CELLULOSE, BIOMASS_CELLOBIOSE, BIOMASS_NO_CELLULOSOME = get_consolidated_reactions(model)
     remove_old_reactions(model)
     model.add_reactions([BIOMASS_CELLULOSE, BIOMASS_CELLOBIOSE, BIOMASS_NO_CELLULOSOME])
@@ -26,20 +28,21 @@ def main():
 
 
     # scale:
-    mw_cellulose = calc_mw(model.reactions.BIOMASS_CELLULOSE.check_mass_balance())
-    mw_cellulobiose = calc_mw(model.reactions.BIOMASS_CELLOBIOSE.check_mass_balance())
+    checker = BalanceChecker(model)
+    mw_cellulose = calc_mw(checker.imbalance(model.reactions.BIOMASS_CELLULOSE))
+    mw_cellulobiose = calc_mw(checker.imbalance(model.reactions.BIOMASS_CELLOBIOSE))
     print('Original biomass MW:\ncellulose:{} g/mmol\ncellobiose:{} g/mmol'.format(mw_cellulose, mw_cellulobiose))
 
-    normalize_biomass(BIOMASS_CELLULOSE)
-    normalize_biomass(BIOMASS_CELLOBIOSE)
-    normalize_biomass(BIOMASS_NO_CELLULOSOME)
+    normalize_biomass(BIOMASS_CELLULOSE, checker)
+    normalize_biomass(BIOMASS_CELLOBIOSE, checker)
+    normalize_biomass(BIOMASS_NO_CELLULOSOME, checker)
 
     # Check new BOFs are not blocked:
     for rxn_id in ['BIOMASS_CELLULOSE', 'BIOMASS_CELLOBIOSE', 'BIOMASS_NO_CELLULOSOME']:
         model.objective = rxn_id
         r = model.optimize()
         print('{}: {}'.format(rxn_id, r.objective_value))
-    cb.io.save_json_model(model, os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_4.json'))
+    snapshot.save_json_model(model, os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_4.json'))
     cb.io.write_sbml_model(model, os.path.join(settings.INTERMEDIATE_MODEL_ROOT,'iSG_4.xml'))
 
 
@@ -98,5 +101,6 @@ def get_consolidated_reactions(model):
     return BIOMASS_CELLULOSE, BIOMASS_CELLOBIOSE, BIOMASS_NO_CELLULOSOME
 
 
-main()
+if __name__ == '__main__':
+    main()
 
@@ -11,11 +11,11 @@ The output table contains:
 
 import os
 from settings import PROJECT_ROOT, INTERMEDIATE_MODEL_ROOT
+from tools.gene_annotation import get_annotation
+from tools.model_view import load_view
 import xlrd
-import csv
 import pandas as pd
 from collections import Counter
-import cobra as cb
 
 
 def main():
@@ -38,14 +38,9 @@ def main():
     count_dict = Counter(all_gene_ids)
 
     # New ids
-    genedict_id = {}
-    genedict_product = {}
-    with open(os.path.join(PROJECT_ROOT, 'genome', 'gene_update.csv'), 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['old_locus_tag']:  # avoid empty keys
-                genedict_id[row['old_locus_tag']] = row['locus_tag']
-                genedict_product[row['old_locus_tag']] = row['product']
+    genes = get_annotation().by_old_locus_tag
+    genedict_id = {old_locus_tag: record.locus_tag for old_locus_tag, record in genes.items()}
+    genedict_product = {old_locus_tag: record.product for old_locus_tag, record in genes.items()}
 
 
     # Gather
@@ -64,7 +59,7 @@ def main():
     df['generic_or_non_metabolic'] = df['product'].apply(lambda prod: is_gen(prod))
 
     # Note if gene is in model
-    model = cb.io.load_json_model(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'))
+    model = load_view(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'))
     insg2 = {}
     for gene in model.genes:
         if gene.id in df['new_ids'].values:
@@ -86,5 +81,6 @@ def parse_sheet(path, sheet_id, row_start, id_col):
     return {cell.value for cell in sheet.col(colx=ind_id_col, start_rowx=ind_row_start) if cell.value.startswith('Clo1313')}
 
 
-main()
+if __name__ == '__main__':
+    main()
 
@@ -1,10 +1,82 @@
-""" Runs all steps which create the current model
+""" Runs all steps which create the current model.
+
+Steps whose inputs did not change since their last run are skipped, independent steps run at the same time (see
+tools.pipeline). Steps done in notebooks (1, 2, 8, 9) are not part of the pipeline, their outputs are inputs of the
+pipeline. Run with --force to run all steps, with --processes N to run at most N steps at the same time.
 """
 
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from settings import PROJECT_ROOT, INTERMEDIATE_MODEL_ROOT, FINAL_MODEL_ROOT, MEDIA_ROOT, GENE_MAP
+from tools.pipeline import Pipeline, Step
+
+
+STEPS_ROOT = os.path.dirname(os.path.abspath(__file__))
+PROTEOMICS_ROOT = os.path.join(PROJECT_ROOT, 'datasets', 'protein', 'raw-data')
+
+STEPS = [
+    Step('calc_met_charge', os.path.join(STEPS_ROOT, '3_calc_met_charge.py'),
+         inputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'metabolite_nomenclature_curated.csv')],
+         outputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'metabolite_nomenclature_charge_curated.csv')]),
+    Step('upgrade_nomenclature_and_metadata', os.path.join(STEPS_ROOT, '4_upgrade_nomenclature_and_metadata.py'),
+         inputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG601_1.xml'),
+                 os.path.join(INTERMEDIATE_MODEL_ROOT, 'reaction_nomenclature-curated.csv'),
+                 os.path.join(INTERMEDIATE_MODEL_ROOT, 'final_metabolite_nomenclature_charge_curated.csv'),
+                 os.path.join(INTERMEDIATE_MODEL_ROOT, 'subsystem_corrections.csv'),
+                 GENE_MAP],
+         outputs=[os.path.join(PROJECT_ROOT, 'iAT601', 'unused_metabolites_in_iAT601_2.csv')],
+         model_output=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json')),
+    Step('identify_isomers', os.path.join(STEPS_ROOT, 'identify_isomers.py'),
+         outputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'isomers_iSG_2.csv')],
+         model_input=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json')),
+    Step('find_active_proteins', os.path.join(STEPS_ROOT, 'find_active_proteins.py'),
+         inputs=[os.path.join(PROTEOMICS_ROOT, '1', '07142015wt_v_hydG-ech_25pct3.xlsx'),
+                 os.path.join(PROTEOMICS_ROOT, '2', 's2.xlsx'),
+                 os.path.join(PROTEOMICS_ROOT, '3', 'Formate_Proteome_Data.xlsx'),
+                 os.path.join(PROTEOMICS_ROOT, '4', '13068_2016_528_MOESM4_ESM.xlsx'),
+                 GENE_MAP],
+         outputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'proteomics_detected_genes.csv')],
+         model_input=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json')),
+    Step('create_curation_table', os.path.join(STEPS_ROOT, '5_create_curation_table.py'),
+         inputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'final_metabolite_nomenclature_charge_curated.csv'),
+                 os.path.join(INTERMEDIATE_MODEL_ROOT, 'reaction_nomenclature-curated.csv'),
+                 os.path.join(INTERMEDIATE_MODEL_ROOT, 'isomers_iSG_2.csv')],
+         outputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'basic_model_curation_reactions.csv')],
+         model_input=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json')),
+    Step('basic_model', os.path.join(STEPS_ROOT, '6_basic_model.py'),
+         inputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'basic_model_curation_new_metabolites.csv'),
+                 os.path.join(INTERMEDIATE_MODEL_ROOT, 'basic_model_curation_reactions_curated.csv'),
+                 GENE_MAP],
+         outputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'unused_metabolites_after_basic_curation.csv')],
+         model_input=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'),
+         model_output=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_3.json')),
+    Step('consolidate_BOF', os.path.join(STEPS_ROOT, '7_consolidate_BOF.py'),
+         outputs=[os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_4.xml')],
+         model_input=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_3.json'),
+         model_output=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_4.json')),
+    # media/atp_param.csv is also read, but it is written by the iCBI GAM training, which depends on this step
+    Step('create_final_models', os.path.join(STEPS_ROOT, '10_create_final_models.py'),
+         inputs=[os.path.join(MEDIA_ROOT, 'comp_minimal_cellobiose.csv'),
+                 os.path.join(MEDIA_ROOT, 'comp_minimal_cellulose.csv'),
+                 os.path.join(MEDIA_ROOT, 'common_secretion.csv')],
+         outputs=[os.path.join(FINAL_MODEL_ROOT, 'iSG676_cb.xml'),
+                  os.path.join(FINAL_MODEL_ROOT, 'iSG676_cb.mat'),
+                  os.path.join(FINAL_MODEL_ROOT, 'iSG676_ce.json'),
+                  os.path.join(FINAL_MODEL_ROOT, 'iSG676_ce.xml')],
+         model_input=os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_5.json'),
+         model_output=os.path.join(FINAL_MODEL_ROOT, 'iSG676_cb.json')),
+]
+
+
+def parse_arguments(arguments):
+    """ :return: force, processes (None if not given)"""
+    processes = None
+    if '--processes' in arguments:
+        processes = int(arguments[arguments.index('--processes') + 1])
+    return '--force' in arguments, processes
+
 
-upgrade = __import__('4_upgrade_nomenclature_and_metadata')
-upgrade.main()
-basic = __import__('6_basic_model')
-basic.main()
-consolidate = __import__('7_consolidate_BOF')
-consolidate.main()
+if __name__ == '__main__':
+    force, processes = parse_arguments(sys.argv[1:])
+    Pipeline('iSG', STEPS).run(force=force, processes=processes)
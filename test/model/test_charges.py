@@ -0,0 +1,99 @@
+"""
+Make sure that charges are calculated from the fetched mol files, in batches, with a local stand-in for KEGG and a
+fake cxcalc, and that compounds which fail in a batch get the same results as when calculated one by one
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from tools.charges import KeggMolFetcher, Cxcalc, calc_charges, calc_major_ms
+
+# The fake mol files have the neutral formula, the charged formula and the average charge, or the error of cxcalc
+MOL_FILES = {'C00033': 'acetate\nC2H4O2\nC2H3O2\n-1.0', 'C00014': 'ammonium\nH3N\nH4N\n1.0',
+             'C00080': 'proton\nH\n\n1.0', 'C00999': 'error\nInvalid molecule'}
+
+# Writes one row per record of sdf and smiles files, and logs its calls
+FAKE_CXCALC = """
+import os, sys
+plugin, path = sys.argv[1], sys.argv[-1]
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calls.log'), 'a') as f:
+    f.write(plugin + '\\n')
+with open(path) as f:
+    text = f.read()
+if path.endswith('.smiles'):
+    records = [[line] for line in text.split('\\n') if line]
+else:
+    records = [record.split('\\n') for record in text.split('$$$$\\n') if record]
+print('id\\tvalue')
+for i, lines in enumerate(records, 1):
+    if lines[0] == 'error':
+        sys.stderr.write(lines[1] + '\\n')
+    elif path.endswith('.smiles'):
+        print('{}\\t{}'.format(i, lines[0]))
+    elif plugin == 'majormicrospecies':
+        print('{}\\t{}'.format(i, lines[2]))
+    elif plugin == 'formula':
+        print('{}\\t{}'.format(i, lines[1]))
+    elif plugin == 'chargedistribution':
+        print('{}\\t7.2\\t{}'.format(i, lines[3]))
+"""
+
+EXPECTED = {'C00033': (-1, 'C2H3O2', -1.0, []), 'C00014': (1, 'H4N', 1.0, []), 'C00080': ('', '', 1.0, []),
+            'C00999': ('', '', '', 'ChemAxon Error: Invalid molecule'),
+            'C99999': (None, None, None, 'compound C99999 mol file not in kegg')}
+
+fetched = []
+
+
+class KeggHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        cpid = self.path.split('+')[-1]
+        fetched.append(cpid)
+        body = MOL_FILES.get(cpid, '').encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+directory = tempfile.mkdtemp()
+server = HTTPServer(('127.0.0.1', 0), KeggHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+try:
+    cxcalc_path = os.path.join(directory, 'cxcalc.py')
+    with open(cxcalc_path, 'w') as f:
+        f.write(FAKE_CXCALC)
+    log_path = os.path.join(directory, 'calls.log')
+
+    def count_calls():
+        if not os.path.isfile(log_path):
+            return 0
+        with open(log_path) as f:
+            return len(f.read().split())
+
+    fetcher = KeggMolFetcher(url='http://127.0.0.1:{}/?-f+m+compound+'.format(server.server_port),
+                             cache_root=os.path.join(directory, 'cache'), connections=4)
+    cxcalc = Cxcalc([sys.executable, cxcalc_path])
+
+    # One call per plugin for the batch, the proton has no smiles and is calculated alone (4 calls)
+    cpids = ['C00033', 'C00014', 'C00033', 'C00080']
+    assert calc_charges(cpids, fetcher=fetcher, cxcalc=cxcalc, workers=1) == [EXPECTED[cpid] for cpid in cpids]
+    assert count_calls() == 8
+    assert sorted(fetched) == sorted(set(cpids))
+    for cpid in set(cpids):
+        assert calc_major_ms(cpid, fetcher, cxcalc) == EXPECTED[cpid]
+
+    # A batch with an error is calculated one by one, batches run in parallel, mol files are read from the cache
+    cpids = list(EXPECTED)
+    assert calc_charges(cpids, fetcher=fetcher, cxcalc=cxcalc, workers=2, batch_size=2) == \
+        [EXPECTED[cpid] for cpid in cpids]
+    assert sorted(fetched) == sorted(['C00033', 'C00014', 'C00080', 'C00999', 'C99999'])
+finally:
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(directory)
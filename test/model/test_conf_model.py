@@ -0,0 +1,40 @@
+"""
+Make sure that a condition plan reads the medium, its id and the ATP parameters from the media directory it is given
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+import cobra as cb
+from tools.conf_model import ConditionPlan
+import settings
+
+model = cb.io.load_json_model(os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'))
+default = ConditionPlan(model, 'comp_minimal_cellobiose')
+
+# A medium which is only in another directory, where the batch GAM is doubled
+directory = tempfile.mkdtemp()
+try:
+    shutil.copy(os.path.join(settings.MEDIA_ROOT, 'comp_minimal_cellobiose.csv'),
+                os.path.join(directory, 'custom_cellobiose.csv'))
+    with open(os.path.join(settings.MEDIA_ROOT, 'atp_param.csv')) as f:
+        lines = f.read().split('\n')
+    values = lines[1].split(',')
+    lines[1] = ','.join(values[:-1] + [str(2 * float(values[-1]))])
+    with open(os.path.join(directory, 'atp_param.csv'), 'w') as f:
+        f.write('\n'.join(lines))
+
+    try:
+        ConditionPlan(model, 'custom_cellobiose')
+        assert False
+    except ValueError:
+        pass
+
+    plan = ConditionPlan(model, 'custom_cellobiose', media_path=directory)
+    assert (plan.medium_id, plan.bof_id) == ('custom_cellobiose', 'BIOMASS_CELLOBIOSE')
+    assert plan.gam == 2 * default.gam
+    assert plan.reaction_ids == default.reaction_ids
+    assert np.array_equal(plan.lower_bounds, default.lower_bounds, equal_nan=True)
+    assert np.array_equal(plan.upper_bounds, default.upper_bounds, equal_nan=True)
+finally:
+    shutil.rmtree(directory)
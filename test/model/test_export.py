@@ -0,0 +1,30 @@
+"""
+Make sure that the files written in parallel have the model as it was when save was called
+"""
+import os
+import shutil
+import tempfile
+import cobra as cb
+from tools.export import ModelWriter
+import settings
+
+directory = tempfile.mkdtemp()
+try:
+    model = cb.io.load_json_model(os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'))
+    lower_bound = model.reactions.PGK.lower_bound
+    paths = [os.path.join(directory, name) for name in ['a.json', 'a.xml', 'a.mat', 'b.json']]
+    with ModelWriter(processes=2) as writer:
+        writer.save(model, *paths[:3])
+        model.reactions.PGK.lower_bound = -10
+        writer.save(model, paths[3])
+    assert cb.io.load_json_model(paths[0]).reactions.PGK.lower_bound == lower_bound
+    assert os.path.isfile(paths[1]) and os.path.isfile(paths[2])
+    assert cb.io.load_json_model(paths[3]).reactions.PGK.lower_bound == -10
+
+    try:
+        ModelWriter().save(model, os.path.join(directory, 'a.txt'))
+        assert False
+    except ValueError:
+        pass
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,58 @@
+"""
+Make sure that the compound index has the values of the ModelSEED compounds table, and that it is written again when
+the table changes
+"""
+import os
+import shutil
+import tempfile
+from tools.ms_compounds import load_index, index_path
+
+TABLE = """id\tabbreviation\tname\tformula\tmass\tinchikey\tcharge\taliases
+cpd00001\th2o\tH2O\tH2O\t18.0\tXLYOFNOQVPJJNP-UHFFFAOYSA-N\t0\tName:Water|H2O;BiGG:h2o;KEGG:C00001|C01328
+cpd00027\tglc-D\tD-Glucose\tC6H12O6\t180.0\tWQZGKKKJIJFFOK-GASJEMHNSA-N\t0\tBiGG:glc__D;KEGG:C00031
+cpd00067\th\tH+\tH\t1.0\tnull\t1\tBiGG:h
+cpd12828\tglutrnagln\tL-Glutamyl-tRNA(Gln)\tnull\t0\tnull\t-1\tnull
+cpd99999\tdup\tD-Glucose duplicate\tC6H12O6\t180.0\tnull\t0\tBiGG:glc__D
+cpd00001\th2o\tRepeated\tH3O\t19.0\tnull\t1\tnull
+"""
+
+directory = tempfile.mkdtemp()
+try:
+    path = os.path.join(directory, 'compounds.tsv')
+    with open(path, 'w') as f:
+        f.write(TABLE)
+    compounds = load_index(path)
+    assert os.path.isfile(index_path(path))
+    assert len(compounds) == 5
+    assert 'cpd00027' in compounds and 'cpd00002' not in compounds and None not in compounds
+
+    water = compounds.get('cpd00001')
+    assert (water.formula, water.charge, water.inchikey) == ('H2O', 0, 'XLYOFNOQVPJJNP-UHFFFAOYSA-N')
+    assert water.aliases == {'Name': ['Water', 'H2O'], 'BiGG': ['h2o'], 'KEGG': ['C00001', 'C01328']}
+    assert compounds.get('cpd00067') == ('cpd00067', 'H', 1, None, {'BiGG': ['h']})
+    assert compounds.get('cpd12828') == ('cpd12828', None, -1, None, {})
+    assert compounds.get('cpd00002') is None
+
+    assert compounds.find('BiGG', 'glc__D') == ['cpd00027', 'cpd99999']
+    assert compounds.find('KEGG', 'C01328') == ['cpd00001']
+    assert compounds.find('KEGG', 'glc__D') == []
+
+    # Up to date indexes are used as they are, changed tables are indexed again. Indexes are closed before, since an
+    # index file which is still mapped cannot be replaced on Windows.
+    index = load_index(path)
+    assert index.source_hash == compounds.source_hash
+    index.close()
+    compounds.close()
+    with open(path, 'a') as f:
+        f.write('cpd00002\tatp\tATP\tC10H13N5O13P3\t504.0\tnull\t-3\tBiGG:atp\n')
+    compounds = load_index(path)
+    assert compounds.get('cpd00002').charge == -3 and compounds.find('BiGG', 'atp') == ['cpd00002']
+    compounds.close()
+
+    # An empty table gives an empty index
+    with open(path, 'w') as f:
+        f.write(TABLE.split('\n')[0] + '\n')
+    compounds = load_index(path)
+    assert len(compounds) == 0 and 'cpd00001' not in compounds and compounds.find('BiGG', 'h2o') == []
+finally:
+    shutil.rmtree(directory)
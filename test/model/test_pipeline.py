@@ -0,0 +1,85 @@
+"""
+Make sure that pipeline steps are only run again when their inputs or outputs changed, and that steps run after the
+steps which write their inputs
+"""
+import os
+import shutil
+import tempfile
+from tools.pipeline import Pipeline, Step
+
+SCRIPT = """
+def main():
+    with open('{}') as f:
+        text = f.read()
+    with open('{}', 'w') as f:
+        f.write(text.strip() + '{}')
+"""
+
+directory = tempfile.mkdtemp()
+try:
+    paths = {name: os.path.join(directory, name) for name in ['source.txt', 'a.txt', 'b.txt', 'c.txt', 'state.json']}
+
+    def make_step(name, source, destination, suffix):
+        script = os.path.join(directory, name + '.py')
+        with open(script, 'w') as f:
+            f.write(SCRIPT.format(source, destination, suffix))
+        return Step(name, script, inputs=[source], outputs=[destination])
+
+    with open(paths['source.txt'], 'w') as f:
+        f.write('a')
+    copy = make_step('copy', paths['source.txt'], paths['a.txt'], '')
+    pipeline = Pipeline('test', [copy], state_path=paths['state.json'])
+
+    assert pipeline.run(processes=1) == ['copy']
+    assert pipeline.run(processes=1) == []
+    assert pipeline.run(force=True, processes=1) == ['copy']
+
+    # Changed input
+    with open(paths['source.txt'], 'w') as f:
+        f.write('b\n')
+    assert pipeline.run(processes=1) == ['copy']
+    with open(paths['a.txt']) as f:
+        assert f.read() == 'b'
+
+    # Missing output
+    os.remove(paths['a.txt'])
+    assert pipeline.run(processes=1) == ['copy']
+    assert pipeline.run(processes=1) == []
+
+    # Steps are ordered by their inputs and outputs, independent steps run in parallel
+    steps = [make_step('join', paths['b.txt'], paths['c.txt'], 'c'), copy,
+             make_step('append', paths['a.txt'], paths['b.txt'], 'b'),
+             make_step('other', paths['source.txt'], os.path.join(directory, 'other.txt'), '')]
+    pipeline = Pipeline('test', steps, state_path=paths['state.json'])
+    assert pipeline.dependencies == {'join': ['append'], 'copy': [], 'append': ['copy'], 'other': []}
+    assert pipeline.run(processes=2) == ['join', 'append', 'other']
+    with open(paths['c.txt']) as f:
+        assert f.read() == 'bbc'
+    assert set(pipeline.wall_times) == {'join', 'append', 'other'}
+    with open(paths['source.txt'], 'w') as f:
+        f.write('b')
+    assert pipeline.run(processes=2) == ['copy', 'other'] # a.txt is the same, the steps after copy are up to date
+
+    # Steps with missing inputs are skipped, steps after a failed step are not run
+    skipped = make_step('skipped', os.path.join(directory, 'missing.txt'), os.path.join(directory, 'd.txt'), '')
+    failing = make_step('failing', paths['source.txt'], os.path.join(directory, 'missing', 'e.txt'), '')
+    after_failing = make_step('after_failing', os.path.join(directory, 'missing', 'e.txt'),
+                              os.path.join(directory, 'f.txt'), '')
+    pipeline = Pipeline('test', [skipped, failing, after_failing, copy], state_path=paths['state.json'])
+    try:
+        pipeline.run(force=True, processes=2)
+        assert False
+    except FileNotFoundError:
+        pass
+    assert pipeline.wall_times.keys() == {'copy'}
+
+    for steps in [[copy, copy], [copy, make_step('copy_again', paths['source.txt'], paths['a.txt'], '')],
+                  [make_step('forth', paths['a.txt'], paths['b.txt'], ''),
+                   make_step('back', paths['b.txt'], paths['a.txt'], '')]]:
+        try:
+            Pipeline('test', steps)
+            assert False
+        except ValueError:
+            pass
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,44 @@
+"""
+Make sure that cached values are returned as stored, and that the access times of lookups, which are written later,
+decide which entries are evicted
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+from tools.result_cache import ResultCache
+
+directory = tempfile.mkdtemp()
+try:
+    path = os.path.join(directory, 'results.sqlite')
+    cache = ResultCache(path, max_entries=2)
+    cache.set_many({'a': 1, 'b': [1.5, None]})
+    assert cache.get('a') == 1 and cache.get('b') == [1.5, None] and cache.get('c') is None
+
+    # Lookups do not write to the file until the next flush
+    with sqlite3.connect(path) as connection:
+        accessed = dict(connection.execute('SELECT key, last_access FROM results'))
+    assert cache.get('a') == 1
+    with sqlite3.connect(path) as connection:
+        assert dict(connection.execute('SELECT key, last_access FROM results')) == accessed
+    cache.flush()
+    with sqlite3.connect(path) as connection:
+        assert dict(connection.execute('SELECT key, last_access FROM results'))['a'] > accessed['a']
+
+    # b was looked up after a, so a is the least recently used entry once c is added
+    cache.get('a')
+    cache.get('b')
+    cache.set('c', {'x': 2})
+    assert len(cache) == 2 and cache.get('a') is None and cache.get('b') == [1.5, None]
+    cache.close()
+
+    # Access times of lookups are written on close
+    cache = ResultCache(path, max_entries=2)
+    cache.get('c')
+    cache.close()
+    cache = ResultCache(path, max_entries=2)
+    cache.set('d', 3)
+    assert cache.get('b') is None and cache.get('c') == {'x': 2}
+    cache.close()
+finally:
+    shutil.rmtree(directory)
@@ -0,0 +1,85 @@
+"""
+Make sure that a model loaded from its snapshot is the same as the model loaded from json, and that snapshots of
+changed model files are not used
+"""
+import json
+import os
+import shutil
+import tempfile
+from multiprocessing import Pool
+import cobra as cb
+from cobra.io.dict import model_to_dict
+from tools import snapshot
+from tools.model_view import load_view
+import settings
+
+directory = tempfile.mkdtemp()
+try:
+    path = os.path.join(directory, 'iSG676_cb.json')
+    shutil.copy(os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'), path)
+    expected = cb.io.load_json_model(path)
+
+    # The first load parses the json file and writes the snapshot, the second one uses it
+    assert not os.path.isfile(snapshot.snapshot_path(path))
+    for model in [snapshot.load_model(path), snapshot.load_model(path)]:
+        assert json.dumps(model_to_dict(model)) == json.dumps(model_to_dict(expected))
+        assert abs(model.slim_optimize() - expected.slim_optimize()) < 1e-9
+        for reaction in model.reactions:
+            assert reaction.model is model
+            assert all(met.model is model and reaction in met.reactions for met in reaction.metabolites)
+            assert all(gene.model is model and reaction in gene.reactions for gene in reaction.genes)
+    assert os.path.isfile(snapshot.snapshot_path(path))
+
+    arrays = snapshot.load_arrays(path)
+    assert arrays.reaction_ids == [reaction.id for reaction in expected.reactions]
+    assert arrays.stoichiometry[arrays.metabolite_ids.index('atp_c'), arrays.reaction_ids.index('PGK')] == \
+        expected.reactions.PGK.metabolites[expected.metabolites.atp_c]
+    first_reaction = model_to_dict(expected)['reactions'][0]
+    assert arrays.extras('reactions')[0] == {key: first_reaction[key] for key in ['notes', 'annotation']
+                                             if key in first_reaction}
+
+    # The view answers the same metadata queries without building the model
+    view = load_view(path)
+    assert [met.id for met in view.metabolites] == [met.id for met in expected.metabolites]
+    for met in expected.metabolites:
+        record = view.metabolites.get_by_id(met.id)
+        assert (record.formula, record.charge, record.notes) == (met.formula, met.charge, met.notes)
+        assert {reaction.id for reaction in record.reactions} == {reaction.id for reaction in met.reactions}
+    for gene in expected.genes:
+        assert {reaction.id for reaction in view.genes.get_by_id(gene.id).reactions} == \
+            {reaction.id for reaction in gene.reactions}
+    assert {met.id: coefficient for met, coefficient in view.reactions.get_by_id('PGK').metabolites.items()} == \
+        {met.id: coefficient for met, coefficient in expected.reactions.PGK.metabolites.items()}
+    assert view.notes_by_key('CONFIDENCE LEVEL') == {reaction.id: reaction.notes['CONFIDENCE LEVEL']
+                                                     for reaction in expected.reactions
+                                                     if 'CONFIDENCE LEVEL' in reaction.notes}
+
+    # A saved model gets a new snapshot
+    expected.reactions.PGK.lower_bound = -10
+    snapshot.save_json_model(expected, path)
+    assert snapshot.load_arrays(path).lower_bounds[arrays.reaction_ids.index('PGK')] == -10
+    assert snapshot.load_model(path).reactions.PGK.lower_bound == -10
+
+    # A model file changed by other means is parsed again
+    cb.io.save_json_model(cb.io.load_json_model(os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json')), path)
+    lower_bound = cb.io.load_json_model(path).reactions.PGK.lower_bound
+    assert lower_bound != -10
+    assert snapshot.load_model(path).reactions.PGK.lower_bound == lower_bound
+
+    # Processes loading a model without snapshot at the same time each write it
+    path = os.path.join(directory, 'iSG_2.json')
+    shutil.copy(os.path.join(settings.INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'), path)
+    with open(path) as f:
+        expected_ids = [reaction['id'] for reaction in json.load(f)['reactions']]
+    with Pool(4) as pool:
+        assert [loaded.reaction_ids for loaded in pool.map(snapshot.load_arrays, [path] * 4)] == [expected_ids] * 4
+    assert sorted(os.listdir(directory)) == sorted(['iSG676_cb.json', 'iSG676_cb.json.snapshot.npz', 'iSG_2.json',
+                                                   'iSG_2.json.snapshot.npz'])
+
+    # The model of an sbml file can be simulated in the process which parsed the file for its snapshot
+    path = os.path.join(directory, 'iCBI676.xml')
+    shutil.copy(os.path.join(settings.PROJECT_ROOT, 'iCBI', 'kbase', 'iCBI676.xml'), path)
+    model = load_view(path).model
+    assert len(cb.flux_analysis.flux_variability_analysis(model, model.reactions[:3])) == 3
+finally:
+    shutil.rmtree(directory)
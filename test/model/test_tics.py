@@ -0,0 +1,44 @@
+"""
+Make sure that the enumerated TICs are the minimal internal cycles, both in a small network with known cycles and in
+the final model
+"""
+import os
+import cobra as cb
+from tools import tics
+import settings
+
+# Known cycles: R1 R2 R3 (both directions, all reversible), R1 R4 and R4 R3 R2 (R4 irreversible). EX_a is a boundary
+# reaction, R5 only consumes d and cannot be part of a cycle.
+toy = cb.Model('toy')
+a, b, c, d = [cb.Metabolite(met_id, compartment='c') for met_id in ['a', 'b', 'c', 'd']]
+for reaction_id, stoichiometry, bounds in [('R1', {a: -1, b: 1}, (-1000, 1000)),
+                                           ('R2', {b: -1, c: 1}, (-1000, 1000)),
+                                           ('R3', {c: -1, a: 1}, (-1000, 1000)),
+                                           ('R4', {b: -1, a: 1}, (0, 1000)),
+                                           ('R5', {d: -1, c: 1}, (0, 1000)),
+                                           ('EX_a', {a: -1}, (-1000, 1000))]:
+    reaction = cb.Reaction(reaction_id, lower_bound=bounds[0], upper_bound=bounds[1])
+    toy.add_reactions([reaction])
+    reaction.add_metabolites(stoichiometry)
+
+expected = [{'R1': 1, 'R2': 1, 'R3': 1}, {'R1': -1, 'R2': -1, 'R3': -1}, {'R1': 1, 'R4': 1},
+            {'R4': 1, 'R3': -1, 'R2': -1}]
+cycles = tics.find_cycles(toy)
+assert len(cycles) == len(expected), cycles
+for cycle in expected:
+    assert any(set(cycle) == set(found) and all(abs(found[k] - v) < 1e-9 for k, v in cycle.items())
+               for found in cycles), cycle
+assert tics.cycle_membership(cycles)['R1'] == [0, 1, 2]
+
+# Cycles of the final model are steady states of internal reactions and none contains another
+model = cb.io.load_json_model(os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'))
+boundary = {reaction.id for reaction in model.boundary}
+cycles = tics.find_cycles(model)
+for cycle in cycles:
+    assert not boundary & set(cycle), cycle
+    balance = {}
+    for reaction_id, flux in cycle.items():
+        for met, coefficient in model.reactions.get_by_id(reaction_id).metabolites.items():
+            balance[met.id] = balance.get(met.id, 0) + coefficient * flux
+    assert all(abs(value) < 1e-6 for value in balance.values()), cycle
+    assert not any(set(other) < set(cycle) for other in cycles), cycle
@@ -0,0 +1,28 @@
+"""
+Make sure that the ATP maxima solved over a process pool are the same as the ones solved in this process, and that
+unknown constraint modes are reported
+"""
+import os
+import numpy as np
+import cobra as cb
+from tools import conditions
+from tools.conf_model import set_experimental_flux_reaction_bounds
+from tools.train_ATP_costs import solve_atp
+import settings
+
+model = cb.io.load_json_model(os.path.join(settings.FINAL_MODEL_ROOT, 'iSG676_cb.json'))
+data = conditions.get_flux_data(settings.EXTRACELLULAR_FLUX_DATA)
+indices = list(data)[:2]
+
+# The workers solve the jobs on their own copies of the model, so the maxima can differ in the last bits
+serial = solve_atp(model, indices, ['both', 'min'], processes=1)
+parallel = solve_atp(model, indices, ['both', 'min'], processes=2)
+assert (serial['status'] == 'optimal').all()
+assert serial.drop(columns='ATP').equals(parallel.drop(columns='ATP'))
+assert np.allclose(serial['ATP'], parallel['ATP'], rtol=0, atol=1e-9)
+
+try:
+    set_experimental_flux_reaction_bounds(data[indices[0]], 'BIOMASS_CELLOBIOSE', model, 'average')
+    assert False
+except ValueError:
+    pass
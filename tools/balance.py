@@ -0,0 +1,236 @@
+"""
+Mass and charge balance of all reactions at once.
+
+The formula of every metabolite is parsed once into a row of an element composition matrix (metabolites x elements,
+with charge as the last column). The imbalance of every reaction is then one sparse matrix product of the
+stoichiometric matrix with this matrix. After a reaction or a metabolite formula changes, only the imbalances of the
+affected reactions are computed again.
+
+Most imbalances of curated reactions are missing protons and water. Adding x water and y protons changes the oxygen
+imbalance by x, the charge by y and the hydrogen by 2x + y, so there is at most one such correction per reaction; the
+corrections of all reactions are found with one vectorized solution of this system.
+
+Imbalances are returned in the same form as cobra.Reaction.check_mass_balance: a dictionary with the unbalanced
+elements and charge, in the order in which they appear in the reaction. The sums are computed in the same order as
+well, so the values are identical.
+
+Usage:
+    checker = BalanceChecker(model)
+    checker.imbalances() # k: reaction id, v: {'charge': -1.0, 'H': -1.0}, only unbalanced reactions
+    model.metabolites.h_c.charge = 1
+    checker.update_metabolite(model.metabolites.h_c)
+    checker.proton_water_corrections() # Reactions balanced by adding protons and water only
+"""
+
+from collections import namedtuple
+import numpy as np
+from scipy import sparse
+
+
+# added: dict, k: metabolite id, v: coefficient added to the reaction. curated_reaction: reaction string after the
+# addition. note: proton and water compartment choice and non-integer coefficients, empty otherwise.
+Correction = namedtuple('Correction', ['reaction_id', 'imbalance', 'added', 'curated_reaction', 'note'])
+
+
+class BalanceChecker(object):
+    """
+    Args:
+        model(cobra.Model): Metabolites without a parseable formula (see cobra.Metabolite.elements) make the
+            imbalance of their reactions undefined, checking those raises a ValueError as check_mass_balance does
+        zero_cutoff(float): Absolute imbalances below this value are considered balanced (floating point noise)
+    Attributes:
+        elements(list): Columns of the composition matrix, charge is the last one
+    """
+
+    def __init__(self, model, zero_cutoff=1e-12):
+        self.model = model
+        self.zero_cutoff = zero_cutoff
+        self._compositions = {} # k: metabolite id, v: elements dictionary as parsed by cobra, None if not parseable
+        self._charges = {}
+        self._build()
+
+    def _build(self):
+        for met in self.model.metabolites:
+            if met.id not in self._compositions:
+                self._compositions[met.id] = met.elements
+                self._charges[met.id] = met.charge
+        elements = []
+        for composition in self._compositions.values():
+            for element in composition or {}:
+                if element not in elements:
+                    elements.append(element)
+        self.elements = elements + ['charge']
+        self._element_position = {element: i for i, element in enumerate(self.elements)}
+
+        met_ids = list(self._compositions)
+        met_position = {met_id: i for i, met_id in enumerate(met_ids)}
+        self._met_rows = {met_id: self._composition_row(met_id) for met_id in met_ids}
+        composition = np.array([self._met_rows[met_id] for met_id in met_ids]).reshape(-1, len(self.elements))
+
+        self._reaction_ids = [reaction.id for reaction in self.model.reactions]
+        self._reaction_position = {reaction_id: i for i, reaction_id in enumerate(self._reaction_ids)}
+        # Built from the index arrays so that each row keeps the metabolite order of its reaction: the sums are
+        # computed in the same order as in check_mass_balance and give the same floating point results
+        indptr = [0]
+        columns = []
+        values = []
+        for reaction in self.model.reactions:
+            for met, coefficient in reaction.metabolites.items():
+                columns.append(met_position[met.id])
+                values.append(coefficient)
+            indptr.append(len(columns))
+        stoichiometry = sparse.csr_matrix((np.array(values, dtype=float), np.array(columns, dtype=int), indptr),
+                                          shape=(len(self._reaction_ids), len(met_ids)))
+        self._imbalance = np.asarray(stoichiometry.dot(composition)).reshape(-1, len(self.elements))
+
+    def _composition_row(self, met_id):
+        row = np.zeros(len(self.elements))
+        for element, amount in (self._compositions[met_id] or {}).items():
+            row[self._element_position[element]] += amount
+        if self._charges[met_id] is not None:
+            row[-1] = self._charges[met_id]
+        return row
+
+    def imbalances(self, reaction_ids=None):
+        """
+        :param reaction_ids: Reactions to check, by default all
+        :return: dict, k: reaction id, v: imbalance (see check_mass_balance). Balanced reactions are not included.
+        """
+        if reaction_ids is None:
+            positions = np.flatnonzero((np.abs(self._imbalance) > self.zero_cutoff).any(axis=1))
+            # Reactions removed from the model without update_reaction are skipped
+            reaction_ids = [self._reaction_ids[i] for i in positions if self._reaction_ids[i] in self.model.reactions]
+        result = {}
+        for reaction_id in reaction_ids:
+            imbalance = self.imbalance(self.model.reactions.get_by_id(reaction_id))
+            if imbalance:
+                result[reaction_id] = imbalance
+        return result
+
+    def imbalance(self, reaction):
+        """ Imbalance of a reaction of the model, or of any reaction of metabolites with the same ids (e.g. a copy
+        being edited). Same as reaction.check_mass_balance(), with float values and without values below zero_cutoff.
+        """
+        for met in reaction.metabolites:
+            if met.id not in self._compositions:
+                self.update_metabolite(met)
+            if self._compositions[met.id] is None:
+                raise ValueError('No elements found in metabolite {}'.format(met.id))
+        position = self._reaction_position.get(reaction.id)
+        if position is not None and reaction.model is self.model:
+            row = self._imbalance[position]
+        else:
+            row = self._reaction_row(reaction)
+        if not (np.abs(row) > self.zero_cutoff).any():
+            return {}
+
+        # Same order as check_mass_balance: charge and elements as they first appear in the metabolites
+        imbalance = {}
+        for met in reaction.metabolites:
+            if self._charges[met.id] is not None:
+                imbalance.setdefault('charge', None)
+            for element in self._compositions[met.id]:
+                imbalance.setdefault(element, None)
+        return {element: float(row[self._element_position[element]]) for element in imbalance
+                if abs(row[self._element_position[element]]) > self.zero_cutoff}
+
+    def _reaction_row(self, reaction):
+        for met in reaction.metabolites:
+            if met.id not in self._compositions:
+                self.update_metabolite(met)
+        row = np.zeros(len(self.elements))
+        for met, coefficient in reaction.metabolites.items():
+            row += coefficient * self._met_rows[met.id]
+        return row
+
+    def update_reaction(self, reaction):
+        """ Call after the stoichiometry of a reaction changed, or after it was added to or removed from the model."""
+        if reaction.model is not self.model:
+            position = self._reaction_position.pop(reaction.id, None)
+            if position is not None:
+                self._imbalance[position] = 0
+            return
+        row = self._reaction_row(reaction)
+        if reaction.id in self._reaction_position:
+            self._imbalance[self._reaction_position[reaction.id]] = row
+        else:
+            self._reaction_position[reaction.id] = len(self._reaction_ids)
+            self._reaction_ids.append(reaction.id)
+            self._imbalance = np.vstack([self._imbalance, row])
+
+    def update_metabolite(self, metabolite):
+        """ Call after the formula or charge of a metabolite changed."""
+        composition = metabolite.elements
+        self._compositions[metabolite.id] = composition
+        self._charges[metabolite.id] = metabolite.charge
+        if any(element not in self._element_position for element in composition or {}):
+            self._build()
+            return
+        self._met_rows[metabolite.id] = self._composition_row(metabolite.id)
+        for reaction in metabolite.reactions:
+            if reaction.id in self._reaction_position and reaction.model is self.model:
+                self._imbalance[self._reaction_position[reaction.id]] = self._reaction_row(reaction)
+
+    def proton_water_corrections(self, reaction_ids=None, zero_cutoff=1e-9):
+        """
+        Corrections of the reactions which are balanced by only adding protons and water, boundary reactions are not
+        corrected. Protons and water are taken from the compartment of the reaction, or for transport reactions from the
+        compartment of most of its metabolites. Protons and water are the metabolites with formula H and charge 1, and
+        formula H2O and charge 0 (shortest id first).
+        :param reaction_ids: Reactions to correct, by default all unbalanced reactions
+        :param zero_cutoff: Imbalance left after the correction which is considered zero
+        :return: list of Correction, in the order of reaction_ids
+        """
+        if reaction_ids is None:
+            reaction_ids = list(self.imbalances())
+        positions = [self._reaction_position[reaction_id] for reaction_id in reaction_ids]
+        imbalance = self._imbalance[positions]
+        if 'O' not in self._element_position or 'H' not in self._element_position:
+            return []
+        oxygen = self._element_position['O']
+        hydrogen = self._element_position['H']
+        charge = self._element_position['charge']
+
+        water = -imbalance[:, oxygen]
+        protons = -imbalance[:, charge]
+        residual = imbalance.copy()
+        residual[:, oxygen] = 0
+        residual[:, charge] = 0
+        residual[:, hydrogen] += 2 * water + protons
+        fixable = ~(np.abs(residual) > zero_cutoff).any(axis=1) & \
+            ((np.abs(water) > zero_cutoff) | (np.abs(protons) > zero_cutoff))
+
+        proton_ids = self._compartment_metabolites({'H': 1}, 1)
+        water_ids = self._compartment_metabolites({'H': 2, 'O': 1}, 0)
+        corrections = []
+        for i in np.flatnonzero(fixable):
+            reaction = self.model.reactions.get_by_id(reaction_ids[i])
+            if reaction.boundary:
+                continue
+            compartments = [met.compartment for met in reaction.metabolites]
+            compartment = max(sorted(set(compartments)), key=compartments.count)
+            notes = []
+            if len(set(compartments)) > 1:
+                notes.append('transport: protons and water added to {}'.format(compartment))
+            added = {}
+            for met_ids, coefficient in [(water_ids, water[i]), (proton_ids, protons[i])]:
+                if abs(coefficient) > zero_cutoff:
+                    added[met_ids.get(compartment)] = float(coefficient)
+            if None in added:
+                continue
+            if any(abs(coefficient - round(coefficient)) > zero_cutoff for coefficient in added.values()):
+                notes.append('non-integer coefficients')
+            curated = reaction.copy()
+            curated.add_metabolites({self.model.metabolites.get_by_id(met_id): coefficient
+                                     for met_id, coefficient in added.items()})
+            corrections.append(Correction(reaction.id, self.imbalance(reaction), added, curated.reaction,
+                                          ', '.join(notes)))
+        return corrections
+
+    def _compartment_metabolites(self, elements, charge):
+        """ :return: dict, k: compartment, v: id of the metabolite with the given composition and charge."""
+        met_ids = {}
+        for met in sorted(self.model.metabolites, key=lambda met: (len(met.id), met.id)):
+            if self._compositions.get(met.id) == elements and self._charges.get(met.id) == charge:
+                met_ids.setdefault(met.compartment, met.id)
+        return met_ids
@@ -0,0 +1,265 @@
+"""
+Charge of the major microspecies of KEGG compounds at pH 7.2, calculated by the ChemAxon command line tool cxcalc
+(requires a license) from the KEGG mol files.
+
+Compounds are calculated in batches, in a pool of threads: mol files are fetched through a pool of HTTP connections,
+and cached in settings.CACHE_ROOT. The mol files of a batch are written to one multi-record SDF file in a temporary
+directory, and every cxcalc plugin is run once over the whole file, since the startup of cxcalc takes longer than the
+calculation of a compound. Compounds whose results cannot be taken from the batch output (cxcalc reported an error or
+returned no row for them) are calculated one by one, which gives the same failure messages as before.
+
+Both the source of the mol files and cxcalc are pluggable: KeggMolFetcher takes the URL of the mol files (e.g. a local
+server in tests) and Cxcalc the command to run (e.g. a fake cxcalc script).
+
+Usage:
+    results = calc_charges(['C00001', 'C00002'], workers=8)
+    charge, charged_formula, average_charge, failmessage = results[0]
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import settings
+
+
+KEGG_MOL_URL = 'http://www.genome.jp/dbget-bin/www_bget?-f+m+compound+'
+DEFAULT_CACHE_ROOT = os.path.join(settings.CACHE_ROOT, 'kegg_mol')
+PH = 7.2
+
+
+class KeggMolFetcher(object):
+    """
+    Args:
+        url(str): URL to which the KEGG compound id is appended
+        cache_root(str): Directory of the cached mol files, None to not cache them
+        connections(int): Maximum number of open connections, should be the number of threads using the fetcher
+    """
+
+    def __init__(self, url=KEGG_MOL_URL, cache_root=DEFAULT_CACHE_ROOT, connections=8):
+        self.url = url
+        self.cache_root = cache_root
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, cpid):
+        """ :return: Text of the mol file, '' if the compound has none. Only successful responses are cached."""
+        path = self._cache_path(cpid)
+        if path is not None and os.path.isfile(path):
+            with open(path, 'r', newline='') as f:
+                return f.read()
+
+        r = self.session.get(self.url + cpid)
+        if path is not None and r.status_code == 200:
+            os.makedirs(self.cache_root, exist_ok=True)
+            temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(temporary_path, 'w', newline='') as f:
+                f.write(r.text)
+            os.replace(temporary_path, path)
+        return r.text
+
+    def _cache_path(self, cpid):
+        if self.cache_root is None or not re.match(r'^\w+$', cpid):
+            return None
+        return os.path.join(self.cache_root, cpid + '.mol')
+
+
+class Cxcalc(object):
+    """
+    Args:
+        command(str or list): cxcalc executable, or command line which runs a stand-in for it
+    """
+
+    def __init__(self, command='cxcalc'):
+        self.command = [command] if isinstance(command, str) else list(command)
+
+    def run(self, *arguments):
+        """ :return: stdout, stderr (bytes)"""
+        proc = subprocess.Popen(self.command + list(arguments), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return proc.communicate()
+
+
+def calc_charges(cpids, fetcher=None, cxcalc=None, workers=8, batch_size=None):
+    """
+    :param cpids: KEGG compound ids, repeated ids are calculated once
+    :param fetcher: KeggMolFetcher, by default one for KEGG, with as many connections as workers
+    :param cxcalc: Cxcalc, by default the cxcalc executable on the path
+    :param workers: Number of batches calculated at the same time
+    :param batch_size: Number of compounds per batch, by default the compounds are split evenly between the workers
+    :return: list with the result of calc_major_ms for every id of cpids
+    """
+    fetcher = fetcher or KeggMolFetcher(connections=workers)
+    cxcalc = cxcalc or Cxcalc()
+    unique_cpids = list(dict.fromkeys(cpids))
+    batch_size = batch_size or max(1, -(-len(unique_cpids) // workers))
+    batches = [unique_cpids[i:i + batch_size] for i in range(0, len(unique_cpids), batch_size)]
+    results = {}
+    with ThreadPoolExecutor(workers) as executor:
+        for batch_results in executor.map(lambda batch: calc_batch(batch, fetcher, cxcalc), batches):
+            results.update(batch_results)
+    return [results[cpid] for cpid in cpids]
+
+
+def calc_batch(cpids, fetcher, cxcalc, pH=PH):
+    """
+    Same as calc_major_ms for several compounds, with one cxcalc call per plugin for all of them.
+    :return: dict, k: compound id, v: result of calc_major_ms
+    """
+    results = {}
+    mols = []
+    for cpid in cpids:
+        mol = fetcher.get(cpid)
+        if mol == '':
+            results[cpid] = None, None, None, 'compound {} mol file not in kegg'.format(cpid)
+        else:
+            mols.append((cpid, mol))
+
+    with tempfile.TemporaryDirectory() as directory:
+        sdf_path = os.path.join(directory, 'batch.sdf')
+        smiles_path = os.path.join(directory, 'batch.smiles')
+        with open(sdf_path, 'w') as f:
+            for _, mol in mols:
+                f.write(mol if mol.endswith('\n') else mol + '\n')
+                f.write('$$$$\n')
+
+        # Rows of the tables are numbered from 1 in the order of the records
+        major_ms = _run_table(cxcalc, 'majormicrospecies', '-H', str(pH), sdf_path)
+        neutral_formulas = _run_table(cxcalc, 'formula', sdf_path)
+        charge_distributions = _run_table(cxcalc, 'chargedistribution', '-H', str(pH), sdf_path)
+
+        smiles = {} # k: record number, v: major microspecies smiles
+        if major_ms is not None:
+            for number in range(1, len(mols) + 1):
+                row = major_ms.get(number)
+                if row is not None and len(row) > 1 and row[1] != '':
+                    smiles[number] = row[1]
+        with open(smiles_path, 'w') as f:
+            f.write(''.join(value + '\n' for value in smiles.values()))
+        charged_formulas = _run_table(cxcalc, 'formula', smiles_path) if smiles else {}
+        if charged_formulas is not None:
+            charged_formulas = {number: charged_formulas.get(line) for line, number in enumerate(smiles, 1)}
+
+    tables = [neutral_formulas, charge_distributions, charged_formulas]
+    for number, (cpid, mol) in enumerate(mols, 1):
+        neutral_row, distribution_row, charged_row = [None if table is None else table.get(number) for table in tables]
+        if number not in smiles or None in (neutral_row, distribution_row, charged_row) or len(neutral_row) < 2 \
+                or len(distribution_row) < 3 or len(charged_row) < 2 or charged_row[1] == '':
+            results[cpid] = calc_major_ms(cpid, fetcher, cxcalc, pH)
+            continue
+        charged_formula = charged_row[1]
+        results[cpid] = (get_nh(charged_formula) - get_nh(neutral_row[1]), charged_formula, float(distribution_row[2]),
+                         [])
+    return results
+
+
+def calc_major_ms(cpid, fetcher, cxcalc, pH=PH):
+    """
+    Calculates major microspecies at pH = 7.2,
+
+    Args:
+        cpid(str): kegg compound id
+        fetcher(KeggMolFetcher)
+        cxcalc(Cxcalc)
+
+    Returns
+    -------
+        charge : int
+        formula : str
+        average_charge : float
+        failmessage : str
+
+    """
+    failmessage = []
+
+    # get molfile from kegg
+    mol = fetcher.get(cpid)
+    if mol == '':
+        failmessage = 'compound {} mol file not in kegg'.format(cpid)
+        return None, None, None, failmessage
+
+    with tempfile.TemporaryDirectory() as directory:
+        mol_path = os.path.join(directory, 'tempfile.mol')
+        smiles_path = os.path.join(directory, 'tempfile.smiles')
+        with open(mol_path, 'w') as f:
+            f.write(mol)
+
+        # Determine major microspecies:
+        out, err = cxcalc.run('majormicrospecies', '-H', str(pH), mol_path)
+        if err:
+            failmessage = _error_message(err)
+        else:
+            outsmiles = out.decode("utf-8").split('\n')[1].split('\t')[1]
+
+            with open(smiles_path, 'w') as f:
+                f.write(outsmiles)
+
+        # Obtain charged formula:
+        out, err = cxcalc.run('formula', smiles_path)
+        if err:
+            failmessage = _error_message(err)
+            charged_formula = ''
+        else:
+            try:
+                charged_formula = out.decode("utf-8").split('\n')[1].split('\t')[1]
+            except IndexError: # if smiles is empty (e.g. happens with H+) then  cxcal formula will spit a different output
+                charged_formula = ''
+
+        # Obtain neutral formula to compute charge
+        out, err = cxcalc.run('formula', mol_path)
+        if err:
+            failmessage = _error_message(err)
+            neutral_formula = ''
+        else:
+            neutral_formula = out.decode("utf-8").split('\n')[1].split('\t')[1]
+
+        # Calculate charge
+        if charged_formula != '':
+            charge = get_nh(charged_formula) - get_nh(neutral_formula)
+        else:
+            charge = ''
+
+        # Also include average charge distribution in case one of the previous steps failed
+        out, err = cxcalc.run('chargedistribution', '-H', str(pH), mol_path)
+        if err:
+            average_charge = ''
+        else:
+            average_charge = float(out.decode("utf-8").split('\n')[1].split('\t')[2])
+
+    return charge, charged_formula, average_charge, failmessage
+
+
+def get_nh(formula):
+    """ :return: Number of hydrogens in the formula"""
+    match = re.search(r'H((\d+)|\w)', formula) # Captures the number after H or letter after H
+
+    if not match: # No hydrogen
+        return 0
+    else:
+        g1 = match.group(1)
+
+    try:
+        return int(g1)
+    except ValueError:
+        return 1
+
+
+def _run_table(cxcalc, *arguments):
+    """ :return: dict, k: id (int), v: list of the columns of the cxcalc output, None if cxcalc reported an error"""
+    out, err = cxcalc.run(*arguments)
+    if err:
+        return None
+    table = {}
+    for line in out.decode("utf-8").split('\n')[1:]:
+        row = line.rstrip('\r').split('\t')
+        if row[0].isdigit():
+            table[int(row[0])] = row
+    return table
+
+
+def _error_message(err):
+    """ Only the first 50 characters of the first line of the error are reported."""
+    return 'ChemAxon Error: {}'.format(err.decode("utf-8").split('\n')[0][:50])
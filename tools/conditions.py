@@ -0,0 +1,129 @@
+"""
+Registry of the files that describe simulation conditions:
+
+- Extracellular flux data set (see settings.EXTRACELLULAR_FLUX_DATA)
+- Medium and secretion files in the media directory
+- GAM/NGAM parameters (media/atp_param.csv)
+
+Each file is parsed and validated once per process and served as immutable records. A file is parsed again only if
+its modification time changes, so edits made while a session is running (e.g. writing a new atp_param.csv) are
+picked up automatically.
+"""
+
+import csv
+import os
+from collections import namedtuple
+from types import MappingProxyType
+import pandas as pd
+import settings
+
+
+BoundRecord = namedtuple('BoundRecord', ['reaction_id', 'bound'])
+
+# Columns of the flux data set which do not correspond to measured fluxes
+FLUX_METADATA_COLUMNS = ('index', 'Strain', 'deleted_genes', 'Medium', 'Reference', 'Reactor', 'Notes')
+
+# key: (record type, absolute path), value: (modification time, parsed record)
+_registry = {}
+
+
+def _get(kind, path, parser):
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    entry = _registry.get((kind, path))
+    if entry is None or entry[0] != mtime:
+        entry = (mtime, parser(path))
+        _registry[(kind, path)] = entry
+    return entry[1]
+
+
+def clear():
+    """ Drops all parsed records, the next request will read the files again."""
+    _registry.clear()
+
+
+def get_flux_data(flux_dataset_path=settings.EXTRACELLULAR_FLUX_DATA):
+    """
+    :param flux_dataset_path: Path to the extracellular flux data set.
+    :return: Read-only mapping, k: dataset index, v: read-only mapping of column_id to value (as in
+        pandas.DataFrame.to_dict(orient='records'))
+    """
+    return _get('flux', flux_dataset_path, _parse_flux_data)
+
+
+def get_flux_row(dataset_index, flux_dataset_path=settings.EXTRACELLULAR_FLUX_DATA):
+    try:
+        return get_flux_data(flux_dataset_path)[dataset_index]
+    except KeyError:
+        raise ValueError('Invalid dataset index: {}'.format(dataset_index))
+
+
+def list_media(media_path=settings.MEDIA_ROOT):
+    """ File names of the csv files in the media directory."""
+    return _get('media_dir', media_path, lambda path: frozenset(mid for mid in os.listdir(path) if '.csv' in mid))
+
+
+def get_medium(medium_file_id, media_path=settings.MEDIA_ROOT):
+    """ Lower bounds from a medium file with headers: reaction_id|lower_bound
+    :return: tuple of BoundRecord
+    """
+    return _get('medium', os.path.join(media_path, medium_file_id + '.csv'),
+                lambda path: _parse_bound_file(path, 'lower_bound'))
+
+
+def get_secretion(secretion_file_id, media_path=settings.MEDIA_ROOT):
+    """ Upper bounds from a secretion file with headers: reaction_id|upper_bound
+    :return: tuple of BoundRecord
+    """
+    return _get('secretion', os.path.join(media_path, secretion_file_id + '.csv'),
+                lambda path: _parse_bound_file(path, 'upper_bound'))
+
+
+def get_atp_param(media_path=settings.MEDIA_ROOT):
+    """
+    :return: Read-only mapping, k: configuration (e.g. 'batch'), v: read-only mapping with keys 'GAM' and 'NGAM'
+    """
+    return _get('atp_param', os.path.join(media_path, 'atp_param.csv'), _parse_atp_param)
+
+
+## Parsers
+
+def _parse_flux_data(path):
+    df = pd.read_csv(path)
+    for column in ['index', 'Medium', 'deleted_genes']:
+        if column not in df.columns:
+            raise ValueError('Flux data set {} lacks column: {}'.format(path, column))
+    if df['index'].duplicated().any():
+        raise ValueError('Flux data set {} has duplicated indices: {}'.format(
+            path, list(df['index'][df['index'].duplicated()])))
+    for column in df.columns:
+        if column not in FLUX_METADATA_COLUMNS and not column.endswith('_std') and column + '_std' not in df.columns:
+            raise ValueError('Flux data set {} lacks standard deviation for: {}'.format(path, column))
+
+    return MappingProxyType({row['index']: MappingProxyType(row) for row in df.to_dict(orient='records')})
+
+
+def _parse_bound_file(path, bound_column):
+    records = []
+    with open(path, 'r') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or not {'reaction_id', bound_column} <= set(reader.fieldnames):
+            raise ValueError('File {} must have headers: reaction_id|{}'.format(path, bound_column))
+        for row in reader:
+            try:
+                bound = float(row[bound_column])
+            except (TypeError, ValueError):
+                raise ValueError('Invalid {} for {} in {}: {}'.format(bound_column, row['reaction_id'], path,
+                                                                     row[bound_column]))
+            records.append(BoundRecord(row['reaction_id'].strip(), bound))  # Some files have trailing whitespace
+    return tuple(records)
+
+
+def _parse_atp_param(path):
+    param = pd.read_csv(path).set_index('parameter')
+    for parameter in ['GAM', 'NGAM']:
+        if parameter not in param.index:
+            raise ValueError('ATP parameter file {} lacks parameter: {}'.format(path, parameter))
+    return MappingProxyType({column: MappingProxyType({'GAM': float(param.loc['GAM', column]),
+                                                       'NGAM': float(param.loc['NGAM', column])})
+                             for column in param.columns})
@@ -1,20 +1,17 @@
 # A set of tools to configure the model
 
-import csv
-import os
 import re
+from contextlib import contextmanager
 import cobra as cb
-import pandas as pd
 import numpy as np
 import settings
+from tools import conditions, gene_annotation, gpr
 
 
 
 def set_experimental_data(model, dataset_index, constraint_mode, reactor_type='batch', apply_knockouts=True, flux_dataset_path=settings.EXTRACELLULAR_FLUX_DATA, secretion='all', verbose=False):
 
-    df = pd.read_csv(flux_dataset_path)
-    target_row = df[df['index'] == dataset_index]
-    row = target_row.to_dict(orient='records')[0]
+    row = conditions.get_flux_row(dataset_index, flux_dataset_path)
 
     if apply_knockouts:
         if isinstance(row['deleted_genes'], str):
@@ -33,11 +30,36 @@ def set_conditions(model, medium_str, secretion='all', reactor_type='batch', ver
     Notes:
         - Strict constraitns on secretion tend to make the model infeasible, specially when additional constraints
         (such as experimental data) are impossed, thus the default setup is 'all'.
+        - The configuration is compiled into a ConditionPlan, when the same conditions are applied repeatedly it is
+        faster to create the plan once and use ConditionPlan.apply.
 
     """
-    medium_files = [mid for mid in os.listdir(settings.MEDIA_ROOT) if '.csv' in mid]
+    plan = ConditionPlan(model, medium_str, secretion, reactor_type)
+
+    #if 'clamped' in row['Medium']:
+    # Block hydrogen secretion
+    #    model.reactions.EX_h2_e.upper_bound = 0
+
+    plan.apply(model)
+
+    if verbose:
+        print('Model({}) conditions set: '.format(model.name))
+        print('\t Medium: \t {}'.format(plan.medium_id))
+        print('\t Biomass reaction id: \t {}'.format(plan.bof_id))
+
+    return plan.bof_id
+
+
+def get_medium_and_bof(medium_str, media_path=settings.MEDIA_ROOT):
+    """ Translates the medium string provided in the input file into a medium file id and biomass reaction id.
+    Args:
+        medium_str(string): See set_conditions
+        media_path(string, optional): Directory of the medium files
+    Returns:
+        medium_id, bof_id
+    """
+    medium_files = conditions.list_media(media_path)
 
-    # set model bounds and medium:
     if 'cellb' in medium_str:
         bof_id = 'BIOMASS_CELLOBIOSE'
         medium_id = 'comp_minimal_cellobiose'
@@ -54,24 +76,112 @@ def set_conditions(model, medium_str, secretion='all', reactor_type='batch', ver
     else:
         raise ValueError('Invalid medium ID: {}'.format(medium_str))
 
-    #if 'clamped' in row['Medium']:
-    # Block hydrogen secretion
-    #    model.reactions.EX_h2_e.upper_bound = 0
+    return medium_id, bof_id
 
-    block_all_exchanges(model)
-    set_medium(model, medium_id)
-    set_secretion(model, secretion)
-    set_atp_param(model, medium_id, bof_id, reactor_type)
 
-    # Change objective to appropriate BOF
-    set_bof(model, bof_id)
+class ConditionPlan(object):
+    """ Compiled version of set_conditions (optionally including gene knock-outs).
 
-    if verbose:
-        print('Model({}) conditions set: '.format(model.name))
-        print('\t Medium: \t {}'.format(medium_id))
-        print('\t Biomass reaction id: \t {}'.format(bof_id))
+    The bounds which block_all_exchanges, set_medium, set_secretion, set_atp_param, set_bof, and knock_out_genes
+    would set one after the other are resolved once into arrays of final bounds. Applying the plan only touches
+    reactions whose bounds differ from the final ones, and changes the GAM of the biomass reaction in a single
+    stoichiometry update.
+
+    Usage:
+        plan = ConditionPlan(model, 'cellb', secretion='common_secretion')
+        plan.apply(model) # permanent
+        with plan.applied(model) as tmodel: # reverted on exit
+            tmodel.optimize()
+
+    Args:
+        model(cobra_model): Model used to resolve reaction ids and gene knock-outs. The plan can be applied to any model
+            with the same reactions (e.g. copies of it).
+        medium_str(string): See set_conditions
+        secretion(string, optional): See set_conditions
+        reactor_type(string, optional): See set_conditions
+        bof_id(string, optional): Biomass objective function, by default it is determined from the medium.
+        deleted_genes(string or list, optional): Genes to knock out, in any format accepted by knock_out_genes.
+        media_path(string, optional): Directory of the medium, secretion and ATP parameter files
+    Notes:
+        - Unlike knock_out_genes, knock-outs only set reaction bounds and do not change gene.functional.
+    """
+
+    def __init__(self, model, medium_str, secretion='all', reactor_type='batch', bof_id=None, deleted_genes=None,
+                 media_path=settings.MEDIA_ROOT):
+        self.medium_id, default_bof_id = get_medium_and_bof(medium_str, media_path)
+        self.bof_id = bof_id if bof_id else default_bof_id
+        self.secretion = secretion
+        self.reactor_type = reactor_type
+
+        p = get_atp_param(self.medium_id, reactor_type, media_path)
+        self.gam = p['GAM']
+
+        # Resolve final bounds following the order of set_conditions, nan keeps the current bound
+        lower = {}
+        upper = {}
+        for reaction in model.reactions:
+            if reaction.id.startswith('EX_'):
+                lower[reaction.id] = 0
+                upper[reaction.id] = 0
+
+        for record in conditions.get_medium(self.medium_id, media_path):
+            model.reactions.get_by_id(record.reaction_id)
+            lower[record.reaction_id] = record.bound
+
+        if secretion == 'all':
+            for reaction_id in list(upper):
+                upper[reaction_id] = 1000
+        else:
+            for record in conditions.get_secretion(secretion, media_path):
+                model.reactions.get_by_id(record.reaction_id)
+                upper[record.reaction_id] = record.bound
+
+        lower['ATPM'], upper['ATPM'] = p['NGAM'], 1000
+
+        for reaction_id in ['BIOMASS_CELLOBIOSE', 'BIOMASS_NO_CELLULOSOME', 'BIOMASS_CELLULOSE']:
+            lower[reaction_id], upper[reaction_id] = 0, 0
+        model.reactions.get_by_id(self.bof_id)
+        lower[self.bof_id], upper[self.bof_id] = 0, 1000
+
+        self.knocked_out_reactions = tuple(get_knock_out_reactions(model, deleted_genes)) if deleted_genes else ()
+        for reaction_id in self.knocked_out_reactions:
+            lower[reaction_id], upper[reaction_id] = 0, 0
+
+        reaction_ids = sorted(set(lower) | set(upper), key=model.reactions.index)
+        self.reaction_ids = tuple(reaction_ids)
+        self.indices = np.array([model.reactions.index(reaction_id) for reaction_id in reaction_ids], dtype=int)
+        self.lower_bounds = np.array([lower.get(reaction_id, np.nan) for reaction_id in reaction_ids], dtype=float)
+        self.upper_bounds = np.array([upper.get(reaction_id, np.nan) for reaction_id in reaction_ids], dtype=float)
+
+    def _get_reactions(self, model):
+        reactions = []
+        for index, reaction_id in zip(self.indices, self.reaction_ids):
+            reaction = model.reactions[index] if index < len(model.reactions) else None
+            if reaction is None or reaction.id != reaction_id: # model differs from the one used to compile the plan
+                reaction = model.reactions.get_by_id(reaction_id)
+            reactions.append(reaction)
+        return reactions
+
+    def apply(self, model):
+        """ Configures the model, changes are reverted on exit if the model is used as a context."""
+        reactions = self._get_reactions(model)
+        current = np.array([reaction.bounds for reaction in reactions], dtype=float).reshape(-1, 2)
+        lower = np.where(np.isnan(self.lower_bounds), current[:, 0], self.lower_bounds)
+        upper = np.where(np.isnan(self.upper_bounds), current[:, 1], self.upper_bounds)
+        for i in np.flatnonzero((lower != current[:, 0]) | (upper != current[:, 1])):
+            reactions[i].bounds = (lower[i], upper[i])
+
+        set_reaction_gam(model.reactions.get_by_id(self.bof_id), self.gam)
+        model.objective = self.bof_id
+        return model
+
+    @contextmanager
+    def applied(self, model):
+        """ Context manager which applies the plan and reverts every change on exit."""
+        with model:
+            self.apply(model)
+            yield model
 
-    return bof_id
 
 def set_bof(model, bof_id, reset_bounds=True):
     """ Sets the biomass objective function ensuring only one is active. Will set bounds of the target to (0,1000).
@@ -94,10 +204,25 @@ def knock_out_genes(model, deleted_gene_list, verbose=False):
     gene1-gene3 or gene1-3. Both meaning gene1, gene2, and gene3 are deleted. Instead of a range, a list of genes,
     such as [gene1, gene4], can also be provided.
     """
+    all_deleted_gene_ids = get_deleted_gene_ids(deleted_gene_list)
+
+    # Same result as gene.knock_out() for each gene, with every gene-reaction rule evaluated once
+    genes = _get_genes(model, all_deleted_gene_ids)
+    for reaction_id in _get_blocked_reactions(model, genes):
+        model.reactions.get_by_id(reaction_id).knock_out()
+    for gene in genes:
+        gene.functional = False
+
+    if verbose:
+        print('Deleted genes:{}'.format(','.join(all_deleted_gene_ids)))
+
+
+def get_deleted_gene_ids(deleted_gene_list):
+    """ Expands a list of deleted genes (see knock_out_genes) into current gene ids."""
     if not isinstance(deleted_gene_list, list):
         deleted_gene_list = [del_str.replace(' ', '') for del_str in deleted_gene_list.split(',')]
 
-    genemap = settings.get_gene_map()
+    genemap = gene_annotation.get_annotation().old_to_new
 
     all_deleted_gene_ids = []
     for del_str in deleted_gene_list:
@@ -127,14 +252,32 @@ def knock_out_genes(model, deleted_gene_list, verbose=False):
 
         all_deleted_gene_ids.extend(deleted_gene_ids)
 
-    for gene_id in all_deleted_gene_ids:
+    return all_deleted_gene_ids
+
+
+def get_knock_out_reactions(model, deleted_gene_list):
+    """ Ids of the reactions which are blocked by deleting the genes (see knock_out_genes for format)."""
+    return _get_blocked_reactions(model, _get_genes(model, get_deleted_gene_ids(deleted_gene_list)))
+
+
+def _get_genes(model, gene_ids):
+    genes = []
+    for gene_id in gene_ids:
         try:
-            model.genes.get_by_id(gene_id).knock_out()
+            genes.append(model.genes.get_by_id(gene_id))
         except KeyError:
             print('Gene not in model:{}'.format(gene_id))
+    return genes
 
-    if verbose:
-        print('Deleted genes:{}'.format(','.join(deleted_gene_ids)))
+
+def _get_blocked_reactions(model, genes):
+    """ Reactions of the genes which are blocked if the genes, and the genes already marked as non-functional, are
+    deleted."""
+    candidates = {reaction for gene in genes for reaction in gene.reactions}
+    candidate_ids = {reaction.id for reaction in candidates}
+    deleted = {gene.id for gene in genes} | {gene.id for gene in model.genes if not gene.functional}
+    return [reaction_id for reaction_id in gpr.get_index(model, candidates).knocked_out_reactions(deleted)
+            if reaction_id in candidate_ids]
 
 
 def set_experimental_flux_reaction_bounds(flux_row, bof_rxn_id, model, constraint_mode, verbose=False):
@@ -163,18 +306,20 @@ def set_experimental_flux_reaction_bounds(flux_row, bof_rxn_id, model, constrain
         else:
             rxn_id = 'EX_{}_e'.format(met_id)
 
-        if constraint_mode is 'min':
+        if constraint_mode == 'min':
             lb = float(flux_row[met_id]) - float(flux_row[met_id + '_std'])
             ub = 1000
-        elif constraint_mode is 'mean':
+        elif constraint_mode == 'mean':
             lb = float(flux_row[met_id])
             ub = 1000
-        if constraint_mode is 'max':
+        elif constraint_mode == 'max':
             lb = float(flux_row[met_id]) + float(flux_row[met_id + '_std'])
             ub = 1000
-        elif constraint_mode is 'both':
+        elif constraint_mode == 'both':
             lb = float(flux_row[met_id]) - float(flux_row[met_id + '_std'])
             ub = float(flux_row[met_id]) + float(flux_row[met_id + '_std'])
+        else:
+            raise ValueError('Unknown constraint mode {}, use min, mean, max or both'.format(constraint_mode))
 
         if not (np.isnan(lb) or np.isnan(ub)):
             if verbose:
@@ -204,11 +349,8 @@ def set_medium(model, medium_file_id, media_path=settings.MEDIA_ROOT):
         - Medium only concerns what products can be consumed
         - Will only overwrite bounds for reactions in medium file
     """
-    with open(os.path.join(media_path, medium_file_id + '.csv'), 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            reaction = model.reactions.get_by_id(row['reaction_id'])
-            reaction.lower_bound = float(row['lower_bound'])
+    for record in conditions.get_medium(medium_file_id, media_path):
+        model.reactions.get_by_id(record.reaction_id).lower_bound = record.bound
 
 
 def set_secretion(model, secretion_file_id, media_path=settings.MEDIA_ROOT):
@@ -216,16 +358,13 @@ def set_secretion(model, secretion_file_id, media_path=settings.MEDIA_ROOT):
     Secretion settings are stored in a csv file with headers: reaction_id|upper_bound
     If the file id is 'all', all exchange reaction upper bound will be set to 1000
     """
-    if secretion_file_id is 'all':
+    if secretion_file_id == 'all':
         for reaction in model.reactions:
             if reaction.id.startswith('EX_'):
                 reaction.upper_bound = 1000
     else:
-        with open(os.path.join(media_path, secretion_file_id + '.csv'), 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                reaction = model.reactions.get_by_id(row['reaction_id'])
-                reaction.upper_bound = float(row['upper_bound'])
+        for record in conditions.get_secretion(secretion_file_id, media_path):
+            model.reactions.get_by_id(record.reaction_id).upper_bound = record.bound
 
 
 def delete_hydg(model):
@@ -244,13 +383,13 @@ def delete_hydg(model):
 
 
 def set_reaction_gam(reaction, gam_value):
-    target_mets = {met: coeff for met, coeff in reaction.metabolites.items() if met.id in ['atp_c', 'h2o_c','adp_c', 'h_c', 'pi_c']}
-    reaction.subtract_metabolites(target_mets)
-    for met in target_mets.keys():
-        if met.id in ['atp_c', 'h2o_c']:
-            reaction.add_metabolites({met: -abs(gam_value)})
-        elif met.id in ['adp_c', 'h_c', 'pi_c']:
-            reaction.add_metabolites({met: abs(gam_value)})
+    target_coeffs = {'atp_c': -abs(gam_value), 'h2o_c': -abs(gam_value),
+                     'adp_c': abs(gam_value), 'h_c': abs(gam_value), 'pi_c': abs(gam_value)}
+    # Apply all coefficient changes at once, each stoichiometry update rewrites the solver constraints
+    delta = {met: target_coeffs[met.id] - coeff for met, coeff in reaction.metabolites.items()
+             if met.id in target_coeffs and target_coeffs[met.id] != coeff}
+    if delta:
+        reaction.add_metabolites(delta)
 
 
 
@@ -267,8 +406,18 @@ def set_ngam(model, ngam_value):
 
 
 def set_atp_param(model, medium_id, bof_id, reactor_type='batch'):
-    param = pd.read_csv(os.path.join(settings.MEDIA_ROOT, 'atp_param.csv'))
-    param = param.set_index('parameter')
+    p = get_atp_param(medium_id, reactor_type)
+    bof = model.reactions.get_by_id(bof_id)
+    set_reaction_gam(bof, p['GAM'])
+    set_ngam(model, p['NGAM'])
+
+
+def get_atp_param(medium_id, reactor_type='batch', media_path=settings.MEDIA_ROOT):
+    """ GAM/NGAM parameters for a medium and reactor type, from the atp_param file in media_path.
+    Returns:
+        dictionary with keys 'GAM' and 'NGAM'
+    """
+    param = conditions.get_atp_param(media_path)
 
     if reactor_type.lower() == 'batch':
         p = param['batch']
@@ -283,9 +432,7 @@ def set_atp_param(model, medium_id, bof_id, reactor_type='batch'):
             raise ValueError('GAM/NGAM parameters could not be determined for medium: {}'.format(medium_id))
     else:
         raise ValueError('Invalid reactor type: {}'.format(reactor_type))
-    bof = model.reactions.get_by_id(bof_id)
-    set_reaction_gam(bof, p['GAM'])
-    set_ngam(model, p['NGAM'])
+    return p
 
 
 ###--------------- UNUSED---------------------------------------------------------------------------------------------##
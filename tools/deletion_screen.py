@@ -0,0 +1,158 @@
+"""
+Screen of double and higher-order gene deletions.
+
+Combinations of k genes are built by extending the viable combinations of k-1 genes (parents) one gene at a time. Each
+parent is handled by one worker of a process pool, which solves the parent once and then its extensions. Most
+combinations are not solved:
+
+- Lethal subsets: deleting more genes cannot increase growth, combinations containing a lethal combination are lethal.
+  They are not enumerated and not written.
+- Flux support: if none of the reactions knocked out by a combination carries flux in the parent solution, the
+  parent solution is still optimal (see knockouts.KnockoutSimulator.solve).
+- Identical reaction sets: combinations which knock out the same reactions (e.g. isozymes, genes without effect) share
+  one solution.
+
+Results are streamed to a csv file with the columns in SCREEN_FIELDS:
+
+- genes: Deleted gene ids separated by ';'
+- order: Number of deleted genes
+- growth: Growth rate, nan if the solution is not optimal
+- status: Solver status
+- source: solved, parent (solution of the parent combination), or same_reactions (solution of an earlier combination
+  knocking out the same reactions)
+"""
+
+import csv
+from collections import Counter
+from itertools import combinations
+from multiprocessing import Pool, cpu_count
+from scipy.special import comb
+from tools import gpr
+from tools.knockouts import KnockoutSimulator
+
+
+SCREEN_FIELDS = ['genes', 'order', 'growth', 'status', 'source']
+
+# Solutions kept per worker to match combinations knocking out the same reactions
+MAX_CACHED_SOLUTIONS = 200000
+
+
+def run_screen(model, output_path, max_order=2, gene_ids=None, minimum_viable_growth_rate=0.01, processes=None,
+               zero_cutoff=1e-9, verbose=False):
+    """
+    Deletes all combinations of up to max_order genes.
+    :param model: Cobra model, configured with the simulation conditions
+    :param output_path: csv file, see module docstring
+    :param max_order: Largest number of genes deleted together
+    :param gene_ids: Genes to combine, by default all genes in the model
+    :param minimum_viable_growth_rate: Combinations growing below this rate are lethal, as are infeasible ones
+    :param processes: Number of worker processes, by default the number of CPUs
+    :param zero_cutoff: Fluxes below this value are considered zero
+    :param verbose: Print the counts after each order
+    :return: dictionary, k: source (see module docstring) or lethal_subset, v: number of combinations
+    """
+    if gene_ids is None:
+        gene_ids = [gene.id for gene in model.genes]
+    gene_ids = list(gene_ids)
+    for gene_id in gene_ids:
+        model.genes.get_by_id(gene_id)
+    if processes is None:
+        processes = cpu_count()
+
+    lethal = set() # frozensets of positions in gene_ids
+    counts = Counter()
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SCREEN_FIELDS)
+        for order in range(1, max_order + 1):
+            parents = _viable_combinations(len(gene_ids), order - 1, frozenset(lethal))
+            initargs = (model, gene_ids, frozenset(lethal), minimum_viable_growth_rate, zero_cutoff)
+            if processes <= 1 or order == 1: # a single parent, the empty combination
+                _init_worker(*initargs)
+                lethal.update(_write(writer, map(_extend, parents), gene_ids, minimum_viable_growth_rate, counts))
+            else:
+                with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+                    results = pool.imap(_extend, parents, chunksize=16)
+                    lethal.update(_write(writer, results, gene_ids, minimum_viable_growth_rate, counts))
+            f.flush()
+
+            counts['lethal_subset'] = sum(comb(len(gene_ids), k, exact=True) for k in range(1, order + 1)) - \
+                sum(value for key, value in counts.items() if key != 'lethal_subset')
+            if verbose:
+                print('Order {}: {}'.format(order, dict(counts)))
+    return dict(counts)
+
+
+def _write(writer, results, gene_ids, minimum_viable_growth_rate, counts):
+    """ Writes the rows of each parent and yields the lethal combinations."""
+    for rows in results:
+        for positions, growth, status, source in rows:
+            writer.writerow([';'.join(gene_ids[i] for i in positions), len(positions), growth, status, source])
+            counts[source] += 1
+            if not growth >= minimum_viable_growth_rate:
+                yield frozenset(positions)
+
+
+def _viable_combinations(n, order, lethal):
+    """ Combinations of order positions out of range(n), as sorted tuples, which contain no lethal combination."""
+    if order == 0:
+        yield ()
+        return
+    for parent in _viable_combinations(n, order - 1, lethal):
+        for position in range(parent[-1] + 1 if parent else 0, n):
+            if not _contains_lethal(parent, position, lethal):
+                yield parent + (position,)
+
+
+def _contains_lethal(parent, position, lethal):
+    """ Whether parent + (position,) contains a lethal combination, parent itself is known to be viable."""
+    if not lethal:
+        return False
+    for size in range(len(parent) + 1):
+        for subset in combinations(parent, size):
+            if frozenset(subset + (position,)) in lethal:
+                return True
+    return False
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(model, gene_ids, lethal, minimum_viable_growth_rate, zero_cutoff):
+    _worker['simulator'] = KnockoutSimulator(model, zero_cutoff)
+    _worker['index'] = gpr.get_index(model)
+    _worker['gene_ids'] = gene_ids
+    _worker['lethal'] = lethal
+    _worker['solutions'] = {} # k: frozenset of knocked-out reaction ids, v: KnockoutResult
+
+
+def _extend(parent):
+    """
+    :param parent: tuple of gene positions
+    :return: list of (positions, growth, status, source) for the viable extensions of parent
+    """
+    simulator = _worker['simulator']
+    index = _worker['index']
+    gene_ids = _worker['gene_ids']
+    solutions = _worker['solutions']
+
+    parent_reactions = index.knocked_out_reactions([gene_ids[i] for i in parent])
+    parent_result = simulator.solve(parent_reactions, support=True)
+
+    rows = []
+    for position in range(parent[-1] + 1 if parent else 0, len(gene_ids)):
+        if _contains_lethal(parent, position, _worker['lethal']):
+            continue
+        positions = parent + (position,)
+        reaction_ids = frozenset(index.knocked_out_reactions([gene_ids[i] for i in positions]))
+        if reaction_ids in solutions:
+            result, source = solutions[reaction_ids], 'same_reactions'
+        else:
+            result = simulator.solve(reaction_ids, parent=parent_result)
+            source = 'parent' if result is parent_result else 'solved'
+            if len(solutions) >= MAX_CACHED_SOLUTIONS:
+                solutions.clear()
+            solutions[reaction_ids] = result
+        rows.append((positions, result.growth, result.status, source))
+    return rows
@@ -0,0 +1,87 @@
+"""
+Writes model files in parallel processes.
+
+Each file is written by a process forked from the current one, which has a copy of the model as it is when save is
+called, so the model can be changed right away, e.g. to write it again with other conditions. The format follows the
+file extension: .json (with its snapshot, see tools.snapshot), .xml or .sbml, and .mat. Where processes cannot be
+forked, or from a daemonic process, the files are written one after another.
+
+Usage:
+    with ModelWriter() as writer:
+        writer.save(model, 'iSG676_cb.json', 'iSG676_cb.xml', 'iSG676_cb.mat')
+        set_conditions(model, medium_str='avcell', secretion='common_secretion')
+        writer.save(model, 'iSG676_ce.json', 'iSG676_ce.xml')
+    # All files are written here
+"""
+
+import multiprocessing
+import os
+import cobra as cb
+from tools import snapshot
+
+
+WRITERS = {
+    '.json': snapshot.save_json_model,
+    '.xml': cb.io.write_sbml_model,
+    '.sbml': cb.io.write_sbml_model,
+    '.mat': cb.io.save_matlab_model,
+}
+
+
+class ModelWriter(object):
+    """
+    Args:
+        processes(int): Maximum number of files written at the same time, os.cpu_count() by default
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes or os.cpu_count() or 1
+        self._running = [] # (process, path)
+        self._failed = []
+        can_fork = 'fork' in multiprocessing.get_all_start_methods() and not multiprocessing.current_process().daemon
+        self._context = multiprocessing.get_context('fork') if can_fork and self.processes > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else: # Does not hide the exception
+            while self._running:
+                self._join(self._running[0])
+
+    def save(self, model, *paths):
+        """ Starts writing the model to the paths. Raises ValueError for an unknown file extension."""
+        writers = [_get_writer(path) for path in paths]
+        for writer, path in zip(writers, paths):
+            if self._context is None:
+                writer(model, path)
+                continue
+            while len(self._running) >= self.processes:
+                self._join(self._running[0])
+            process = self._context.Process(target=writer, args=(model, path))
+            process.start()
+            self._running.append((process, path))
+
+    def close(self):
+        """ Waits for all files. Raises RuntimeError if some were not written, their traceback is printed."""
+        while self._running:
+            self._join(self._running[0])
+        if self._failed:
+            failed, self._failed = self._failed, []
+            raise RuntimeError('Model files could not be written: {}'.format(', '.join(failed)))
+
+    def _join(self, running):
+        process, path = running
+        process.join()
+        self._running.remove(running)
+        if process.exitcode != 0:
+            self._failed.append(path)
+
+
+def _get_writer(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError('Unknown model file extension {}'.format(extension))
+    return WRITERS[extension]
@@ -0,0 +1,36 @@
+"""
+Flux variability analysis (FVA) for curation tables. Thermodynamically infeasible cycles are found by tools.tics.
+
+Results are optionally stored in a ResultCache (see tools.result_cache) keyed by the model hash, regenerating a table
+from an unchanged model does not solve any LP.
+"""
+
+import cobra as cb
+import pandas as pd
+from tools.result_cache import model_hash
+
+
+def flux_variability(model, fraction_of_optimum=1.0, processes=None, cache=None):
+    """
+    FVA of all reactions over a process pool (see cobra.flux_analysis.flux_variability_analysis).
+    :param model: Cobra model
+    :param fraction_of_optimum: Fraction of the optimal objective value which must be kept
+    :param processes: Number of worker processes, by default the number of CPUs
+    :param cache: ResultCache, optional
+    :return: DataFrame indexed by reaction id with columns minimum and maximum
+    """
+    key = None
+    if cache is not None:
+        key = cache.make_key(model_hash(model), {'analysis': 'fva', 'fraction_of_optimum': fraction_of_optimum})
+        value = cache.get(key)
+        if value is not None:
+            return pd.DataFrame(value, columns=['reaction_id', 'minimum', 'maximum']).set_index('reaction_id')
+
+    fva = cb.flux_analysis.flux_variability_analysis(model, fraction_of_optimum=fraction_of_optimum,
+                                                     processes=processes)
+    fva = fva.loc[[reaction.id for reaction in model.reactions], ['minimum', 'maximum']]
+    fva.index.name = 'reaction_id'
+    if cache is not None:
+        cache.set(key, [[reaction_id, row.minimum, row.maximum] for reaction_id, row in fva.iterrows()])
+    return fva
+
@@ -0,0 +1,56 @@
+"""
+Index of the genome annotation table (settings.GENE_MAP) with headers: locus_tag|old_locus_tag|gene|product
+
+The table is read once per process, and again only if the file changes.
+
+Usage:
+    annotation = get_annotation()
+    annotation.by_locus_tag['CLO1313_RS00010'].product
+    annotation.by_old_locus_tag['Clo1313_0001'].locus_tag
+"""
+
+import csv
+import os
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+import settings
+
+
+GeneRecord = namedtuple('GeneRecord', ['locus_tag', 'old_locus_tag', 'gene', 'product'])
+
+
+class GeneAnnotation(object):
+    """
+    Attributes:
+        records(tuple): GeneRecord in file order
+        by_locus_tag(mapping): k: locus_tag, v: GeneRecord
+        by_old_locus_tag(mapping): k: old_locus_tag, v: GeneRecord. Genes without old locus tag are not included.
+        old_to_new(mapping): k: old_locus_tag, v: locus_tag. Same content as settings.get_gene_map('old_to_new').
+        new_to_old(mapping): k: locus_tag, v: old_locus_tag (empty if there is none). Same content as
+            settings.get_gene_map('new_to_old').
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self.by_locus_tag = MappingProxyType({record.locus_tag: record for record in self.records})
+        self.by_old_locus_tag = MappingProxyType({record.old_locus_tag: record for record in self.records
+                                                  if record.old_locus_tag})
+        self.old_to_new = MappingProxyType({record.old_locus_tag: record.locus_tag for record in self.records})
+        self.new_to_old = MappingProxyType({record.locus_tag: record.old_locus_tag for record in self.records})
+
+
+def get_annotation(path=settings.GENE_MAP):
+    """ :return: GeneAnnotation"""
+    path = os.path.abspath(path)
+    return _load(path, os.stat(path).st_mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _load(path, mtime):
+    with open(path, 'r') as f:
+        reader = csv.DictReader(f)
+        missing = set(GeneRecord._fields) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError('Gene annotation {} lacks columns: {}'.format(path, ', '.join(sorted(missing))))
+        return GeneAnnotation(GeneRecord(*(row[field] for field in GeneRecord._fields)) for row in reader)
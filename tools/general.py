@@ -3,15 +3,81 @@ Additional cobra tools
 """
 
 import os
-import cobra as cb
+from collections import namedtuple
 
 
 
+# Metabolites which take part in no reaction and reactions without metabolites, in model order
+UnusedReport = namedtuple('UnusedReport', ['metabolites', 'reactions'])
+
+# Groups of reaction ids (lists in model order, groups ordered by their first reaction):
+# identical: same stoichiometry. reversed: same stoichiometry up to the direction, with both directions present.
+# same_metabolites: same set of metabolites, includes the other groups.
+DuplicateReport = namedtuple('DuplicateReport', ['identical', 'reversed', 'same_metabolites'])
+
+
+def find_unused(model):
+    """ Unused metabolites and empty reactions, found from the stoichiometry of the reactions (metabolite.reactions is
+    not used, it can keep references to removed reactions).
+    :return: UnusedReport
+    """
+    used = set()
+    empty = []
+    for reaction in model.reactions:
+        if reaction.metabolites:
+            used.update(reaction.metabolites)
+        else:
+            empty.append(reaction)
+    return UnusedReport([met for met in model.metabolites if met not in used], empty)
+
+
+def remove_unused(model, remove_empty_reactions=True):
+    """ Removes unused metabolites, and optionally empty reactions, in one call each. Removing either kind cannot make
+    other metabolites or reactions unused, a single pass is enough.
+    :return: UnusedReport of the removed metabolites and reactions
+    """
+    report = find_unused(model)
+    if not remove_empty_reactions:
+        report = UnusedReport(report.metabolites, [])
+    if report.metabolites:
+        model.remove_metabolites(report.metabolites)
+    if report.reactions:
+        model.remove_reactions(report.reactions)
+    return report
+
+
 def remove_unused_met(model):
-    # For some reason some unused metabolites will not be picked up on the first run...
-    lastdeletedmet = cb.manipulation.delete.prune_unused_metabolites(model)
-    unusedmet = lastdeletedmet
-    while lastdeletedmet:
-        lastdeletedmet = cb.manipulation.delete.prune_unused_metabolites(model)
-        unusedmet.extend(lastdeletedmet)
-    return unusedmet
+    """ Removes metabolites which take part in no reaction.
+    :return: list of removed metabolites
+    """
+    return remove_unused(model, remove_empty_reactions=False).metabolites
+
+
+def find_duplicate_reactions(model, decimals=6):
+    """ Duplicated reactions, found by grouping the reactions by a signature of their stoichiometry in one pass.
+    Bounds and gene-reaction rules are not compared, reactions without metabolites are ignored.
+    :param decimals: Coefficients are compared after rounding to this number of decimals
+    :return: DuplicateReport
+    """
+    by_stoichiometry = {}
+    by_direction_free = {}
+    by_metabolites = {}
+    for reaction in model.reactions:
+        if not reaction.metabolites:
+            continue
+        signature = tuple(sorted((met.id, round(coefficient, decimals))
+                                 for met, coefficient in reaction.metabolites.items()))
+        reverse = tuple((met_id, -coefficient) for met_id, coefficient in signature)
+        by_stoichiometry.setdefault(signature, []).append(reaction.id)
+        by_direction_free.setdefault(min(signature, reverse), set()).add(signature)
+        by_metabolites.setdefault(frozenset(met_id for met_id, _ in signature), []).append(reaction.id)
+
+    position = {reaction.id: i for i, reaction in enumerate(model.reactions)}
+
+    def groups(candidates):
+        return sorted((sorted(group, key=position.get) for group in candidates if len(group) > 1),
+                      key=lambda group: position[group[0]])
+
+    reversed_groups = [[reaction_id for signature in signatures for reaction_id in by_stoichiometry[signature]]
+                       for signatures in by_direction_free.values() if len(signatures) > 1]
+    return DuplicateReport(groups(by_stoichiometry.values()), groups(reversed_groups), groups(by_metabolites.values()))
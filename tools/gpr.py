@@ -0,0 +1,186 @@
+"""
+Compiled gene-reaction rules.
+
+Every rule is parsed once into disjunctive normal form: a reaction is catalyzed by any of its complexes and a complex
+needs all of its genes. A reaction is knocked out when every one of its complexes lacks at least one gene. The
+complexes are stored as integer bitmasks of genes, the reactions knocked out by a set of deleted genes are found with
+one bitwise test per complex of the reactions of those genes. For screens, the complexes of all reactions are also
+stored as a sparse complex x gene matrix, the knock-outs of many deletion sets are found with one matrix product.
+
+Usage:
+    index = get_index(model)
+    index.knocked_out_reactions(['CLO1313_RS05915', 'CLO1313_RS05920'])
+"""
+
+import re
+import weakref
+import numpy as np
+from scipy import sparse
+
+
+_TOKEN = re.compile(r'\(|\)|[^\s()]+')
+_SEPARATOR = re.compile(r'(\s+|[()])')
+
+# k: model, v: GPRIndex
+_indices = weakref.WeakKeyDictionary()
+
+
+def get_index(model, reactions=None):
+    """ GPRIndex of the model. It is built once and rebuilt if the gene-reaction rule of any of the reactions differs
+    from the indexed one.
+    :param reactions: Reactions to check, by default all. Callers which only use the knock-outs of some genes can check
+        the reactions of those genes.
+    """
+    index = _indices.get(model)
+    if reactions is None:
+        reactions = model.reactions
+        if index is not None and len(index.rules) != len(reactions):
+            index = None
+    if index is None or any(index.rules.get(reaction.id) != reaction.gene_reaction_rule for reaction in reactions):
+        index = GPRIndex([(reaction.id, reaction.gene_reaction_rule) for reaction in model.reactions])
+        _indices[model] = index
+    return index
+
+
+def parse_rule(rule):
+    """
+    :param rule: Gene-reaction rule, e.g. '(g1 and g2) or g3'
+    :return: list of frozensets of gene ids (complexes), empty if the rule is empty
+    """
+    tokens = _TOKEN.findall(rule)
+    if not tokens:
+        return []
+    complexes, position = _parse_or(tokens, 0, rule)
+    if position != len(tokens):
+        raise ValueError('Invalid gene-reaction rule: {}'.format(rule))
+    return _minimize(complexes)
+
+
+def rename_genes(rule, mapping):
+    """ Replaces the gene ids of a gene-reaction rule which are keys of mapping. Operators, parentheses and spacing are
+    kept as they are.
+    :param rule: Gene-reaction rule
+    :param mapping: k: gene id, v: new gene id
+    """
+    return ''.join(mapping.get(token, token) for token in _SEPARATOR.split(rule))
+
+
+class GPRIndex(object):
+    """
+    Args:
+        rules(iterable): (reaction_id, gene_reaction_rule) in model order
+    Attributes:
+        rules(dict): k: reaction_id, v: gene_reaction_rule, for all reactions
+        reaction_ids(tuple): Reactions with a gene-reaction rule
+        gene_ids(tuple): Genes in the rules
+    """
+
+    def __init__(self, rules):
+        self.rules = dict(rules)
+        reaction_ids = []
+        starts = []
+        rows = []
+        columns = []
+        gene_position = {}
+        gene_reactions = {}
+        masks = []
+        n_complexes = 0
+        for reaction_id, rule in rules:
+            complexes = parse_rule(rule)
+            if not complexes:
+                continue
+            starts.append(n_complexes)
+            reaction_masks = []
+            for genes in complexes:
+                mask = 0
+                for gene_id in genes:
+                    position = gene_position.setdefault(gene_id, len(gene_position))
+                    gene_reactions.setdefault(gene_id, []).append(len(reaction_ids))
+                    rows.append(n_complexes)
+                    columns.append(position)
+                    mask |= 1 << position
+                reaction_masks.append(mask)
+                n_complexes += 1
+            reaction_ids.append(reaction_id)
+            masks.append(tuple(reaction_masks))
+
+        self.reaction_ids = tuple(reaction_ids)
+        self.gene_ids = tuple(sorted(gene_position, key=gene_position.get))
+        self._gene_position = gene_position
+        self._gene_reactions = {gene_id: sorted(set(positions)) for gene_id, positions in gene_reactions.items()}
+        self._masks = masks
+        self._starts = np.array(starts, dtype=int)
+        self._complex_genes = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                                shape=(n_complexes, len(gene_position)))
+
+    def knocked_out_reactions(self, gene_ids):
+        """
+        :param gene_ids: Deleted genes, genes which are not in any rule are ignored
+        :return: list of reaction ids in model order
+        """
+        deleted = 0
+        candidates = set()
+        for gene_id in set(gene_ids):
+            if gene_id in self._gene_position:
+                deleted |= 1 << self._gene_position[gene_id]
+                candidates.update(self._gene_reactions[gene_id])
+        return [self.reaction_ids[i] for i in sorted(candidates) if all(mask & deleted for mask in self._masks[i])]
+
+    def knocked_out_matrix(self, deletion_sets):
+        """
+        :param deletion_sets: list of iterables of deleted gene ids
+        :return: boolean array, reactions (see reaction_ids) x deletion sets, True if the reaction is knocked out
+        """
+        rows = []
+        columns = []
+        for j, gene_ids in enumerate(deletion_sets):
+            for gene_id in set(gene_ids):
+                if gene_id in self._gene_position:
+                    rows.append(self._gene_position[gene_id])
+                    columns.append(j)
+        deleted = sparse.csc_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                    shape=(len(self.gene_ids), len(deletion_sets)))
+        if not len(self._starts):
+            return np.zeros((0, len(deletion_sets)), dtype=bool)
+        broken = (self._complex_genes.dot(deleted)).toarray() > 0
+        return np.logical_and.reduceat(broken, self._starts, axis=0)
+
+
+## Parser: or-expression := and-expression ('or' and-expression)*, and-expression := term ('and' term)*,
+## term := gene | '(' or-expression ')'. Expressions are returned as lists of complexes.
+
+def _parse_or(tokens, position, rule):
+    complexes, position = _parse_and(tokens, position, rule)
+    while position < len(tokens) and tokens[position].lower() == 'or':
+        other, position = _parse_and(tokens, position + 1, rule)
+        complexes = complexes + other
+    return complexes, position
+
+
+def _parse_and(tokens, position, rule):
+    complexes, position = _parse_term(tokens, position, rule)
+    while position < len(tokens) and tokens[position].lower() == 'and':
+        other, position = _parse_term(tokens, position + 1, rule)
+        complexes = _minimize([a | b for a in complexes for b in other])
+    return complexes, position
+
+
+def _parse_term(tokens, position, rule):
+    if position >= len(tokens) or tokens[position] == ')' or tokens[position].lower() in ('and', 'or'):
+        raise ValueError('Invalid gene-reaction rule: {}'.format(rule))
+    if tokens[position] == '(':
+        complexes, position = _parse_or(tokens, position + 1, rule)
+        if position >= len(tokens) or tokens[position] != ')':
+            raise ValueError('Unbalanced parentheses in gene-reaction rule: {}'.format(rule))
+        return complexes, position + 1
+    return [frozenset([tokens[position]])], position + 1
+
+
+def _minimize(complexes):
+    """ Removes duplicated complexes and complexes containing another complex (a or (a and b) is a)."""
+    unique = sorted(set(complexes), key=len)
+    minimal = []
+    for genes in unique:
+        if not any(other <= genes for other in minimal):
+            minimal.append(genes)
+    return minimal
@@ -0,0 +1,67 @@
+"""
+Groups of potential isomers: metabolites with the same empirical formula.
+
+Formulas are compared in a canonical form (Hill order: C, H, then the other elements alphabetically), so 'H2O' and
+'OH2' are the same formula. Isomers with different charges also differ in their number of protons; with neutralize,
+formulas are compared at a charge of 0 (one hydrogen added per negative charge, removed per positive charge).
+
+Usage:
+    table = isomer_table(model.metabolites)
+    table.to_csv('isomers.csv', index=False)
+"""
+
+import pandas as pd
+
+
+ISOMER_FIELDS = ['group_index', 'formula', 'formula_count', 'id', 'name']
+
+
+def canonical_formula(metabolite, neutralize=False):
+    """
+    :param metabolite: cobra.Metabolite
+    :param neutralize: Compare at a charge of 0, metabolites without charge are taken as neutral
+    :return: Formula string in Hill order, the formula as it is if it cannot be parsed (see cobra.Metabolite.elements)
+    """
+    elements = metabolite.elements
+    if elements is None:
+        return metabolite.formula
+    elements = dict(elements)
+    if neutralize and metabolite.charge:
+        elements['H'] = elements.get('H', 0) - metabolite.charge
+    order = [element for element in ['C', 'H'] if element in elements] + \
+        sorted(element for element in elements if element not in ('C', 'H'))
+    return ''.join(element + ('' if elements[element] == 1 else _format_count(elements[element]))
+                   for element in order if elements[element] != 0)
+
+
+def group_isomers(metabolites, neutralize=False):
+    """
+    :param metabolites: iterable of cobra.Metabolite, metabolites without formula are ignored
+    :param neutralize: see canonical_formula
+    :return: dict, k: canonical formula, v: list of metabolites. Keys are ordered by first appearance.
+    """
+    groups = {}
+    for met in metabolites:
+        if met.formula:
+            groups.setdefault(canonical_formula(met, neutralize), []).append(met)
+    return groups
+
+
+def isomer_table(metabolites, neutralize=False):
+    """
+    :param metabolites: see group_isomers
+    :param neutralize: see canonical_formula
+    :return: DataFrame with columns ISOMER_FIELDS, with one row per metabolite in a group of at least two. The
+        formula is the one of the metabolite. The group_index is the position of the canonical formula in order of
+        first appearance, groups are sorted by decreasing group_index and keep the metabolite order.
+    """
+    rows = []
+    for group_index, mets in enumerate(group_isomers(metabolites, neutralize).values()):
+        if len(mets) > 1:
+            rows.extend((group_index, met.formula, len(mets), met.id, met.name) for met in mets)
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return pd.DataFrame(rows, columns=ISOMER_FIELDS)
+
+
+def _format_count(count):
+    return str(int(count)) if float(count).is_integer() else str(count)
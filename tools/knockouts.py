@@ -0,0 +1,166 @@
+"""
+Knock-out simulations which re-optimize from the wild type solution instead of solving every mutant from scratch.
+
+- The wild type is solved once. A knock-out which only blocks reactions that carry no flux in the wild type solution
+  cannot change the optimum: the wild type solution is still feasible. Its growth is the wild type growth and it is
+  not solved. The same holds for any parent knock-out and its extensions (see KnockoutSimulator.solve).
+- Bounds are set directly on the solver variables and restored after each mutant, without the model history. The
+  solver keeps its basis, each mutant is re-optimized from the basis of the previous one (GLPK, CPLEX, and Gurobi
+  warm start after bound changes). Knock-outs are ordered so that consecutive mutants share reactions.
+  Restoring the wild type basis before every mutant was tried, with GLPK it is slower than starting from the
+  previous basis.
+
+Results have the same shape as cobra.flux_analysis.single_reaction_deletion and single_gene_deletion: DataFrame
+indexed by frozensets of the knocked-out ids with the columns growth and status.
+"""
+
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import pandas as pd
+from tools import gpr
+
+
+# growth, solver status, and support: frozenset of the reactions carrying flux (None if the solution is not optimal or
+# the support was not requested)
+KnockoutResult = namedtuple('KnockoutResult', ['growth', 'status', 'support'])
+
+
+class KnockoutSimulator(object):
+    """
+    Usage:
+        simulator = KnockoutSimulator(model)
+        growth, status = simulator.simulate(['PGI', 'PFK'])
+
+    The model must not be modified while the simulator is used, the wild type solution is only computed once.
+    """
+
+    def __init__(self, model, zero_cutoff=1e-9):
+        self.model = model
+        self.zero_cutoff = zero_cutoff
+        growth = model.slim_optimize(error_value=float('nan'))
+        status = model.solver.status
+        self.wild_type = KnockoutResult(growth, status, self._get_support() if status == 'optimal' else None)
+
+    def simulate(self, reaction_ids):
+        """
+        Growth with the reactions blocked. The model is left unchanged.
+        :param reaction_ids: iterable of reaction ids
+        :return: (growth, solver status)
+        """
+        result = self.solve(reaction_ids)
+        return result.growth, result.status
+
+    def solve(self, reaction_ids, parent=None, support=False):
+        """
+        :param reaction_ids: iterable of reaction ids to block
+        :param parent: KnockoutResult with support of a knock-out of a subset of reaction_ids, by default the wild type.
+            If none of the reactions carries flux in the parent solution the parent result is returned without solving.
+        :param support: Whether to compute the support of the solution
+        :return: KnockoutResult
+        """
+        reaction_ids = set(reaction_ids)
+        parent = self.wild_type if parent is None else parent
+        if parent.support is not None and not reaction_ids & parent.support:
+            return parent
+
+        variables = []
+        for reaction_id in reaction_ids:
+            reaction = self.model.reactions.get_by_id(reaction_id)
+            variables.extend([reaction.forward_variable, reaction.reverse_variable])
+        original_bounds = [(variable.lb, variable.ub) for variable in variables]
+        try:
+            for variable in variables:
+                variable.set_bounds(0, 0)
+            growth = self.model.slim_optimize(error_value=float('nan'))
+            status = self.model.solver.status
+            result = KnockoutResult(growth, status, self._get_support() if support and status == 'optimal' else None)
+        finally:
+            for variable, (lb, ub) in zip(variables, original_bounds):
+                variable.set_bounds(lb, ub)
+        return result
+
+    def _get_support(self):
+        """ Reactions whose forward or reverse variable is non-zero in the current solution."""
+        return frozenset(reaction.id for reaction in self.model.reactions
+                         if abs(reaction.forward_variable.primal) > self.zero_cutoff
+                         or abs(reaction.reverse_variable.primal) > self.zero_cutoff)
+
+
+def reaction_deletion(model, reaction_list=None, processes=1, zero_cutoff=1e-9):
+    """
+    Growth after blocking reactions.
+    :param model: Cobra model
+    :param reaction_list: list of reaction ids (single knock-outs) or of iterables of reaction ids (multiple knock-outs),
+        by default every reaction in the model
+    :param processes: Number of worker processes, each worker simulates a contiguous block of ordered knock-outs
+    :param zero_cutoff: Fluxes below this value are considered zero in the wild type solution
+    :return: DataFrame indexed by frozenset of reaction ids with columns growth and status
+    """
+    if reaction_list is None:
+        reaction_list = [reaction.id for reaction in model.reactions]
+    knockouts = [_as_frozenset(ids) for ids in reaction_list]
+    return _deletion(model, list(zip(knockouts, knockouts)), processes, zero_cutoff)
+
+
+def gene_deletion(model, gene_list=None, processes=1, zero_cutoff=1e-9):
+    """
+    Growth after deleting genes. Reactions are blocked if their gene-reaction rule evaluates to false (see tools.gpr).
+    :param model: Cobra model
+    :param gene_list: list of gene ids (single deletions) or of iterables of gene ids (multiple deletions), by default
+        every gene in the model
+    :param processes: see reaction_deletion
+    :param zero_cutoff: see reaction_deletion
+    :return: DataFrame indexed by frozenset of gene ids with columns growth and status
+    """
+    if gene_list is None:
+        gene_list = [gene.id for gene in model.genes]
+    gene_sets = [_as_frozenset(ids) for ids in gene_list]
+    for gene_ids in gene_sets:
+        for gene_id in gene_ids:
+            model.genes.get_by_id(gene_id)
+    index = gpr.get_index(model)
+    knocked_out = index.knocked_out_matrix(gene_sets)
+    deletions = [(gene_ids, frozenset(index.reaction_ids[i] for i in np.flatnonzero(knocked_out[:, j])))
+                 for j, gene_ids in enumerate(gene_sets)]
+    return _deletion(model, deletions, processes, zero_cutoff)
+
+
+def _deletion(model, deletions, processes, zero_cutoff):
+    """ deletions: list of (index, frozenset of reaction ids)"""
+    position = {reaction.id: i for i, reaction in enumerate(model.reactions)}
+    # Knock-outs sharing reactions become neighbours
+    deletions = sorted(set(deletions), key=lambda deletion: sorted(position[rid] for rid in deletion[1]))
+
+    processes = max(1, min(processes or cpu_count(), len(deletions)))
+    if processes == 1:
+        simulator = KnockoutSimulator(model, zero_cutoff)
+        results = [simulator.simulate(reaction_ids) for _, reaction_ids in deletions]
+    else:
+        chunk_size = -(-len(deletions) // processes)
+        chunks = [[reaction_ids for _, reaction_ids in deletions[i:i + chunk_size]]
+                  for i in range(0, len(deletions), chunk_size)]
+        with Pool(processes, initializer=_init_worker, initargs=(model, zero_cutoff)) as pool:
+            results = [result for chunk in pool.map(_simulate_chunk, chunks) for result in chunk]
+
+    table = pd.DataFrame([(ids, growth, status) for (ids, _), (growth, status) in zip(deletions, results)],
+                         columns=['ids', 'growth', 'status'])
+    return table.set_index('ids')
+
+
+def _as_frozenset(ids):
+    if isinstance(ids, str):
+        return frozenset([ids])
+    return frozenset(ids)
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(model, zero_cutoff):
+    _worker['simulator'] = KnockoutSimulator(model, zero_cutoff)
+
+
+def _simulate_chunk(chunk):
+    return [_worker['simulator'].simulate(reaction_ids) for reaction_ids in chunk]
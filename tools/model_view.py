@@ -0,0 +1,235 @@
+"""
+Read-only view of a model for metadata queries, backed by the arrays of its snapshot (see tools.snapshot).
+
+Loading a view only reads the snapshot, no cobra objects and no solver are built. Metabolites, reactions and genes are
+small __slots__ records with the attributes of their cobra counterparts, notes and annotations are decoded on first
+access. The reactions of metabolites and genes, and the notes by key, come from indexes built once from the arrays.
+The cobra model, with its solver, is only built when view.model is used.
+
+Usage:
+    view = load_view(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'))
+    view.metabolites.get_by_id('atp_c').formula
+    [reaction.id for reaction in view.genes.get_by_id('CLO1313_RS09510').reactions]
+    view.notes_by_key('CONFIDENCE LEVEL') # k: reaction id, v: note value
+    view.model.slim_optimize() # Builds the cobra model
+"""
+
+import numpy as np
+import cobra as cb
+from tools import snapshot
+
+
+class RecordList(tuple):
+    """ Records in model order, with lookup by id as in cobra.DictList."""
+
+    def __new__(cls, records):
+        record_list = super(RecordList, cls).__new__(cls, records)
+        record_list._positions = {record.id: i for i, record in enumerate(record_list)}
+        return record_list
+
+    def get_by_id(self, record_id):
+        """ Raises KeyError if there is no record with this id."""
+        return self[self._positions[record_id]]
+
+    def has_id(self, record_id):
+        return record_id in self._positions
+
+
+class _Record(object):
+    __slots__ = ('_view', '_position', 'id', 'name')
+    _kind = None
+
+    def __init__(self, view, position, record_id, name):
+        self._view = view
+        self._position = position
+        self.id = record_id
+        self.name = name
+
+    def __repr__(self):
+        return '<{} {}>'.format(type(self).__name__, self.id)
+
+    @property
+    def notes(self):
+        return self._view._snapshot.extras(self._kind)[self._position].get('notes', {})
+
+    @property
+    def annotation(self):
+        return self._view._snapshot.extras(self._kind)[self._position].get('annotation', {})
+
+
+class MetaboliteRecord(_Record):
+    __slots__ = ('compartment', 'formula', 'charge')
+    _kind = 'metabolites'
+
+    def __init__(self, view, position, record_id, name, compartment, formula, charge):
+        super(MetaboliteRecord, self).__init__(view, position, record_id, name)
+        self.compartment = compartment
+        self.formula = formula
+        self.charge = charge
+
+    # Same parsing (and warnings) as cobra.Metabolite
+    elements = property(cb.Metabolite.elements.fget)
+
+    @property
+    def reactions(self):
+        """ tuple of ReactionRecord, in model order."""
+        return self._view._reactions_of('metabolites', self._position)
+
+
+class ReactionRecord(_Record):
+    __slots__ = ('subsystem', 'gene_reaction_rule', 'lower_bound', 'upper_bound', 'objective_coefficient')
+    _kind = 'reactions'
+
+    def __init__(self, view, position, record_id, name, subsystem, gene_reaction_rule, lower_bound, upper_bound,
+                 objective_coefficient):
+        super(ReactionRecord, self).__init__(view, position, record_id, name)
+        self.subsystem = subsystem
+        self.gene_reaction_rule = gene_reaction_rule
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+        self.objective_coefficient = objective_coefficient
+
+    @property
+    def metabolites(self):
+        """ dict, k: MetaboliteRecord, v: coefficient."""
+        return self._view._metabolites_of(self._position)
+
+    @property
+    def genes(self):
+        """ tuple of GeneRecord."""
+        return self._view._genes_of(self._position)
+
+    @property
+    def reversibility(self):
+        return self.lower_bound < 0 < self.upper_bound
+
+    @property
+    def boundary(self):
+        return len(self.metabolites) == 1
+
+
+class GeneRecord(_Record):
+    __slots__ = ()
+    _kind = 'genes'
+
+    @property
+    def reactions(self):
+        """ tuple of ReactionRecord, in model order."""
+        return self._view._reactions_of('genes', self._position)
+
+
+class ModelView(object):
+    """
+    Args:
+        model_snapshot(tools.snapshot.Snapshot)
+    Attributes:
+        id(str)
+        metabolites, reactions, genes(RecordList)
+    """
+
+    def __init__(self, model_snapshot):
+        self._snapshot = model_snapshot
+        self._model = None
+        self._indexes = {}
+        self.id = model_snapshot.extras('model').get('id')
+
+        charges = [None if np.isnan(charge) else charge for charge in model_snapshot.charges.tolist()]
+        self.metabolites = RecordList(
+            MetaboliteRecord(self, i, *fields) for i, fields in enumerate(zip(
+                model_snapshot.metabolite_ids, self._strings('metabolites', 'name', ''),
+                self._strings('metabolites', 'compartment', None), self._strings('metabolites', 'formula', None),
+                charges)))
+        self.reactions = RecordList(
+            ReactionRecord(self, i, *fields) for i, fields in enumerate(zip(
+                model_snapshot.reaction_ids, self._strings('reactions', 'name', ''),
+                self._strings('reactions', 'subsystem', ''), self._strings('reactions', 'gene_reaction_rule', ''),
+                model_snapshot.lower_bounds.tolist(), model_snapshot.upper_bounds.tolist(),
+                model_snapshot.objective_coefficients.tolist())))
+        self.genes = RecordList(
+            GeneRecord(self, i, *fields) for i, fields in enumerate(zip(
+                model_snapshot.gene_ids, self._strings('genes', 'name', ''))))
+
+    def _strings(self, kind, field, default):
+        """ String attribute of the records, the cobra default where the model file has none."""
+        return [default if value is None else value for value in self._snapshot.strings(kind, field)]
+
+    def __repr__(self):
+        return '<ModelView {}: {} reactions, {} metabolites, {} genes>'.format(
+            self.id, len(self.reactions), len(self.metabolites), len(self.genes))
+
+    @property
+    def model(self):
+        """ cobra.Model of the snapshot, built on first access. Changes to it are not reflected in the view."""
+        if self._model is None:
+            self._model = self._snapshot.to_model()
+        return self._model
+
+    @property
+    def stoichiometry(self):
+        """ scipy.sparse.csc_matrix, metabolites x reactions."""
+        return self._snapshot.stoichiometry
+
+    @property
+    def lower_bounds(self):
+        return self._snapshot.lower_bounds
+
+    @property
+    def upper_bounds(self):
+        return self._snapshot.upper_bounds
+
+    def notes_by_key(self, key, kind='reactions'):
+        """
+        :param key: Notes key, e.g. 'CONFIDENCE LEVEL'
+        :param kind: 'metabolites', 'reactions' or 'genes'
+        :return: dict, k: id of the records with this key in their notes, v: notes value
+        """
+        index_key = ('notes', kind)
+        if index_key not in self._indexes:
+            index = {}
+            for record, extras in zip(getattr(self, kind), self._snapshot.extras(kind)):
+                for note_key, value in extras.get('notes', {}).items():
+                    index.setdefault(note_key, {})[record.id] = value
+            self._indexes[index_key] = index
+        return self._indexes[index_key].get(key, {})
+
+    def _reactions_of(self, kind, position):
+        if kind not in self._indexes:
+            if kind == 'metabolites':
+                rows, columns = self._snapshot.stoichiometry_rows, self._snapshot.stoichiometry_columns
+            else:
+                rows, columns = self._snapshot.gene_rows, self._snapshot.gene_columns
+            self._indexes[kind] = [tuple(self.reactions[j] for j in group)
+                                   for group in _group(rows, columns, len(getattr(self, kind)))]
+        return self._indexes[kind][position]
+
+    def _metabolites_of(self, position):
+        if 'stoichiometry' not in self._indexes:
+            entries = np.arange(len(self._snapshot.stoichiometry_columns))
+            self._indexes['stoichiometry'] = _group(self._snapshot.stoichiometry_columns, entries, len(self.reactions))
+        entries = self._indexes['stoichiometry'][position]
+        return {self.metabolites[i]: coefficient for i, coefficient in
+                zip(self._snapshot.stoichiometry_rows[entries].tolist(),
+                    self._snapshot.stoichiometry_values[entries].tolist())}
+
+    def _genes_of(self, position):
+        if 'reaction_genes' not in self._indexes:
+            self._indexes['reaction_genes'] = [
+                tuple(self.genes[i] for i in group)
+                for group in _group(self._snapshot.gene_columns, self._snapshot.gene_rows, len(self.reactions))]
+        return self._indexes['reaction_genes'][position]
+
+
+def _group(keys, values, count):
+    """ :return: list with the values of each key from 0 to count - 1, in their original order."""
+    order = np.argsort(keys, kind='stable')
+    bounds = np.searchsorted(keys[order], np.arange(count + 1))
+    values = np.asarray(values)[order]
+    return [values[bounds[i]:bounds[i + 1]].tolist() for i in range(count)]
+
+
+def load_view(path):
+    """
+    :param path: Model file, .json or sbml (.xml, .sbml). Its snapshot is made first if there is no up to date one.
+    :return: ModelView
+    """
+    return ModelView(snapshot.load_arrays(path))
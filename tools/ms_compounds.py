@@ -0,0 +1,278 @@
+"""
+Memory-mapped index of the ModelSEED compounds table (iCBI/ms_info/compounds.tsv), for metadata and id mapping
+without pandas.
+
+The index is a binary file next to the table (compounds.tsv -> compounds.tsv.index), written once from the table and
+then memory-mapped, so that only the pages of the compounds which are looked up are read. It holds:
+- the formula, charge and inchikey of every compound, and its aliases parsed into a dict (database: list of ids)
+- a hash table of the compound ids, and one of the aliases (database and id) to the compounds which have them, so that
+  both lookups take constant time
+- the sha256 of the table it was made from; the index of a table which changed since is written again
+
+The file starts with a magic string and the length of a json header, which gives the dtype, length and position of
+each array. All strings are stored once, utf-8 encoded, in one array, and referred to by their position.
+
+Usage:
+    compounds = load_index() # iCBI/ms_info/compounds.tsv
+    'cpd00027' in compounds
+    compounds.get('cpd00027').formula # Also charge, inchikey and aliases, None for missing values
+    compounds.find('BiGG', 'glc__D') # ['cpd00027']
+"""
+
+import collections
+import csv
+import json
+import mmap
+import os
+import struct
+import zlib
+import numpy as np
+import settings
+from tools.snapshot import file_hash
+
+
+FORMAT_VERSION = 1
+INDEX_SUFFIX = '.index'
+DEFAULT_COMPOUNDS = os.path.join(settings.PROJECT_ROOT, 'iCBI', 'ms_info', 'compounds.tsv')
+
+_MAGIC = b'MSCPDIDX'
+_ALIGNMENT = 64
+_MISSING = {'', 'null', 'None', 'NA', 'NaN', 'nan', 'N/A'} # Read as missing values, as pandas.read_csv does
+
+Compound = collections.namedtuple('Compound', ['id', 'formula', 'charge', 'inchikey', 'aliases'])
+
+
+class CompoundIndex(object):
+    """
+    Compounds of a memory-mapped index, see load_index.
+
+    Attributes:
+        source_hash(str): sha256 of the compounds table the index was made from
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buffer[:len(_MAGIC)] != _MAGIC:
+            self._buffer.close()
+            raise ValueError('{} is not a compound index'.format(path))
+        header_length, = struct.unpack_from('<Q', self._buffer, len(_MAGIC))
+        start = len(_MAGIC) + 8
+        header = json.loads(self._buffer[start:start + header_length].decode('utf-8'))
+        self.format_version = header['format_version']
+        self.source_hash = header['source_hash']
+        data_start = _aligned(start + header_length)
+        self._arrays = {name: np.frombuffer(self._buffer, dtype=dtype, count=length, offset=data_start + offset)
+                        for name, (dtype, length, offset) in header['arrays'].items()}
+        self._string_offsets = self._arrays['strings.offsets']
+        self._string_data = self._arrays['strings.data']
+
+    def __len__(self):
+        return len(self._arrays['compounds.id'])
+
+    def __contains__(self, cpd_id):
+        return self._row(cpd_id) is not None
+
+    def get(self, cpd_id):
+        """ :return: Compound, None if there is no compound with this id"""
+        row = self._row(cpd_id)
+        if row is None:
+            return None
+        charge = self._arrays['compounds.charge'][row]
+        aliases = self._string(self._arrays['compounds.aliases'][row])
+        return Compound(cpd_id, self._string(self._arrays['compounds.formula'][row]),
+                        None if np.isnan(charge) else int(charge),
+                        self._string(self._arrays['compounds.inchikey'][row]),
+                        {} if aliases is None else json.loads(aliases))
+
+    def find(self, db, alias):
+        """
+        :param db: Database of the alias as named in the table, e.g. BiGG, KEGG
+        :param alias: id in that database
+        :return: ids of the compounds with this alias
+        """
+        key = _alias_key(db, alias)
+        position = self._lookup(self._arrays['aliases.table'], self._arrays['aliases.key'], key)
+        if position is None:
+            return []
+        start, end = self._arrays['aliases.start'][position:position + 2]
+        return [self._string(self._arrays['compounds.id'][row]) for row in self._arrays['aliases.compounds'][start:end]]
+
+    def close(self):
+        """ Unmaps the index file, the index cannot be used after. The file can only be replaced (written again) once
+        it is closed on Windows."""
+        self._arrays = {}
+        self._string_offsets = self._string_data = None # The arrays refer to the buffer, which cannot be closed before
+        self._buffer.close()
+
+    def _row(self, cpd_id):
+        if not isinstance(cpd_id, str):
+            return None
+        return self._lookup(self._arrays['compounds.table'], self._arrays['compounds.id'], cpd_id)
+
+    def _lookup(self, table, keys, key):
+        """ Open addressing with linear probing, see _hash_table."""
+        encoded = key.encode('utf-8')
+        mask = len(table) - 1
+        slot = zlib.crc32(encoded) & mask
+        while table[slot] >= 0:
+            position = int(table[slot])
+            string = int(keys[position])
+            if self._string_data[self._string_offsets[string]:self._string_offsets[string + 1]].tobytes() == encoded:
+                return position
+            slot = (slot + 1) & mask
+        return None
+
+    def _string(self, position):
+        if position < 0:
+            return None
+        start, end = self._string_offsets[position:position + 2]
+        return self._string_data[start:end].tobytes().decode('utf-8')
+
+
+def index_path(path):
+    """ Path of the index of a compounds table."""
+    return path + INDEX_SUFFIX
+
+
+def read_compounds(path):
+    """
+    :param path: ModelSEED compounds table, tab separated with id, formula, charge, inchikey and aliases columns
+    :return: list of Compound, in the order of the table. Aliases are given as 'db:id|id;db:id', the first row of a
+        repeated id is used.
+    """
+    compounds = []
+    seen = set()
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f, delimiter='\t'):
+            cpd_id = row['id']
+            if cpd_id in seen:
+                continue
+            seen.add(cpd_id)
+            values = {field: None if row.get(field) is None or row[field] in _MISSING else row[field]
+                      for field in ['formula', 'charge', 'inchikey', 'aliases']}
+            compounds.append(Compound(cpd_id, values['formula'], _parse_charge(values['charge']), values['inchikey'],
+                                      _parse_aliases(values['aliases'])))
+    return compounds
+
+
+def write_index(compounds, path, source_hash=''):
+    """
+    :param compounds: list of Compound, see read_compounds
+    :param path: index file
+    :param source_hash: sha256 of the compounds table, see tools.snapshot.file_hash
+    """
+    strings = {}
+
+    def add(value):
+        if value is None:
+            return -1
+        return strings.setdefault(value, len(strings))
+
+    id_positions = [add(compound.id) for compound in compounds]
+    arrays = collections.OrderedDict()
+    arrays['compounds.id'] = np.array(id_positions, dtype=np.int32)
+    arrays['compounds.formula'] = np.array([add(compound.formula) for compound in compounds], dtype=np.int32)
+    arrays['compounds.charge'] = np.array([np.nan if compound.charge is None else compound.charge
+                                           for compound in compounds], dtype=float)
+    arrays['compounds.inchikey'] = np.array([add(compound.inchikey) for compound in compounds], dtype=np.int32)
+    arrays['compounds.aliases'] = np.array([add(json.dumps(compound.aliases, sort_keys=True))
+                                            if compound.aliases else -1 for compound in compounds], dtype=np.int32)
+    arrays['compounds.table'] = _hash_table([compound.id for compound in compounds])
+
+    alias_rows = collections.OrderedDict() # k: alias key, v: rows of the compounds with the alias
+    for row, compound in enumerate(compounds):
+        for db, values in compound.aliases.items():
+            for value in values:
+                rows = alias_rows.setdefault(_alias_key(db, value), [])
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+    arrays['aliases.key'] = np.array([add(key) for key in alias_rows], dtype=np.int32)
+    arrays['aliases.start'] = np.cumsum([0] + [len(rows) for rows in alias_rows.values()], dtype=np.int64)
+    arrays['aliases.compounds'] = np.array([row for rows in alias_rows.values() for row in rows], dtype=np.int32)
+    arrays['aliases.table'] = _hash_table(list(alias_rows))
+
+    encoded = [value.encode('utf-8') for value in strings]
+    arrays['strings.offsets'] = np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64)
+    arrays['strings.data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    layout = collections.OrderedDict()
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, len(array), offset]
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'format_version': FORMAT_VERSION, 'source_hash': source_hash,
+                         'arrays': layout}).encode('utf-8')
+
+    # Written to a temporary file first, so that an interrupted write never leaves a broken index
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as f:
+        f.write(_MAGIC + struct.pack('<Q', len(header)) + header)
+        data_start = _aligned(f.tell())
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + layout[name][2] - f.tell()))
+            f.write(array.tobytes())
+        f.write(b'\0' * (data_start + offset - f.tell())) # Empty arrays at the end are within the file too
+    os.replace(temporary_path, path)
+
+
+def load_index(path=DEFAULT_COMPOUNDS):
+    """
+    Index of a compounds table, the index is written first if there is no up to date one.
+    :param path: ModelSEED compounds table, see read_compounds
+    :return: CompoundIndex
+    """
+    source_hash = file_hash(path)
+    if os.path.isfile(index_path(path)):
+        try:
+            index = CompoundIndex(index_path(path))
+        except ValueError:
+            index = None
+        if index is not None and index.format_version == FORMAT_VERSION and index.source_hash == source_hash:
+            return index
+        if index is not None:
+            index.close()
+    write_index(read_compounds(path), index_path(path), source_hash)
+    return CompoundIndex(index_path(path))
+
+
+def _parse_charge(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_aliases(value):
+    """ :return: dict, k: database, v: list of ids"""
+    aliases = {}
+    if value is None:
+        return aliases
+    for entry in value.split(';'):
+        db, separator, ids = entry.partition(':')
+        if separator:
+            aliases[db.strip()] = [alias.strip() for alias in ids.split('|')]
+    return aliases
+
+
+def _alias_key(db, alias):
+    return '{}:{}'.format(db, alias)
+
+
+def _hash_table(keys):
+    """ :return: Slots of a hash table with at least twice as many slots as keys, -1 for empty slots, others the
+        position of the key (crc32 of the utf-8 key, linear probing)."""
+    size = 1
+    while size < 2 * len(keys):
+        size *= 2
+    table = [-1] * size
+    for position, key in enumerate(keys):
+        slot = zlib.crc32(key.encode('utf-8')) & (size - 1)
+        while table[slot] >= 0:
+            slot = (slot + 1) & (size - 1)
+        table[slot] = position
+    return np.array(table, dtype=np.int32)
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
@@ -0,0 +1,125 @@
+"""
+Growth rate of engineered strains as a fraction of wild type growth, for one or more models.
+
+Strains are defined in a csv table with columns:
+
+- strain: Strain name.
+- knockouts: Reaction ids to block.
+- uptakes: Exchange reaction ids opened for uptake, bounds (-1000, 0).
+- secretions: Exchange reaction ids opened for secretion, bounds (0, 1000).
+- boundaries: Metabolite ids for which a boundary reaction is added (see cobra.Model.add_boundary).
+- added_reactions: Reactions added to the strain as 'reaction_id: equation'. A reaction is only added to models which
+  lack it, e.g. a reaction present in iCBI is added to iAT only.
+
+Multiple ids are separated by ';' and empty fields are allowed. Ids refer to the reference model, other models are
+configured with a map from reference ids to their own ids (see ScreenModel).
+"""
+
+import csv
+from collections import namedtuple
+from multiprocessing import Pool, cpu_count
+import cobra as cb
+import pandas as pd
+
+
+STRAIN_FIELDS = ['strain', 'knockouts', 'uptakes', 'secretions', 'boundaries', 'added_reactions']
+
+Strain = namedtuple('Strain', STRAIN_FIELDS)
+
+# name: column name in the output, reaction_map and metabolite_map: dictionaries from reference ids to model ids,
+# ids missing from the maps are used as is.
+ScreenModel = namedtuple('ScreenModel', ['name', 'model', 'reaction_map', 'metabolite_map'])
+
+
+def read_strains(path):
+    """
+    :param path: csv file with the columns described in the module docstring
+    :return: list of Strain, list fields are tuples. added_reactions is a tuple of (reaction_id, equation).
+    """
+    strains = []
+    with open(path, 'r') as f:
+        reader = csv.DictReader(f)
+        missing = set(STRAIN_FIELDS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError('Strain table {} lacks columns: {}'.format(path, ', '.join(sorted(missing))))
+        for row in reader:
+            fields = {field: _split(row[field]) for field in STRAIN_FIELDS[1:]}
+            added_reactions = []
+            for definition in fields['added_reactions']:
+                reaction_id, sep, equation = definition.partition(':')
+                if not sep:
+                    raise ValueError('Invalid added reaction for strain {}: {}'.format(row['strain'], definition))
+                added_reactions.append((reaction_id.strip(), equation.strip()))
+            fields['added_reactions'] = tuple(added_reactions)
+            strains.append(Strain(strain=row['strain'], **fields))
+    return strains
+
+
+def run_screen(screen_models, strains, processes=None):
+    """
+    Computes the growth of each strain in each model relative to the wild type growth of that model.
+    Strains are simulated in a process pool, each worker holds its own copy of the models.
+    :param screen_models: list of ScreenModel
+    :param strains: list of Strain (see read_strains)
+    :param processes: Number of worker processes, by default the number of CPUs. Use 1 to run in this process.
+    :return: DataFrame indexed by strain with one column per model name
+    """
+    wild_type = [screen_model.model.slim_optimize(error_value=float('nan')) for screen_model in screen_models]
+    jobs = [(i, strain) for strain in strains for i in range(len(screen_models))]
+
+    if processes is None:
+        processes = min(cpu_count(), len(jobs))
+    if processes <= 1 or len(jobs) <= 1:
+        _init_worker(screen_models)
+        growth = [_strain_growth(job) for job in jobs]
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=(screen_models,)) as pool:
+            growth = pool.map(_strain_growth, jobs)
+
+    table = pd.DataFrame(index=pd.Index([strain.strain for strain in strains], name='Strain'),
+                         columns=[screen_model.name for screen_model in screen_models], dtype=float)
+    for (i, strain), value in zip(jobs, growth):
+        table.loc[strain.strain, screen_models[i].name] = value / wild_type[i]
+    return table
+
+
+def apply_strain(screen_model, strain):
+    """ Configures screen_model.model as strain. Changes are reverted on exit if the model is used as a context."""
+    model = screen_model.model
+    rxn_id = lambda reference_id: (screen_model.reaction_map or {}).get(reference_id, reference_id)
+    met_id = lambda reference_id: (screen_model.metabolite_map or {}).get(reference_id, reference_id)
+
+    for reaction_id in strain.knockouts:
+        model.reactions.get_by_id(rxn_id(reaction_id)).knock_out()
+    for reaction_id in strain.uptakes:
+        model.reactions.get_by_id(rxn_id(reaction_id)).bounds = (-1000, 0)
+    for reaction_id in strain.secretions:
+        model.reactions.get_by_id(rxn_id(reaction_id)).bounds = (0, 1000)
+    for metabolite_id in strain.boundaries:
+        model.add_boundary(model.metabolites.get_by_id(met_id(metabolite_id)))
+    for reaction_id, equation in strain.added_reactions:
+        if rxn_id(reaction_id) not in model.reactions:
+            reaction = cb.Reaction(id=rxn_id(reaction_id))
+            model.add_reactions([reaction])
+            reaction.reaction = ' '.join(met_id(token) for token in equation.split())
+    return model
+
+
+def _split(field):
+    return tuple(item.strip() for item in (field or '').split(';') if item.strip())
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(screen_models):
+    _worker['screen_models'] = screen_models
+
+
+def _strain_growth(job):
+    i, strain = job
+    screen_model = _worker['screen_models'][i]
+    with screen_model.model:
+        apply_strain(screen_model, strain)
+        return screen_model.model.slim_optimize(error_value=float('nan'))
@@ -0,0 +1,245 @@
+"""
+Incremental, parallel runner for the model building scripts.
+
+Every step declares the files it reads and the files it writes. A step is only run again when the content of one of
+its inputs, or of its script, changed since its last run, or when one of its outputs is missing or was changed by
+something else. The sha256 of the inputs and outputs of the last run of every step are kept in a json file in
+settings.CACHE_ROOT, shared by all pipelines, so step names must be unique across pipelines.
+
+The steps form a graph: a step depends on the steps which write its inputs. Steps whose dependencies are done run at
+the same time in a pool of processes, a step whose outputs come out the same as before does not make the next steps run
+again. A step with inputs which are missing, and not written by another step, is skipped (e.g. raw data which is not
+part of the repository). When a step fails, the steps which do not depend on it still run, and its exception is raised
+at the end. A report with the wall time of every step is printed at the end of the run.
+
+A step script has a function main(), or does its work when it is run. Models are handed over through their files:
+each step loads its model_input, which is fast from the snapshot (see tools.snapshot) written with the model file, and
+lets steps run in separate processes.
+
+Changes to the tools modules used by the steps are not detected, use force to run all steps.
+
+Usage:
+    pipeline = Pipeline('iSG', [
+        Step('basic_model', 'steps/6_basic_model.py', inputs=['iSG/basic_model_curation_reactions_curated.csv'],
+             model_input='iSG/iSG_2.json', model_output='iSG/iSG_3.json'),
+        Step('consolidate_BOF', 'steps/7_consolidate_BOF.py', outputs=['iSG/iSG_4.xml'],
+             model_input='iSG/iSG_3.json', model_output='iSG/iSG_4.json')])
+    pipeline.run(processes=4)
+"""
+
+import json
+import os
+import runpy
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import settings
+from tools import snapshot
+
+
+class Step(object):
+    """
+    Args:
+        name(str): Unique name of the step
+        script(str): Path of the script, with a function main() or without main
+        inputs(list): Files read by the step, besides the script and the model_input
+        outputs(list): Files written by the step, besides the model_output
+        model_input(str): Model file read by the step
+        model_output(str): Model file written by the step
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), model_input=None, model_output=None):
+        self.name = name
+        self.script = os.path.abspath(script)
+        self.inputs = [os.path.abspath(path) for path in inputs]
+        self.outputs = [os.path.abspath(path) for path in outputs]
+        self.model_input = os.path.abspath(model_input) if model_input else None
+        self.model_output = os.path.abspath(model_output) if model_output else None
+
+    def __repr__(self):
+        return '<Step {}>'.format(self.name)
+
+    @property
+    def all_inputs(self):
+        return [self.script] + self.inputs + ([self.model_input] if self.model_input else [])
+
+    @property
+    def all_outputs(self):
+        return self.outputs + ([self.model_output] if self.model_output else [])
+
+    def run(self):
+        """ Runs the script from its directory, and its function main if it has one. :return: Value returned by main"""
+        working_directory = os.getcwd()
+        os.chdir(os.path.dirname(self.script))
+        try:
+            namespace = runpy.run_path(self.script, run_name=os.path.splitext(os.path.basename(self.script))[0])
+            return namespace['main']() if 'main' in namespace else None
+        finally:
+            os.chdir(working_directory)
+
+
+class Pipeline(object):
+    """
+    Args:
+        name(str): Name shown in the report
+        steps(list): Step, in any order. Steps which are ready at the same time are started in this order.
+        state_path(str): json file with the hashes of the last runs, settings.CACHE_ROOT/pipeline.json by default
+    Attributes:
+        dependencies(dict): k: step name, v: list of the names of the steps which write its inputs
+        wall_times(dict): k: name of a step run by the last run, v: its wall time in seconds
+    """
+
+    def __init__(self, name, steps, state_path=None):
+        self.name = name
+        self.steps = list(steps)
+        if len(set(step.name for step in self.steps)) != len(self.steps):
+            raise ValueError('Step names of pipeline {} are not unique'.format(name))
+        self.state_path = state_path or os.path.join(settings.CACHE_ROOT, 'pipeline.json')
+        self.dependencies = self._find_dependencies()
+        self.wall_times = {}
+
+    def _find_dependencies(self):
+        writers = {} # k: output path, v: name of the step which writes it
+        for step in self.steps:
+            for path in step.all_outputs:
+                if path in writers:
+                    raise ValueError('{} is written by steps {} and {} of pipeline {}'.format(
+                        _relative(path), writers[path], step.name, self.name))
+                writers[path] = step.name
+        names = [step.name for step in self.steps]
+        dependencies = {step.name: sorted(set(writers[path] for path in step.all_inputs if path in writers),
+                                          key=names.index)
+                        for step in self.steps}
+
+        done = set()
+        while len(done) < len(names):
+            ready = [name for name in names if name not in done and all(n in done for n in dependencies[name])]
+            if not ready:
+                raise ValueError('Steps {} of pipeline {} depend on each other'.format(
+                    ', '.join(name for name in names if name not in done), self.name))
+            done.update(ready)
+        return dependencies
+
+    def run(self, force=False, processes=None):
+        """
+        :param force: Run all steps, even if they are up to date
+        :param processes: Number of steps run at the same time, os.cpu_count() by default. With 1, steps are run in
+            this process, one after another.
+        :return: list of the names of the steps which were run, in the order of the pipeline steps
+        """
+        processes = processes or os.cpu_count() or 1
+        state = self._load_state()
+        status = {} # k: step name, v: 'ran', 'up to date', 'skipped', 'failed' or 'not run'
+        errors = {} # k: name of a failed step, v: exception
+        running = {} # k: Future, v: (step, input hashes)
+        self.wall_times = {}
+        start = time.time()
+        executor = ProcessPoolExecutor(processes) if processes > 1 else None
+        try:
+            while True:
+                running_names = set(step.name for step, _ in running.values())
+                ready = [step for step in self.steps if step.name not in status and step.name not in running_names
+                         and all(name in status for name in self.dependencies[step.name])]
+                for step in ready:
+                    input_hashes = self._check(step, status, state, force)
+                    if input_hashes is not None:
+                        print('{}: running'.format(step.name))
+                        running[_start(executor, step)] = (step, input_hashes)
+                if ready:
+                    continue # Skipped and up to date steps can make other steps ready
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, input_hashes = running.pop(future)
+                    if future.exception() is not None:
+                        # The state of the step stays the one of its last successful run
+                        status[step.name] = 'failed'
+                        errors[step.name] = future.exception()
+                        print('{}: failed, {!r}'.format(step.name, future.exception()))
+                        continue
+                    status[step.name] = 'ran'
+                    self.wall_times[step.name] = future.result()
+                    state[step.name] = {'inputs': input_hashes, 'outputs': self._output_hashes(step)}
+                    self._save_state(state) # After each step, so that an interrupted run does not lose finished steps
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self._print_report(status, time.time() - start)
+        if errors:
+            raise next(errors[step.name] for step in self.steps if step.name in errors)
+        return [step.name for step in self.steps if status[step.name] == 'ran']
+
+    def _check(self, step, status, state, force):
+        """ Sets the status of a step which does not have to run. :return: input hashes of a step to run, else None"""
+        if any(status[name] in ('failed', 'not run') for name in self.dependencies[step.name]):
+            status[step.name] = 'not run'
+            print('{}: not run, a step it depends on failed'.format(step.name))
+            return None
+        missing = [_relative(path) for path in step.all_inputs if not os.path.isfile(path)]
+        if missing:
+            status[step.name] = 'skipped'
+            print('{}: skipped, missing {}'.format(step.name, ', '.join(missing)))
+            return None
+        input_hashes = {_relative(path): snapshot.file_hash(path) for path in step.all_inputs}
+        if not force and self._is_up_to_date(step, state.get(step.name), input_hashes):
+            status[step.name] = 'up to date'
+            print('{}: up to date'.format(step.name))
+            return None
+        return input_hashes
+
+    def _is_up_to_date(self, step, step_state, input_hashes):
+        if step_state is None or step_state['inputs'] != input_hashes:
+            return False
+        return step_state['outputs'] == self._output_hashes(step)
+
+    @staticmethod
+    def _output_hashes(step):
+        return {_relative(path): snapshot.file_hash(path) if os.path.isfile(path) else None
+                for path in step.all_outputs}
+
+    def _print_report(self, status, wall_time):
+        width = max(len(step.name) for step in self.steps)
+        print('\nPipeline {}: {:.1f} s'.format(self.name, wall_time))
+        for step in self.steps:
+            if step.name in self.wall_times:
+                print('    {:<{}}  {:.1f} s'.format(step.name, width, self.wall_times[step.name]))
+            else:
+                print('    {:<{}}  {}'.format(step.name, width, status[step.name]))
+
+    def _load_state(self):
+        if not os.path.isfile(self.state_path):
+            return {}
+        with open(self.state_path, 'r') as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        directory = os.path.dirname(os.path.abspath(self.state_path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.state_path, 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+
+
+def _start(executor, step):
+    """ :return: Future of the wall time of the step, run in the executor, or in this process without executor"""
+    if executor is not None:
+        return executor.submit(_run_step, step)
+    future = Future()
+    try:
+        future.set_result(_run_step(step))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _run_step(step):
+    start = time.time()
+    step.run()
+    return time.time() - start
+
+
+def _relative(path):
+    """ Paths in the state file are relative to the project root, so that it stays valid if the project is moved."""
+    return os.path.relpath(path, settings.PROJECT_ROOT)
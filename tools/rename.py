@@ -0,0 +1,97 @@
+"""
+In-memory renaming of identifiers (e.g. locus tags or subsystem names) in every text field of a model.
+
+All old identifiers are compiled into one regular expression shaped as a prefix trie, so each string is scanned once
+regardless of the number of identifiers. Identifiers are only replaced as whole words: 'Clo1313_0001' is not replaced
+inside 'Clo1313_00011'.
+
+Usage:
+    rewriter = Rewriter({'Clo1313_0001': 'CLO1313_RS00010', 'Pyruvate Metabolism': 'Pyruvate metabolism'})
+    rewriter.sub('Clo1313_0001 or Clo1313_0002')
+    rewrite_model(model, rewriter)
+"""
+
+import re
+
+
+class Rewriter(object):
+    """
+    Args:
+        mapping(dict): k: old identifier, v: new identifier
+    """
+
+    def __init__(self, mapping):
+        self.mapping = {key: value for key, value in mapping.items() if key}
+        if self.mapping:
+            self._pattern = re.compile(r'(?<!\w)' + _trie_regex(self.mapping) + r'(?!\w)')
+        else:
+            self._pattern = None
+
+    def sub(self, text):
+        """ Returns the text with every old identifier replaced."""
+        if self._pattern is None or not text:
+            return text
+        return self._pattern.sub(lambda match: self.mapping[match.group()], text)
+
+    def sub_value(self, value):
+        """ Same as sub for strings, lists (e.g. notes), and dictionaries (values only). Other values are returned as is.
+        """
+        if isinstance(value, str):
+            return self.sub(value)
+        if isinstance(value, list):
+            return [self.sub_value(item) for item in value]
+        if isinstance(value, dict):
+            return {key: self.sub_value(item) for key, item in value.items()}
+        return value
+
+
+def rewrite_model(model, rewriter):
+    """
+    Renames identifiers in the ids, names, notes, and annotations of genes, reactions and metabolites, as well as in
+    gene-reaction rules and subsystems. Renamed genes keep their attributes and reactions.
+    :param model: Cobra model, modified in place
+    :param rewriter: Rewriter
+    :return: Number of changed fields
+    """
+    changes = 0
+
+    def rewrite(obj, attribute):
+        nonlocal changes
+        value = getattr(obj, attribute)
+        new_value = rewriter.sub_value(value)
+        if new_value != value:
+            setattr(obj, attribute, new_value)
+            changes += 1
+
+    for objects in [model.genes, model.metabolites, model.reactions]:
+        for obj in objects:
+            for attribute in ['id', 'name', 'notes', 'annotation']:
+                rewrite(obj, attribute)
+
+    # Gene ids are not indexed when they change, genes must be found by their new ids in the rules
+    model.repair()
+    for reaction in model.reactions:
+        rewrite(reaction, 'gene_reaction_rule')
+        rewrite(reaction, 'subsystem')
+    return changes
+
+
+def _trie_regex(keys):
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_regex(trie)
+
+
+def _node_regex(node):
+    """ Longer keys are tried first, a shorter key is only used if the longer ones do not match."""
+    branches = [re.escape(char) + _node_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        return '(?:' + pattern + ')?'
+    return pattern
@@ -0,0 +1,135 @@
+"""
+Persistent cache for optimization results.
+
+Results are stored in a sqlite file keyed by a hash of the model content (stoichiometry, bounds, GPRs, and objective)
+plus a description of the simulation (e.g. data set record and constraint mode). Any change to these inputs leads to a
+different key, so stale results are never returned, they are simply not used again and eventually evicted. The least
+recently used entries are evicted when the cache exceeds max_entries. Access times of lookups are kept in memory and
+written with the next set_many, flush or close, so that lookups do not write to the file.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import settings
+
+
+DEFAULT_CACHE_PATH = os.path.join(settings.CACHE_ROOT, 'results.sqlite')
+
+
+class ResultCache(object):
+    """
+    Usage:
+        cache = ResultCache()
+        key = cache.make_key(model_hash(model), {'dataset_index': 0, 'constraint_mode': 'both'})
+        value = cache.get(key)
+        if value is None:
+            value = {'objective_value': model.slim_optimize()}
+            cache.set(key, value)
+        cache.close()
+
+    Values must be json serializable.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=100000):
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_entries = max_entries
+        self._accesses = {} # k: key, v: last access time not yet written
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                 '(key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)')
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(*parts):
+        """ Hash of any json serializable objects, e.g. a model hash and a dictionary describing the simulation."""
+        return hashlib.sha256(_dumps(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """ Returns the stored value or None."""
+        row = self._connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self._accesses[key] = time.time()
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """ Stores several values in one transaction. items: dictionary, k: key, v: value."""
+        now = time.time()
+        self._write_accesses()
+        self._connection.executemany('INSERT OR REPLACE INTO results (key, value, last_access) VALUES (?, ?, ?)',
+                                     [(key, _dumps(value), now) for key, value in items.items()])
+        self._evict()
+        self._connection.commit()
+
+    def flush(self):
+        """ Writes the access times of the lookups since the last write."""
+        if self._accesses:
+            self._write_accesses()
+            self._connection.commit()
+
+    def clear(self):
+        self._accesses = {}
+        self._connection.execute('DELETE FROM results')
+        self._connection.commit()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def _write_accesses(self):
+        self._connection.executemany('UPDATE results SET last_access = ? WHERE key = ?',
+                                     [(last_access, key) for key, last_access in self._accesses.items()])
+        self._accesses = {}
+
+    def _evict(self):
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._connection.execute('DELETE FROM results WHERE key IN '
+                                     '(SELECT key FROM results ORDER BY last_access ASC LIMIT ?)', (excess,))
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    # Connections cannot be pickled (e.g. when the cache is given to a process pool), reconnect instead.
+    def __getstate__(self):
+        return {'path': self.path, 'max_entries': self.max_entries}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def model_hash(model):
+    """ Hash of the model content which determines optimization results: reaction stoichiometry, bounds, gene-reaction
+    rules, and objective. Names, notes, and annotations are ignored.
+    """
+    h = hashlib.sha256()
+    for reaction in model.reactions:
+        h.update(reaction.id.encode('utf-8'))
+        h.update(repr(reaction.bounds).encode('utf-8'))
+        h.update(repr(sorted((met.id, repr(coeff)) for met, coeff in reaction.metabolites.items())).encode('utf-8'))
+        h.update(reaction.gene_reaction_rule.encode('utf-8'))
+        h.update(repr(reaction.objective_coefficient).encode('utf-8'))
+    h.update(str(model.objective.direction).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _dumps(obj):
+    return json.dumps(obj, sort_keys=True, default=_default, allow_nan=True)
+
+
+def _default(obj):
+    # numpy scalars and other number-like objects (e.g. from pandas records)
+    if hasattr(obj, 'item'):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError('Object of type {} is not serializable'.format(type(obj).__name__))
@@ -0,0 +1,379 @@
+"""
+Binary model snapshots for fast loading.
+
+A snapshot is a numpy .npz file next to the model file (iSG_2.json -> iSG_2.json.snapshot.npz) with:
+- ids, names and the other string attributes as utf-8 string tables, each id stored once: reactions refer to their
+  metabolites and genes by position
+- the stoichiometry as sparse (metabolite, reaction, coefficient) arrays, in the metabolite order of each reaction
+- bounds, charges and objective coefficients as arrays
+- notes, annotations and any other attribute as one json blob per object type, only decoded when needed
+- the sha256 of the model file it was made from; a snapshot of a file which changed since is not used
+
+Snapshots hold the content of the json representation of the model (cobra.io.model_to_dict), so the model loaded from
+a snapshot is the same as the one loaded with cobra.io.load_json_model, integer and float values included. Snapshots
+are written automatically when a model is loaded with load_model and when it is saved with save_json_model.
+
+Building the cobra model from a snapshot takes about two thirds of the time of cobra.io.load_json_model: the json
+parsing and the metabolite copies of Reaction.add_metabolites are skipped, the gene-reaction rules are parsed and the
+solver is populated as usual. load_arrays and tools.model_view do not build the cobra model.
+
+Usage:
+    model = load_model(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json'))
+    save_json_model(model, os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_3.json'))
+    snapshot = load_arrays(os.path.join(INTERMEDIATE_MODEL_ROOT, 'iSG_2.json')) # Arrays only, no cobra model
+    snapshot.stoichiometry # scipy.sparse matrix, metabolites x reactions
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+from scipy import sparse
+import sympy
+import cobra as cb
+from cobra.core.gene import parse_gpr
+from cobra.io.dict import model_from_dict, model_to_dict
+try:
+    from cobra.io.dict import _reaction_from_dict
+except ImportError: # Public in older cobra versions
+    from cobra.io.dict import reaction_from_dict as _reaction_from_dict
+from cobra.util.solver import set_objective
+
+
+FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot.npz'
+
+# Attributes stored in arrays, all other attributes of the json representation go to the json blobs
+_STRING_FIELDS = {'metabolites': ['id', 'name', 'compartment', 'formula'],
+                  'reactions': ['id', 'name', 'subsystem', 'gene_reaction_rule'],
+                  'genes': ['id', 'name']}
+_NUMBER_FIELDS = {'metabolites': ['charge'],
+                  'reactions': ['lower_bound', 'upper_bound', 'objective_coefficient'],
+                  'genes': []}
+
+
+class Snapshot(object):
+    """
+    Arrays of a model snapshot, see load_snapshot.
+
+    Attributes:
+        source_hash(str): sha256 of the model file the snapshot was made from
+        metabolite_ids, reaction_ids, gene_ids(list): ids in model order
+        lower_bounds, upper_bounds, objective_coefficients(np.array): by reaction
+        charges(np.array): by metabolite, nan for metabolites without charge
+        stoichiometry_rows, stoichiometry_columns, stoichiometry_values(np.array): metabolite position, reaction
+            position and coefficient of each stoichiometry entry, grouped by reaction
+        gene_rows, gene_columns(np.array): gene and reaction positions of the genes of each reaction
+    """
+
+    def __init__(self, arrays):
+        self._arrays = arrays
+        self._extras = {}
+        self.source_hash = str(arrays['source_hash'])
+        self.metabolite_ids = self.strings('metabolites', 'id')
+        self.reaction_ids = self.strings('reactions', 'id')
+        self.gene_ids = self.strings('genes', 'id')
+        self.lower_bounds = arrays['reactions.lower_bound']
+        self.upper_bounds = arrays['reactions.upper_bound']
+        self.objective_coefficients = np.where(arrays['reactions.objective_coefficient.present'],
+                                               arrays['reactions.objective_coefficient'], 0.)
+        self.charges = np.where(arrays['metabolites.charge.present'], arrays['metabolites.charge'], np.nan)
+        self.stoichiometry_rows = arrays['stoichiometry.rows']
+        self.stoichiometry_columns = arrays['stoichiometry.columns']
+        self.stoichiometry_values = arrays['stoichiometry.values']
+        self.gene_rows = arrays['genes.rows']
+        self.gene_columns = arrays['genes.columns']
+
+    @property
+    def stoichiometry(self):
+        """ scipy.sparse.csc_matrix, metabolites x reactions."""
+        return sparse.csc_matrix((self.stoichiometry_values, (self.stoichiometry_rows, self.stoichiometry_columns)),
+                                 shape=(len(self.metabolite_ids), len(self.reaction_ids)))
+
+    def strings(self, kind, field):
+        """
+        :param kind: 'metabolites', 'reactions' or 'genes'
+        :param field: see _STRING_FIELDS
+        :return: list of str, one per object, None where the attribute is not a string (see extras)
+        """
+        values = _unpack_strings(self._arrays['{}.{}'.format(kind, field)], int(self._arrays[kind + '.count']))
+        present = self._arrays['{}.{}.present'.format(kind, field)]
+        if not present.all():
+            for i in np.flatnonzero(~present):
+                values[i] = None
+        return values
+
+    def extras(self, kind):
+        """
+        :param kind: 'metabolites', 'reactions', 'genes' or 'model'
+        :return: Attributes not stored in arrays (notes, annotation...), a list with one dict per object, or a dict
+            for the model. Decoded on first access.
+        """
+        if kind not in self._extras:
+            self._extras[kind] = json.loads(self._arrays[kind + '.extras'].tobytes().decode('utf-8'))
+        return self._extras[kind]
+
+    def to_model(self):
+        """ Builds the cobra model, same as cobra.io.model_from_dict of the json representation."""
+        model = cb.Model()
+        metabolites = []
+        fields = self._fields('metabolites')
+        for met_id, name, compartment, formula, charge, extras in zip(*fields):
+            met = cb.Metabolite(met_id)
+            _set_fields(met, [('name', name), ('compartment', compartment), ('formula', formula), ('charge', charge)])
+            for key, value in extras.items():
+                setattr(met, key, value)
+            metabolites.append(met)
+        model.add_metabolites(metabolites)
+
+        genes = []
+        for gene_id, name, extras in zip(*self._fields('genes')):
+            gene = cb.Gene(gene_id)
+            _set_fields(gene, [('name', name)])
+            for key, value in extras.items():
+                setattr(gene, key, value)
+            genes.append(gene)
+        model.genes.extend(genes)
+
+        # The metabolites are set directly: Reaction.add_metabolites copies metabolites of other models, which is
+        # most of the time of model_from_dict. Bounds are cast as model_from_dict does in the installed cobra version.
+        coefficients = self._numbers('stoichiometry.values', np.ones(len(self.stoichiometry_values), dtype=bool))
+        starts = np.searchsorted(self.stoichiometry_columns, np.arange(len(self.reaction_ids) + 1))
+        rows = self.stoichiometry_rows.tolist()
+        reactions = []
+        objective = {}
+        fields = self._fields('reactions')
+        for i, (reaction_id, name, subsystem, rule, lower, upper, coefficient, extras) in enumerate(zip(*fields)):
+            reaction = cb.Reaction(reaction_id)
+            _set_fields(reaction, [('name', name), ('subsystem', subsystem), ('lower_bound', _bound(lower)),
+                                   ('upper_bound', _bound(upper)), ('gene_reaction_rule', rule)])
+            for key, value in extras.items():
+                setattr(reaction, key, value)
+            reaction._metabolites = {metabolites[rows[j]]: coefficients[j] for j in range(starts[i], starts[i + 1])}
+            if coefficient is not _ABSENT and coefficient != 0:
+                objective[reaction] = coefficient
+            reactions.append(reaction)
+        model.add_reactions(reactions)
+        set_objective(model, objective)
+        for key, value in self.extras('model').items():
+            if key in {'id', 'name', 'notes', 'compartments', 'annotation'}:
+                setattr(model, key, value)
+        return model
+
+    def _fields(self, kind):
+        """ :return: Columns of the string fields, number fields and extras of the objects, see _STRING_FIELDS."""
+        columns = []
+        for field in _STRING_FIELDS[kind]:
+            present = self._arrays['{}.{}.present'.format(kind, field)]
+            values = self.strings(kind, field)
+            columns.append([value if is_present else _ABSENT for value, is_present in zip(values, present)])
+        for field in _NUMBER_FIELDS[kind]:
+            name = '{}.{}'.format(kind, field)
+            columns.append(self._numbers(name, self._arrays[name + '.present']))
+        columns.append(self.extras(kind))
+        return columns
+
+    def _numbers(self, name, present):
+        """ :return: list of int or float as in the json representation, _ABSENT where not present."""
+        values = self._arrays[name].tolist()
+        for i in np.flatnonzero(self._arrays[name + '.int']):
+            values[i] = int(values[i])
+        for i in np.flatnonzero(~present):
+            values[i] = _ABSENT
+        return values
+
+
+# Placeholder of attributes not given in the json representation, the object keeps its default value
+_ABSENT = object()
+
+
+def _casts_bounds():
+    """ :return: True if model_from_dict casts the reaction bounds to float (newer cobra versions), False if they keep
+        the type they have in the json representation."""
+    reaction = _reaction_from_dict({'id': 'reaction', 'lower_bound': 0, 'upper_bound': 0}, cb.Model())
+    return isinstance(reaction.lower_bound, float)
+
+
+_CAST_BOUNDS = _casts_bounds()
+
+
+def _bound(value):
+    return float(value) if _CAST_BOUNDS and value is not _ABSENT else value
+
+
+def _set_fields(cobra_object, fields):
+    for key, value in fields:
+        if value is not _ABSENT:
+            setattr(cobra_object, key, value)
+
+
+def snapshot_path(path):
+    """ Path of the snapshot of a model file."""
+    return path + SNAPSHOT_SUFFIX
+
+
+def file_hash(path):
+    """ sha256 of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_snapshot(obj, path, source_hash=''):
+    """
+    :param obj: json representation of a model (see cobra.io.model_to_dict), as loaded from a json file
+    :param path: .npz file
+    :param source_hash: sha256 of the model file, see file_hash
+    """
+    if 'reactions' not in obj:
+        raise ValueError('Object has no reactions attribute. Cannot make a snapshot.')
+    arrays = {'format_version': np.array(FORMAT_VERSION), 'source_hash': np.array(source_hash)}
+    for kind in ['metabolites', 'reactions', 'genes']:
+        items = obj.get(kind, [])
+        arrays[kind + '.count'] = np.array(len(items))
+        for field in _STRING_FIELDS[kind]:
+            present = np.array([_is_string(item.get(field)) for item in items], dtype=bool)
+            arrays['{}.{}'.format(kind, field)] = _pack_strings([item[field] if is_present else ''
+                                                                for item, is_present in zip(items, present)])
+            arrays['{}.{}.present'.format(kind, field)] = present
+        for field in _NUMBER_FIELDS[kind]:
+            values = [item.get(field) for item in items]
+            arrays['{}.{}.present'.format(kind, field)] = np.array([_is_number(value) for value in values], dtype=bool)
+            arrays.update(_pack_numbers('{}.{}'.format(kind, field),
+                                        [value if _is_number(value) else 0 for value in values]))
+        # Attributes of unexpected types (e.g. a null charge) are kept as they are, with the other attributes
+        extras = [{key: value for key, value in item.items()
+                   if key != 'metabolites' and not (key in _STRING_FIELDS[kind] and _is_string(value) or
+                                                    key in _NUMBER_FIELDS[kind] and _is_number(value))}
+                  for item in items]
+        arrays[kind + '.extras'] = _pack_json(extras)
+    arrays['model.extras'] = _pack_json({key: value for key, value in obj.items()
+                                         if key not in {'metabolites', 'reactions', 'genes'}})
+
+    met_position = {met['id']: i for i, met in enumerate(obj['metabolites'])}
+    gene_position = {gene['id']: i for i, gene in enumerate(obj.get('genes', []))}
+    rows, columns, values, gene_rows, gene_columns = [], [], [], [], []
+    for j, reaction in enumerate(obj['reactions']):
+        for met_id, coefficient in reaction.get('metabolites', {}).items():
+            rows.append(met_position[str(met_id)])
+            columns.append(j)
+            values.append(coefficient)
+        rule = reaction.get('gene_reaction_rule')
+        if rule and isinstance(rule, str):
+            for gene_id in sorted(parse_gpr(rule)[1]):
+                if gene_id in gene_position:
+                    gene_rows.append(gene_position[gene_id])
+                    gene_columns.append(j)
+    arrays['stoichiometry.rows'] = np.array(rows, dtype=np.int32)
+    arrays['stoichiometry.columns'] = np.array(columns, dtype=np.int32)
+    arrays.update(_pack_numbers('stoichiometry.values', values))
+    arrays['genes.rows'] = np.array(gene_rows, dtype=np.int32)
+    arrays['genes.columns'] = np.array(gene_columns, dtype=np.int32)
+
+    # Written to a temporary file of this process first, so that an interrupted write never leaves a broken snapshot,
+    # and processes which make the snapshot of the same file at the same time do not write into each other's file
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temporary_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path):
+    """
+    :param path: .npz file written by write_snapshot
+    :return: Snapshot, None if the snapshot was written in another format version
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if int(arrays['format_version']) != FORMAT_VERSION:
+        return None
+    return Snapshot(arrays)
+
+
+def load_arrays(path):
+    """
+    Snapshot of a json or sbml model file, the snapshot is made first if there is no up to date one. No cobra model is
+    built for json files.
+    :param path: Model file, .json or sbml (.xml, .sbml)
+    :return: Snapshot
+    """
+    snapshot, _ = _load(path)
+    if snapshot is None:
+        snapshot = load_snapshot(snapshot_path(path))
+    return snapshot
+
+
+def load_model(path):
+    """
+    Loads a json or sbml model from its snapshot if it is up to date. Otherwise the model file is parsed and its
+    snapshot written for the next time. Sbml models are loaded through their json representation, so that they are the
+    same either way.
+    :param path: Model file, .json or sbml (.xml, .sbml)
+    :return: cobra.Model
+    """
+    snapshot, obj = _load(path)
+    if snapshot is not None:
+        return snapshot.to_model()
+    return model_from_dict(obj)
+
+
+def _load(path):
+    """ :return: (up to date Snapshot, None) or (None, json representation of the parsed model file)."""
+    source_hash = file_hash(path)
+    if os.path.isfile(snapshot_path(path)):
+        snapshot = load_snapshot(snapshot_path(path))
+        if snapshot is not None and snapshot.source_hash == source_hash:
+            return snapshot, None
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            obj = json.load(f)
+    else:
+        obj = json.loads(json.dumps(model_to_dict(cb.io.read_sbml_model(path))))
+        _clear_expression_cache()
+    write_snapshot(obj, snapshot_path(path), source_hash)
+    return None, obj
+
+
+def save_json_model(model, path, **kwargs):
+    """ cobra.io.save_json_model, then writes the snapshot of the saved model."""
+    cb.io.save_json_model(model, path, **kwargs)
+    with open(path, 'r') as f:
+        obj = json.load(f)
+    write_snapshot(obj, snapshot_path(path), file_hash(path))
+
+
+def _clear_expression_cache():
+    """ Sympy caches the solver expressions, with the variables of the model they were made for. With cobra 0.14, a
+    model built in the same process as the parsed sbml model, with the same reaction ids, can get the variables of the
+    parsed model, which optlang then fails to add again (e.g. in flux_variability_analysis)."""
+    sympy.core.cache.clear_cache()
+
+
+def _is_string(value):
+    return isinstance(value, str) and '\0' not in value
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _pack_numbers(name, values):
+    """ Float array and the positions of the integers, so that the values are loaded with their json type."""
+    return {name: np.array(values, dtype=float),
+            name + '.int': np.array([isinstance(value, int) for value in values], dtype=bool)}
+
+
+def _pack_strings(values):
+    return np.frombuffer('\0'.join(values).encode('utf-8'), dtype=np.uint8)
+
+
+def _unpack_strings(array, count):
+    if count == 0:
+        return []
+    return array.tobytes().decode('utf-8').split('\0')
+
+
+def _pack_json(value):
+    return np.frombuffer(json.dumps(value).encode('utf-8'), dtype=np.uint8)
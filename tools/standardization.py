@@ -42,19 +42,24 @@ def calc_mw(bdict):
     return mw/1000
 
 
-def normalize_biomass(reaction):
+def normalize_biomass(reaction, checker=None):
     """
     Divides the coefficient of each component by the biomass MW.
     This method operates in the mutable reaction object, so it does not return anything.
     :param reaction: Biomass Reaction object
+    :param checker: tools.balance.BalanceChecker of the model, updated with the new coefficients. If not given, the
+                    mass balance is computed with cobrapy.
     """
-    mw = calc_mw(reaction.check_mass_balance())
-    mets = {met: coeff for met, coeff in reaction.metabolites.items()}
-    reaction.subtract_metabolites(mets)
-    for k,v in mets.items():
-        reaction.add_metabolites({k: v/mw})
-
-    assert abs(1-calc_mw(reaction.check_mass_balance())) < 0.00001
+    if checker is None:
+        check_mass_balance = cb.Reaction.check_mass_balance
+    else:
+        check_mass_balance = checker.imbalance
+    mw = calc_mw(check_mass_balance(reaction))
+    reaction.add_metabolites({met: coeff/mw for met, coeff in reaction.metabolites.items()}, combine=False)
+    if checker is not None:
+        checker.update_reaction(reaction)
+
+    assert abs(1-calc_mw(check_mass_balance(reaction))) < 0.00001
 
 
 def multiply_rxn(value, reaction):
@@ -0,0 +1,204 @@
+"""
+Enumeration of thermodynamically infeasible cycles (TICs).
+
+A TIC is a flux distribution through internal reactions only, i.e. a steady state of the network with all boundary
+reactions (exchanges, demands, sinks) closed. The minimal cycles are the elementary flux modes of this closed network:
+steady states respecting reaction directions whose set of active reactions contains no other steady state.
+
+Reactions which cannot be part of any cycle are removed first (dead-end metabolites, metabolites which can only be
+produced or only be consumed, and reactions outside the null space of the remaining stoichiometry). The cycles of the
+remaining network are found with the double description method: reversible reactions are split in a forward and a
+backward reaction, the kernel of the stoichiometric matrix is computed once, and the non-negativity of every reaction
+is imposed one at a time. Two modes are only combined if no other mode is active on a subset of their reactions, the
+supports are stored as integer bitmasks.
+
+Usage:
+    cycles = find_cycles(model)
+    membership = cycle_membership(cycles)
+    membership['NDPK1'] # indices of the cycles including NDPK1
+"""
+
+import numpy as np
+from scipy.linalg import null_space
+
+
+def find_cycles(model, zero_cutoff=1e-9, max_modes=100000):
+    """
+    :param model: Cobra model, bounds of (0, 0) remove a reaction and bounds of one sign fix its direction
+    :param zero_cutoff: Fluxes and stoichiometric coefficients below this value are considered zero
+    :param max_modes: Largest number of intermediate modes, the enumeration stops with a ValueError above it
+    :return: list of dicts, k: reaction id, v: flux in the cycle. The smallest absolute flux of each cycle is 1, cycles
+        are sorted by the model position (and direction) of their reactions.
+    """
+    reactions = _cycle_candidates(model)
+    if not reactions:
+        return []
+    metabolites = sorted({met for reaction in reactions for met in reaction.metabolites}, key=lambda m: m.id)
+    met_position = {met: i for i, met in enumerate(metabolites)}
+
+    # Columns of the split network: (reaction, direction)
+    columns = []
+    for reaction in reactions:
+        if reaction.upper_bound > 0:
+            columns.append((reaction, 1))
+        if reaction.lower_bound < 0:
+            columns.append((reaction, -1))
+    stoichiometry = np.zeros((len(metabolites), len(columns)))
+    for j, (reaction, direction) in enumerate(columns):
+        for met, coefficient in reaction.metabolites.items():
+            stoichiometry[met_position[met], j] = direction * coefficient
+
+    modes = _elementary_modes(stoichiometry, zero_cutoff, max_modes)
+
+    position = {reaction.id: i for i, reaction in enumerate(model.reactions)}
+    cycles = []
+    for mode in modes:
+        active = np.flatnonzero(mode)
+        if len({columns[j][0].id for j in active}) < len(active): # both directions of a reaction
+            continue
+        mode = mode / mode[active].min()
+        cycle = {columns[j][0].id: columns[j][1] * mode[j] for j in active}
+        cycles.append(dict(sorted(cycle.items(), key=lambda item: position[item[0]])))
+    cycles.sort(key=lambda cycle: [(position[reaction_id], flux < 0) for reaction_id, flux in cycle.items()])
+    return cycles
+
+
+def cycle_membership(cycles):
+    """
+    :param cycles: see find_cycles
+    :return: dict, k: reaction id, v: list of positions in cycles of the cycles including the reaction. Reactions
+        which are not in any cycle are not included.
+    """
+    membership = {}
+    for i, cycle in enumerate(cycles):
+        for reaction_id in cycle:
+            membership.setdefault(reaction_id, []).append(i)
+    return membership
+
+
+def _cycle_candidates(model):
+    """ Internal reactions which can be part of a cycle, in model order."""
+    boundary = set(model.boundary)
+    candidates = {reaction for reaction in model.reactions if reaction not in boundary and
+                  (reaction.lower_bound < 0 or reaction.upper_bound > 0)}
+
+    changed = True
+    while changed:
+        changed = False
+        for met in {met for reaction in candidates for met in reaction.metabolites}:
+            produced = consumed = False
+            met_reactions = [reaction for reaction in met.reactions if reaction in candidates]
+            for reaction in met_reactions:
+                coefficient = reaction.metabolites[met]
+                if reaction.upper_bound > 0:
+                    produced |= coefficient > 0
+                    consumed |= coefficient < 0
+                if reaction.lower_bound < 0:
+                    produced |= coefficient < 0
+                    consumed |= coefficient > 0
+            if len(met_reactions) < 2 or not (produced and consumed):
+                candidates.difference_update(met_reactions)
+                changed = True
+
+        if candidates and not changed:
+            ordered = [reaction for reaction in model.reactions if reaction in candidates]
+            metabolites = sorted({met for reaction in ordered for met in reaction.metabolites}, key=lambda m: m.id)
+            met_position = {met: i for i, met in enumerate(metabolites)}
+            stoichiometry = np.zeros((len(metabolites), len(ordered)))
+            for j, reaction in enumerate(ordered):
+                for met, coefficient in reaction.metabolites.items():
+                    stoichiometry[met_position[met], j] = coefficient
+            kernel = null_space(stoichiometry)
+            in_kernel = np.abs(kernel).max(axis=1) > 1e-9 if kernel.size else np.zeros(len(ordered), dtype=bool)
+            if not in_kernel.all():
+                candidates = {reaction for reaction, keep in zip(ordered, in_kernel) if keep}
+                changed = True
+
+    return [reaction for reaction in model.reactions if reaction in candidates]
+
+
+def _elementary_modes(stoichiometry, zero_cutoff, max_modes):
+    """ Extreme rays of {v: stoichiometry v = 0, v >= 0}, as rows of an array normalized to a maximum of 1."""
+    n = stoichiometry.shape[1]
+    kernel, free = _kernel(stoichiometry, zero_cutoff)
+    if not free:
+        return np.zeros((0, n))
+
+    # The free columns form an identity block of the kernel, its columns already satisfy v >= 0 there.
+    modes = kernel.T
+    supports = [_support(mode, zero_cutoff) for mode in modes]
+    processed = 0
+    for j in free:
+        processed |= 1 << j
+    remaining = [j for j in range(n) if j not in set(free)]
+
+    while remaining:
+        # Constraint producing the fewest combinations first
+        def combinations(j):
+            return int((modes[:, j] > zero_cutoff).sum()) * int((modes[:, j] < -zero_cutoff).sum())
+        j = min(remaining, key=combinations)
+        remaining.remove(j)
+        processed |= 1 << j
+
+        positive = [i for i in range(len(modes)) if modes[i, j] > zero_cutoff]
+        negative = [i for i in range(len(modes)) if modes[i, j] < -zero_cutoff]
+        keep = [i for i in range(len(modes)) if abs(modes[i, j]) <= zero_cutoff]
+        modes[keep, j] = 0
+        masked = [support & processed for support in supports]
+
+        new_modes = [modes[i] for i in positive + keep]
+        new_supports = [supports[i] for i in positive + keep]
+        for p in positive:
+            for q in negative:
+                union = masked[p] | masked[q]
+                if any(i != p and i != q and masked[i] | union == union for i in range(len(modes))):
+                    continue
+                mode = modes[p] * -modes[q, j] + modes[q] * modes[p, j]
+                mode /= np.abs(mode).max()
+                mode[np.abs(mode) <= zero_cutoff] = 0
+                new_modes.append(mode)
+                new_supports.append(_support(mode, zero_cutoff))
+                if len(new_modes) > max_modes:
+                    raise ValueError('Number of elementary modes exceeds {}'.format(max_modes))
+        modes = np.array(new_modes).reshape(-1, n)
+        supports = new_supports
+
+    return modes
+
+
+def _kernel(matrix, zero_cutoff):
+    """
+    Kernel basis from the reduced row echelon form, with partial pivoting.
+    :return: (n x len(free) array, free column positions). Rows of the free columns form an identity matrix.
+    """
+    matrix = matrix.astype(float).copy()
+    m, n = matrix.shape
+    pivots = []
+    row = 0
+    for column in range(n):
+        if row >= m:
+            break
+        pivot = row + int(np.argmax(np.abs(matrix[row:, column])))
+        if abs(matrix[pivot, column]) <= zero_cutoff:
+            continue
+        matrix[[row, pivot]] = matrix[[pivot, row]]
+        matrix[row] /= matrix[row, column]
+        others = np.abs(matrix[:, column]) > 0
+        others[row] = False
+        matrix[others] -= np.outer(matrix[others, column], matrix[row])
+        pivots.append(column)
+        row += 1
+    free = [column for column in range(n) if column not in set(pivots)]
+    kernel = np.zeros((n, len(free)))
+    for k, column in enumerate(free):
+        kernel[column, k] = 1
+        for r, pivot in enumerate(pivots):
+            kernel[pivot, k] = -matrix[r, column]
+    return kernel, free
+
+
+def _support(mode, zero_cutoff):
+    support = 0
+    for j in np.flatnonzero(np.abs(mode) > zero_cutoff):
+        support |= 1 << int(j)
+    return support
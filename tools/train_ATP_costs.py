@@ -3,7 +3,8 @@ Calculates growth and non-growth associated maintenance to fit a diverse data se
 
 """
 
-from tools import conf_model
+from multiprocessing import Pool, cpu_count
+from tools import conf_model, conditions, result_cache
 import pandas as pd
 import settings
 import numpy as np
@@ -12,39 +13,212 @@ from scipy import stats
 import matplotlib.pyplot as plt
 plt.style.use('seaborn')
 
-def train(model, exclude_data_index=[], constraint_mode='both', apply_knockouts=True, dataset_path=settings.EXTRACELLULAR_FLUX_DATA):
+def train(model, exclude_data_index=[], constraint_mode='both', apply_knockouts=True, dataset_path=settings.EXTRACELLULAR_FLUX_DATA, processes=None):
+    """ Maximizes ATP for each data set and fits GAM/NGAM. See solve_atp and fit."""
+    data = conditions.get_flux_data(dataset_path)
+    indices = [index for index in data if index not in exclude_data_index]
+    atp_table = solve_atp(model, indices, [constraint_mode], apply_knockouts, dataset_path, processes)
+    return fit(atp_table, constraint_mode)
 
-    data = pd.read_csv(dataset_path)
-    data.set_index('index', inplace=True)
 
-    gam_list = []
-    for index, row in data.iterrows():
-        if not index in exclude_data_index:
-            with model as tmodel:
-                conf_model.set_experimental_data(tmodel, index, constraint_mode=constraint_mode, apply_knockouts=apply_knockouts)
+def solve_atp(model, dataset_indices=None, constraint_modes=('both',), apply_knockouts=True,
+              dataset_path=settings.EXTRACELLULAR_FLUX_DATA, processes=None, cache=None):
+    """
+    Computes the maximum ATP hydrolysis flux (ATPM) of the model constrained to each data set, for each constraint mode.
+    GAM and NGAM are set to zero before maximization. Data sets are independent, so they are distributed over a
+    process pool where each worker holds its own copy of the model.
+    :param model: cobra model
+    :param dataset_indices: Data set indices to compute, by default all data sets in dataset_path.
+    :param constraint_modes: Any of 'min', 'mean', 'max', 'both' (see conf_model.set_experimental_flux_reaction_bounds)
+    :param apply_knockouts: Delete the genes indicated in the data set.
+    :param dataset_path: Path to the extracellular flux data set.
+    :param processes: Number of worker processes, by default the number of CPUs. Use 1 to solve in this process.
+    :param cache: Optional tools.result_cache.ResultCache. Only data sets whose inputs (model content, data set record,
+        medium, constraint mode, knock-outs) are not in the cache are solved.
+    :return: DataFrame with one row per data set and constraint mode, columns: training_dataset_index,
+        constraint_mode, growth_rate, ATP, medium, reactor, status. ATP is NaN if the model is infeasible.
+    """
+    data = conditions.get_flux_data(dataset_path)
+    if dataset_indices is None:
+        dataset_indices = list(data)
+    jobs = [(index, constraint_mode) for constraint_mode in constraint_modes for index in dataset_indices]
 
-                conf_model.set_all_biomass_gam(tmodel, 0)
-                conf_model.set_ngam(tmodel, 0)
-                tmodel.objective = 'ATPM'
-                r = tmodel.optimize()
-                if r.status is 'infeasible':
-                    # model is infeasible
-                    print('Model infeasible for dataset: {}'.format(index))
-                else:
+    results = {}
+    if cache is not None:
+        base_hash = result_cache.model_hash(model)
+        keys = {job: cache.make_key('max_atp', base_hash, _condition_record(data[job[0]], job[1], apply_knockouts))
+                for job in jobs}
+        for job in jobs:
+            value = cache.get(keys[job])
+            if value is not None:
+                results[job] = tuple(value)
+    pending = [job for job in jobs if job not in results]
 
-                    gam_list.append(
-                        {'growth_rate': row['GR'], 'ATP': r.objective_value, 'training_dataset_index': str(int(index)), 'medium': row['Medium']})
+    if processes is None:
+        processes = min(cpu_count(), len(pending))
+    if processes <= 1 or len(pending) <= 1:
+        _init_worker(model, apply_knockouts, dataset_path)
+        solved = [_max_atp(job) for job in pending]
+    else:
+        with Pool(processes, initializer=_init_worker, initargs=(model, apply_knockouts, dataset_path)) as pool:
+            solved = pool.map(_max_atp, pending)
+    results.update(zip(pending, solved))
 
-    gamdf = pd.DataFrame(gam_list)
+    if cache is not None and pending:
+        cache.set_many({keys[job]: results[job] for job in pending})
+
+    atp_list = []
+    for index, constraint_mode in jobs:
+        status, atp = results[(index, constraint_mode)]
+        if status == 'infeasible':
+            print('Model infeasible for dataset: {} (constraint mode: {})'.format(index, constraint_mode))
+        row = data[index]
+        atp_list.append({'training_dataset_index': int(index), 'constraint_mode': constraint_mode,
+                         'growth_rate': row['GR'], 'ATP': atp, 'medium': row['Medium'], 'reactor': row['Reactor'],
+                         'status': status})
+
+    return pd.DataFrame(atp_list, columns=['training_dataset_index', 'constraint_mode', 'growth_rate', 'ATP',
+                                           'medium', 'reactor', 'status'])
+
+
+def fit(atp_table, constraint_mode='both', indices=None, exclude_data_index=[]):
+    """
+    Fits GAM (slope) and NGAM (intercept) to maximum ATP vs growth rate. No optimization is done, so any subset of data
+    sets can be fitted from the same table.
+    :param atp_table: Output of solve_atp
+    :param constraint_mode: Constraint mode to fit
+    :param indices: Data set indices to include, by default all data sets in the table.
+    :param exclude_data_index: Data set indices to exclude.
+    :return: dictionary with keys: GAM, NGAM, rsquared, gamdf. gamdf has columns growth_rate, ATP,
+        training_dataset_index (as string), medium.
+    """
+    selected = atp_table[(atp_table['constraint_mode'] == constraint_mode) & (atp_table['status'] != 'infeasible')]
+    if indices is not None:
+        selected = selected[selected['training_dataset_index'].isin(indices)]
+    selected = selected[~selected['training_dataset_index'].isin(exclude_data_index)]
+
+    gamdf = pd.DataFrame({'growth_rate': selected['growth_rate'].values, 'ATP': selected['ATP'].values,
+                          'training_dataset_index': selected['training_dataset_index'].astype(str).values,
+                          'medium': selected['medium'].values})
 
     # Fit
-    x = gamdf['growth_rate'].as_matrix()
-    y = gamdf['ATP'].as_matrix()
+    x = gamdf['growth_rate'].values
+    y = gamdf['ATP'].values
     sol = stats.linregress(x, y)
 
     return {'GAM':sol[0], 'NGAM': sol[1], 'rsquared': sol[2]**2, 'gamdf': gamdf}
 
 
+def resample_fit(atp_table, constraint_mode='both', indices=None, exclude_data_index=[], n_bootstrap=10000, ci=95,
+                 outlier_threshold=2.5, seed=None):
+    """
+    Bootstrap and leave-one-out (LOO) distributions of GAM and NGAM, and outlier scores for each data set. The ATP maxima
+    in atp_table are reused, so only the linear regression is repeated (vectorized over all resamples).
+    :param atp_table: Output of solve_atp
+    :param constraint_mode, indices, exclude_data_index: Select data sets as in fit
+    :param n_bootstrap: Number of bootstrap resamples
+    :param ci: Confidence interval width in percent
+    :param outlier_threshold: Data sets with an absolute externally studentized residual above this value are flagged
+    :param seed: Seed for the random number generator
+    :return: dictionary with keys:
+        GAM, NGAM: Point estimates (same as fit)
+        GAM_ci, NGAM_ci: Bootstrap percentile interval (low, high)
+        bootstrap: DataFrame with columns GAM, NGAM (one row per resample)
+        loo: DataFrame indexed by the left out data set, columns GAM, NGAM
+        outliers: DataFrame indexed by data set with columns growth_rate, ATP, residual, leverage,
+            studentized_residual, cooks_distance, is_outlier
+    """
+    gamdf = fit(atp_table, constraint_mode, indices, exclude_data_index)['gamdf']
+    x = gamdf['growth_rate'].values.astype(float)
+    y = gamdf['ATP'].values.astype(float)
+    dataset_index = gamdf['training_dataset_index'].astype(int).values
+    n = len(x)
+    if n < 4:
+        raise ValueError('At least four data sets are required for resampling, got {}'.format(n))
+
+    gam, ngam = _linregress_rows(x[np.newaxis, :], y[np.newaxis, :])
+    gam, ngam = gam[0], ngam[0]
+
+    # Bootstrap
+    rng = np.random.RandomState(seed)
+    sample = rng.randint(0, n, size=(n_bootstrap, n))
+    boot_gam, boot_ngam = _linregress_rows(x[sample], y[sample])
+    tail = (100 - ci) / 2
+    bootstrap = pd.DataFrame({'GAM': boot_gam, 'NGAM': boot_ngam})
+
+    # Leave-one-out
+    keep = ~np.eye(n, dtype=bool)
+    loo_gam, loo_ngam = _linregress_rows(x[np.newaxis, :].repeat(n, 0)[keep].reshape(n, n - 1),
+                                         y[np.newaxis, :].repeat(n, 0)[keep].reshape(n, n - 1))
+    loo = pd.DataFrame({'GAM': loo_gam, 'NGAM': loo_ngam}, index=pd.Index(dataset_index, name='training_dataset_index'))
+
+    # Outlier scores (p = 2 parameters)
+    residual = y - (gam * x + ngam)
+    leverage = 1 / n + (x - x.mean())**2 / ((x - x.mean())**2).sum()
+    s2 = (residual**2).sum() / (n - 2)
+    s2_loo = ((n - 2) * s2 - residual**2 / (1 - leverage)) / (n - 3)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        studentized = residual / np.sqrt(s2_loo * (1 - leverage))
+        cooks = residual**2 / (2 * s2) * leverage / (1 - leverage)**2
+    outliers = pd.DataFrame({'growth_rate': x, 'ATP': y, 'residual': residual, 'leverage': leverage,
+                             'studentized_residual': studentized, 'cooks_distance': cooks,
+                             'is_outlier': np.abs(studentized) > outlier_threshold},
+                            index=pd.Index(dataset_index, name='training_dataset_index'))
+
+    return {'GAM': gam, 'NGAM': ngam,
+            'GAM_ci': tuple(np.nanpercentile(boot_gam, [tail, 100 - tail])),
+            'NGAM_ci': tuple(np.nanpercentile(boot_ngam, [tail, 100 - tail])),
+            'bootstrap': bootstrap, 'loo': loo, 'outliers': outliers}
+
+
+def _linregress_rows(x, y):
+    """ Least squares slope and intercept for each row of x and y (2D arrays). Rows without variation in x are nan."""
+    x_mean = x.mean(axis=1, keepdims=True)
+    y_mean = y.mean(axis=1, keepdims=True)
+    sxx = ((x - x_mean)**2).sum(axis=1)
+    sxy = ((x - x_mean) * (y - y_mean)).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 0, sxy / sxx, np.nan)
+    intercept = y_mean[:, 0] - slope * x_mean[:, 0]
+    return slope, intercept
+
+
+def _condition_record(row, constraint_mode, apply_knockouts):
+    """ Everything besides the model which determines the result of _max_atp, used as cache key."""
+    medium_id, bof_id = conf_model.get_medium_and_bof(row['Medium'])
+    deleted_genes = None
+    if apply_knockouts and isinstance(row['deleted_genes'], str):
+        deleted_genes = conf_model.get_deleted_gene_ids(row['deleted_genes'])
+    return {'row': dict(row), 'constraint_mode': constraint_mode, 'medium': conditions.get_medium(medium_id),
+            'bof_id': bof_id, 'deleted_genes': deleted_genes}
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(model, apply_knockouts, dataset_path):
+    _worker['model'] = model
+    _worker['apply_knockouts'] = apply_knockouts
+    _worker['dataset_path'] = dataset_path
+
+
+def _max_atp(job):
+    index, constraint_mode = job
+    with _worker['model'] as tmodel:
+        conf_model.set_experimental_data(tmodel, index, constraint_mode=constraint_mode,
+                                         apply_knockouts=_worker['apply_knockouts'],
+                                         flux_dataset_path=_worker['dataset_path'])
+
+        conf_model.set_all_biomass_gam(tmodel, 0)
+        conf_model.set_ngam(tmodel, 0)
+        tmodel.objective = 'ATPM'
+        r = tmodel.optimize()
+        if r.status == 'infeasible':
+            return r.status, np.nan
+        return r.status, r.objective_value
+
+
 def plot_gam(trainout, excl_point=None, ax=None, point_label_level=1):
     #  See 8_train_GAM.ipynb for plotting code
 